@@ -4,5 +4,10 @@ This package consumes events from the Redis inbox stream and writes
 projections to MongoDB Payload collections.
 """
 
+import time
+
 __version__ = "0.1.0"
 
+# Reference point for the startup profile (see startup.py)
+IMPORTED_AT = time.monotonic()
+
@@ -0,0 +1,87 @@
+"""Local admin HTTP endpoint.
+
+Serves ``GET /metrics`` (Prometheus text format) plus any routes registered by
+other components. It is a deliberately tiny asyncio server with no extra
+dependencies, meant to be bound to localhost or a pod-internal port.
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+
+import structlog
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+# (method, path) -> async handler returning (status, content_type, body)
+Route = Callable[[], Awaitable[tuple[int, str, str]]]
+
+_STATUS_TEXT = {
+    200: "OK",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class AdminServer:
+    """Minimal HTTP/1.0 server for metrics and admin actions."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.routes: dict[tuple[str, str], Route] = {("GET", "/metrics"): self._metrics}
+        self._server: asyncio.Server | None = None
+
+    def add_route(self, method: str, path: str, handler: Route) -> None:
+        """Register a handler for a method and path."""
+        self.routes[(method.upper(), path)] = handler
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Admin endpoint listening", host=self.host, port=self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _metrics(self) -> tuple[int, str, str]:
+        return 200, "text/plain; version=0.0.4", metrics.render_prometheus()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            # Drain headers; no admin route takes a body
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request_line.split()
+            method, path = "", ""
+            if len(parts) >= 2:
+                method, path = parts[0].upper(), parts[1].split("?")[0]
+
+            handler = self.routes.get((method, path))
+            if handler is None:
+                known_path = any(p == path for _, p in self.routes)
+                status, content_type, body = (405 if known_path else 404), "text/plain", ""
+            else:
+                try:
+                    status, content_type, body = await handler()
+                except Exception as e:
+                    logger.error("Admin route failed", path=path, error=str(e), exc_info=True)
+                    status, content_type, body = 500, "text/plain", str(e)
+
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.0 {status} {_STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
@@ -0,0 +1,39 @@
+"""Backpressure primitives for the read/process pipeline."""
+
+import asyncio
+
+
+class InFlightLimiter:
+    """
+    Bound the number of messages held in memory but not yet acknowledged.
+
+    The reader asks for capacity before each XREADGROUP and only reads as many
+    entries as are free; workers release capacity once messages are acked (or
+    otherwise finished). When MongoDB slows down, the reader stops fetching
+    instead of buffering an unbounded backlog.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def available(self) -> int:
+        return max(0, self.limit - self.in_flight)
+
+    async def wait_for_capacity(self) -> int:
+        """Wait until at least one slot is free and return the number of free slots."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < self.limit)
+            return self.available
+
+    def acquire(self, count: int) -> None:
+        """Record messages that have been read into memory."""
+        self.in_flight += count
+
+    async def release(self, count: int) -> None:
+        """Record messages that are finished and wake the reader."""
+        async with self._changed:
+            self.in_flight = max(0, self.in_flight - count)
+            self._changed.notify_all()
@@ -0,0 +1,218 @@
+"""Circuit breakers for failing dependencies.
+
+When MongoDB (or a single collection) starts failing, every message still
+goes through its handler, fails, and burns a retry until it lands in the DLQ.
+Circuit breakers track recent handler outcomes at three levels:
+
+- ``event:<type>`` - one event type
+- ``collection:<name>`` - every event type that writes the same collection
+- ``global`` - everything (MongoDB or Redis unavailable)
+
+Once the failure rate over the last ``window`` outcomes reaches the threshold
+a circuit opens. Messages it covers are parked in the retry scheduler until
+the circuit's next probe without using up a delivery attempt, and while the
+global circuit is open the reader stops pulling new entries altogether.
+After the open period one message is let through as a probe: success closes
+the circuit, failure re-opens it for twice as long (up to a maximum).
+
+Only dependency failures (MongoDB, Redis, timeouts, connection errors) count
+towards opening a circuit; a handler rejecting a malformed event does not.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+import structlog
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from redis.exceptions import RedisError
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+circuit_state = metrics.gauge("circuit_state", "Circuit state (0 closed, 1 half-open, 2 open)")
+circuit_opened = metrics.counter("circuit_opened_total", "Times a circuit opened")
+
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """Whether an error points at an unavailable dependency rather than a bad event."""
+    if isinstance(error, DuplicateKeyError):
+        return False
+    return isinstance(
+        error, (PyMongoError, RedisError, asyncio.TimeoutError, TimeoutError, ConnectionError)
+    )
+
+
+def collection_for_event(event_type: str) -> str:
+    """MongoDB collection an event type's handler writes to."""
+    if event_type.startswith(("account.", "payment.")):
+        return "loan-accounts"
+    if event_type.startswith("customer."):
+        return "customers"
+    if event_type.startswith("writeoff."):
+        return "write-off-requests"
+    if event_type.startswith("ledger."):
+        return "ledger-transactions"
+    return "conversations"
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with exponential open periods and single probes."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float,
+        window: int,
+        min_calls: int,
+        open_base_seconds: float,
+        open_max_seconds: float,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_base_seconds = open_base_seconds
+        self.open_max_seconds = open_max_seconds
+        self.state = CLOSED
+        # Consecutive openings without a successful probe
+        self.trips = 0
+        self.open_until = 0.0
+        self._outcomes: deque[bool] = deque(maxlen=max(1, window))
+        self._probe_in_flight = False
+
+    def blocked_for(self) -> float | None:
+        """Seconds until a message may be let through, or None if one may go now."""
+        if self.state == CLOSED:
+            return None
+        if self.state == OPEN:
+            remaining = self.open_until - time.monotonic()
+            return remaining if remaining > 0 else None
+        return self.open_base_seconds if self._probe_in_flight else None
+
+    def begin(self) -> None:
+        """Let a message through; after the open period it becomes the probe."""
+        if self.state == OPEN and time.monotonic() >= self.open_until:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Circuit closed", circuit=self.name, trips=self.trips)
+            self.trips = 0
+            self._outcomes.clear()
+            self._probe_in_flight = False
+            self._set_state(CLOSED)
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == OPEN:
+            # In-flight work from before the circuit opened
+            return
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if (
+            len(self._outcomes) >= self.min_calls
+            and failures / len(self._outcomes) >= self.failure_rate
+        ):
+            self._open()
+
+    def release(self) -> None:
+        """Free the probe slot without an outcome (the event itself was bad)."""
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self.trips += 1
+        duration = min(self.open_max_seconds, self.open_base_seconds * 2 ** (self.trips - 1))
+        self.open_until = time.monotonic() + duration
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self._set_state(OPEN)
+        circuit_opened.inc(circuit=self.name)
+        logger.warning(
+            "Circuit opened", circuit=self.name, trips=self.trips, open_seconds=duration
+        )
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        circuit_state.set(_STATE_VALUES[state], circuit=self.name)
+
+
+class CircuitBreakers:
+    """Global, per-collection and per-event-type circuits for handler outcomes."""
+
+    def __init__(
+        self,
+        failure_rate: float,
+        window: int,
+        min_calls: int,
+        open_base_seconds: float,
+        open_max_seconds: float,
+    ) -> None:
+        self._options = dict(
+            failure_rate=failure_rate,
+            window=window,
+            min_calls=min_calls,
+            open_base_seconds=open_base_seconds,
+            open_max_seconds=open_max_seconds,
+        )
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.global_breaker = self._breaker("global")
+
+    def _breaker(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(name, **self._options)
+        return breaker
+
+    def breakers_for(self, event_type: str) -> tuple[CircuitBreaker, ...]:
+        return (
+            self.global_breaker,
+            self._breaker(f"collection:{collection_for_event(event_type)}"),
+            self._breaker(f"event:{event_type}"),
+        )
+
+    def global_pause(self) -> float | None:
+        """Seconds the reader should wait before pulling new entries, if any."""
+        if self.global_breaker.state != OPEN:
+            return None
+        return self.global_breaker.blocked_for()
+
+    def check(self, event_type: str) -> float | None:
+        """
+        Decide whether a message of this type may be handled now.
+
+        Returns None (and takes any probe slots) if it may, otherwise the
+        number of seconds to park it for.
+        """
+        breakers = self.breakers_for(event_type)
+        waits = [wait for wait in (b.blocked_for() for b in breakers) if wait is not None]
+        if waits:
+            return max(waits)
+        for breaker in breakers:
+            breaker.begin()
+        return None
+
+    def record(self, event_type: str, error: BaseException | None = None) -> None:
+        """Record a handler outcome (``error`` None on success)."""
+        for breaker in self.breakers_for(event_type):
+            if error is None:
+                breaker.record_success()
+            elif is_dependency_failure(error):
+                breaker.record_failure()
+            else:
+                breaker.release()
+
+    def open_circuits(self) -> list[str]:
+        return sorted(name for name, b in self.breakers.items() if b.state != CLOSED)
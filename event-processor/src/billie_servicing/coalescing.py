@@ -0,0 +1,123 @@
+"""Write coalescing for high-rate projection updates.
+
+A ``WriteCoalescer`` buffers items per key (e.g. per conversation) and flushes
+each key's buffer as a single MongoDB write once the buffer is full or the
+coalescing window has elapsed. Every submitted item gets a future that resolves
+only after the write containing it has completed, so callers can keep the
+"ACK after successful write" guarantee.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Generic, TypeVar
+
+import structlog
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+FlushFn = Callable[[AsyncIOMotorDatabase, str, list[T]], Awaitable[None]]
+
+
+class _Buffer(Generic[T]):
+    """Pending items for a single key."""
+
+    def __init__(self, db: AsyncIOMotorDatabase) -> None:
+        self.db = db
+        self.items: list[T] = []
+        self.futures: list[asyncio.Future[None]] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class WriteCoalescer(Generic[T]):
+    """
+    Buffer items per key and flush them as one write.
+
+    Items for the same key are flushed in submission order. A key's buffer is
+    flushed when it reaches ``max_items``, when ``window_ms`` has elapsed since
+    its first item, or when ``flush()`` is called.
+    """
+
+    def __init__(self, flush_fn: FlushFn[T], window_ms: int, max_items: int) -> None:
+        self._flush_fn = flush_fn
+        self.window_ms = window_ms
+        self.max_items = max(1, max_items)
+        self._buffers: dict[str, _Buffer[T]] = {}
+        self._flushes: set[asyncio.Task[None]] = set()
+        # Last flush per key, so successive flushes of one key never overlap
+        self._tails: dict[str, asyncio.Task[None]] = {}
+
+    @property
+    def pending(self) -> int:
+        """Number of items waiting to be flushed."""
+        return sum(len(buffer.items) for buffer in self._buffers.values())
+
+    def submit(self, db: AsyncIOMotorDatabase, key: str, item: T) -> asyncio.Future[None]:
+        """
+        Add an item to the key's buffer.
+
+        Returns a future that resolves once the item has been written, or
+        raises the error the flush failed with.
+        """
+        loop = asyncio.get_running_loop()
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = _Buffer(db)
+            self._buffers[key] = buffer
+            buffer.timer = loop.call_later(self.window_ms / 1000, self._flush_key_soon, key)
+
+        future: asyncio.Future[None] = loop.create_future()
+        buffer.items.append(item)
+        buffer.futures.append(future)
+
+        if len(buffer.items) >= self.max_items:
+            self._flush_key_soon(key)
+
+        return future
+
+    async def flush(self) -> None:
+        """Flush every buffered key and wait for all in-progress flushes."""
+        for key in list(self._buffers):
+            self._flush_key_soon(key)
+        while self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+
+    def _flush_key_soon(self, key: str) -> None:
+        """Detach the key's buffer and write it in a background task."""
+        buffer = self._buffers.pop(key, None)
+        if buffer is None:
+            return
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+
+        task = asyncio.create_task(self._write(key, buffer, self._tails.get(key)))
+        self._tails[key] = task
+        self._flushes.add(task)
+        task.add_done_callback(lambda t: self._on_flushed(key, t))
+
+    def _on_flushed(self, key: str, task: asyncio.Task[None]) -> None:
+        self._flushes.discard(task)
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _write(
+        self, key: str, buffer: _Buffer[T], previous: asyncio.Task[None] | None
+    ) -> None:
+        """Write a detached buffer after the key's previous flush, then resolve its futures."""
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        try:
+            await self._flush_fn(buffer.db, key, buffer.items)
+        except Exception as e:
+            logger.error("Coalesced write failed", key=key, items=len(buffer.items), error=str(e))
+            for future in buffer.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug("Coalesced write flushed", key=key, items=len(buffer.items))
+        for future in buffer.futures:
+            if not future.done():
+                future.set_result(None)
@@ -0,0 +1,162 @@
+"""Last-writer-wins compaction of state-setting events during catch-up.
+
+After an outage the backlog is full of repeated ``account.updated.v1``,
+``account.status_changed.v1`` and ``customer.changed.v1`` events for the
+same aggregates, and only the final state matters. These handlers only set
+fields, so several of them for one aggregate can be merged: the fields each
+event sets (its handler's update builder in ``STATE_WRITES``) are combined
+in stream order, later values winning, and written once.
+
+While a stream is in catch-up mode (``CatchUpMode``: its measured consumer
+lag is above ``CATCH_UP_LAG_SECONDS``) the processor prepares a batch up
+front and ``compact`` groups it. The merged write runs in place of the
+group's last event, and every entry in the group is acknowledged with it.
+Any other event ends all open groups, so it still runs between the same
+writes as before. Catch-up mode ends once the lag is below half the
+threshold.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Sequence
+
+import structlog
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .handlers.account import (
+    account_update_fields,
+    apply_account_update,
+    handle_account_status_changed,
+    handle_account_updated,
+    status_change_fields,
+)
+from .handlers.customer import apply_customer_changes, customer_changes, handle_customer_changed
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+catch_up_gauge = metrics.gauge("catch_up_mode", "1 while a stream is compacted to catch up")
+compacted_events = metrics.counter(
+    "compacted_events_total", "Events merged into another event's write during catch-up"
+)
+
+Handler = Callable[[AsyncIOMotorDatabase, Any], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class StateWrite:
+    """How a state-setting handler's events are merged."""
+
+    # Events merge with events of the same family and aggregate
+    family: str
+    aggregate: Callable[[Any], str]
+    # Fields an event sets, merged in order with later values winning
+    changes: Callable[[Any], dict[str, Any]]
+    # Writes merged fields for an aggregate
+    apply: Callable[[AsyncIOMotorDatabase, str, dict[str, Any]], Awaitable[Any]]
+
+
+def _account_id(parsed_event: Any) -> str:
+    return parsed_event.payload.account_id
+
+
+def _customer_id(parsed_event: Any) -> str:
+    return parsed_event.payload.customer_id
+
+
+STATE_WRITES: dict[Handler, StateWrite] = {
+    handle_account_updated: StateWrite(
+        "account",
+        _account_id,
+        lambda event: account_update_fields(event.payload),
+        apply_account_update,
+    ),
+    handle_account_status_changed: StateWrite(
+        "account",
+        _account_id,
+        lambda event: status_change_fields(event.payload),
+        apply_account_update,
+    ),
+    handle_customer_changed: StateWrite(
+        "customer",
+        _customer_id,
+        lambda event: customer_changes(event.payload),
+        apply_customer_changes,
+    ),
+}
+
+
+def compact(prepared: Sequence[Any]) -> list[list[Any]]:
+    """
+    Group a batch for compaction; items need ``handler`` and ``parsed_event``.
+
+    Returns groups in the order they should run. A group of more than one
+    item is a run of state-setting events for one aggregate, to be merged
+    with ``merged_handler`` and run in place of its last item.
+    """
+    groups: list[list[Any]] = []
+    # Open groups, ordered by their latest item
+    open_groups: dict[tuple[str, str], list[Any]] = {}
+
+    for item in prepared:
+        write = STATE_WRITES.get(item.handler)
+        if write is None:
+            groups.extend(open_groups.values())
+            open_groups.clear()
+            groups.append([item])
+            continue
+
+        key = (write.family, str(write.aggregate(item.parsed_event)))
+        group = open_groups.pop(key, [])
+        group.append(item)
+        open_groups[key] = group
+
+    groups.extend(open_groups.values())
+    return groups
+
+
+def merged_handler(group: Sequence[Any]) -> Handler:
+    """A handler applying the merged fields of a group from ``compact`` in one write."""
+    last = STATE_WRITES[group[-1].handler]
+    aggregate = last.aggregate(group[-1].parsed_event)
+    changes: dict[str, Any] = {}
+    for item in group:
+        changes.update(STATE_WRITES[item.handler].changes(item.parsed_event))
+
+    async def compacted(db: AsyncIOMotorDatabase, parsed_event: Any) -> None:
+        await last.apply(db, aggregate, changes)
+
+    compacted.__name__ = f"compacted_{last.family}_write"
+    compacted_events.inc(len(group) - 1, family=last.family)
+    return compacted
+
+
+class CatchUpMode:
+    """Tracks which streams are far enough behind to compact."""
+
+    def __init__(self, lag_threshold_seconds: float) -> None:
+        self.lag_threshold_seconds = lag_threshold_seconds
+        self._since: dict[str, float] = {}
+
+    def active(self, stream: str) -> bool:
+        return stream in self._since
+
+    def update(self, stream: str, lag_seconds: float) -> None:
+        """Enter catch-up above the threshold; leave below half of it."""
+        if not self.active(stream) and lag_seconds > self.lag_threshold_seconds:
+            self._since[stream] = time.monotonic()
+            catch_up_gauge.set(1, stream=stream)
+            logger.warning(
+                "Catch-up mode on, compacting state-setting events",
+                stream=stream,
+                lag_seconds=round(lag_seconds, 1),
+            )
+        elif self.active(stream) and lag_seconds < self.lag_threshold_seconds / 2:
+            started = self._since.pop(stream)
+            catch_up_gauge.set(0, stream=stream)
+            logger.info(
+                "Catch-up mode off",
+                stream=stream,
+                lag_seconds=round(lag_seconds, 1),
+                duration_seconds=round(time.monotonic() - started, 1),
+            )
@@ -13,6 +13,17 @@ class Settings(BaseSettings):
     internal_stream: str = "inbox:billie-servicing:internal"
     consumer_group: str = "billie-servicing-processor"
     dlq_stream: str = "dlq:billie-servicing"
+    # Hash-partitioned inbox: read <inbox_stream>:{0..N-1} instead (0 = unpartitioned)
+    inbox_partitions: int = 0
+    inbox_owned_partitions: str = ""  # Partitions this worker reads, e.g. "0-3,6"; empty = all
+
+    # Redis connection pools: blocking XREADGROUP vs. command traffic
+    redis_read_pool_size: int = 2  # Raised to the number of streams read if lower
+    redis_command_pool_size: int = 16
+    redis_read_health_check_interval: int = 30
+    redis_command_health_check_interval: int = 30
+    redis_pool_timeout_seconds: float = 5.0  # Max wait for a free connection
+    redis_socket_timeout_seconds: float = 5.0
 
     # MongoDB configuration
     database_uri: str = Field(
@@ -20,16 +31,111 @@ class Settings(BaseSettings):
         validation_alias="DATABASE_URI",
     )
     db_name: str = "billie-servicing"
+    # Attribute MongoDB commands to event types (metrics + slow-command log)
+    mongo_command_accounting: bool = True
+    mongo_slow_command_ms: float = 100.0
+    # Create missing indexes at startup; disable where indexes are managed elsewhere
+    # (they are still verified and reported)
+    manage_indexes: bool = True
 
     # Processing configuration
     max_retries: int = 3
+    retry_base_delay_ms: int = 500  # Backoff before the first retry; doubles per attempt
+    retry_max_delay_ms: int = 60000
+    retry_jitter: float = 0.5  # Fraction of each delay that is randomised
     dedup_ttl_seconds: int = 86400  # 24 hours
+    # "keys" = one key per message; "watermark" = per-stream floor + sorted-set window
+    dedup_store: str = "keys"
+    dedup_compact_interval_seconds: int = 30
+    # Log a dedup memory report every N compactions (0 = never). The report SCANs
+    # every per-message dedup key of a stream, so enable it only to check the saving
+    dedup_report_every: int = 0
     batch_size: int = 10
     block_timeout_ms: int = 1000
+    prefetch_batches: int = 2  # Batches read ahead while the current one is processed
+    max_in_flight_messages: int = 100  # Unacked messages held in memory at once
+    shutdown_drain_timeout_seconds: float = 30.0  # Time allowed to finish in-flight work on stop
+
+    # Scheduling between streams: weighted round robin over prefetched batches
+    internal_stream_weight: int = 4
+    external_stream_weight: int = 1  # Per external stream (each inbox partition)
+    internal_latency_target_ms: int = 250  # Overdue internal batches go first; 0 = weights only
+    internal_max_in_flight_messages: int = 20  # Separate from max_in_flight_messages
+
+    # Worker pools per event family: concurrent lanes (an aggregate always uses
+    # the same lane) and messages queued per pool before dispatch waits
+    account_pool_concurrency: int = 4
+    account_pool_queue_depth: int = 50
+    customer_pool_concurrency: int = 2
+    customer_pool_queue_depth: int = 50
+    chat_pool_concurrency: int = 4
+    chat_pool_queue_depth: int = 100
+    writeoff_pool_concurrency: int = 2
+    writeoff_pool_queue_depth: int = 20
+
+    # Reorder buffer: hold early events per aggregate until their predecessors
+    # are handled (0 disables; handlers then always take their fallback paths).
+    # Off by default: its state is per process, so it can't see prerequisites
+    # handled before a restart or by another consumer
+    reorder_window_ms: int = 0
+    reorder_max_held: int = 1000
+
+    # Catch-up: above this consumer lag, state-setting events for one aggregate
+    # in a batch are merged into one write (0 disables; needs lag monitoring).
+    # Off by default: it reorders writes within a batch, so enable and tune it
+    # per deployment
+    catch_up_lag_seconds: float = 0.0
+
+    # Stream retention: trim acknowledged history and cap the DLQ
+    retention_interval_seconds: int = 300  # 0 disables trimming
+    stream_min_retention_seconds: int = 86400  # History always kept for replay/inspection
+    dlq_retention_seconds: int = 1209600  # 14 days
+    dlq_max_length: int = 100000
+
+    # Circuit breakers (global, per collection and per event type)
+    circuit_breaker_enabled: bool = True
+    circuit_failure_rate: float = 0.5  # Failure rate over the window that opens a circuit
+    circuit_window: int = 20  # Recent handler outcomes considered per circuit
+    circuit_min_calls: int = 10  # Outcomes needed before a circuit can open
+    circuit_open_base_seconds: float = 5.0  # First pause; doubles after each failed probe
+    circuit_open_max_seconds: float = 300.0
+
+    # Event loop: "asyncio" or "uvloop" (needs the "uvloop" extra)
+    event_loop: str = "asyncio"
+    loop_lag_interval_ms: int = 100  # Timer used to measure loop lag; 0 disables monitoring
+    loop_block_threshold_ms: int = 100  # Sample the loop's stack when blocked longer than this
+
+    # Utterance coalescing (0 disables; each utterance is written on its own)
+    utterance_coalesce_window_ms: int = 0
+    utterance_coalesce_max_events: int = 50
+
+    # Ledger transactions are inserted in bulk: up to this many per insert_many,
+    # waiting at most this long for more (the end of a batch also flushes)
+    ledger_ingest_window_ms: int = 200
+    ledger_ingest_max_events: int = 500
 
     # Logging
     log_level: str = "INFO"
 
+    # Metrics
+    metrics_log_interval_seconds: int = 60  # 0 disables periodic metrics logging
+    admin_host: str = "127.0.0.1"
+    admin_port: int = 0  # Local admin/metrics endpoint; 0 disables it
+
+    # On-demand profiling (SIGUSR1 starts, SIGUSR2 stops and writes the results)
+    profile_dir: str = "profiles"
+    profile_top_n: int = 30  # Functions listed in the text summary
+
+    # Tracing (needs the "tracing" extra): "", "console", "file", "memory" or "otlp"
+    tracing_exporter: str = ""
+    tracing_file_path: str = "traces.jsonl"
+    tracing_service_name: str = "billie-servicing-processor"
+
+    # Lag monitoring and projection freshness SLOs
+    lag_check_interval_seconds: int = 15  # 0 disables consumer-lag measurement
+    slo_max_lag_seconds: float = 60.0  # Oldest unprocessed entry
+    slo_max_event_age_seconds: float = 120.0  # Event time to acknowledgement
+
     class Config:
         env_prefix = ""
         case_sensitive = False
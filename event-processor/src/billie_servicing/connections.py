@@ -0,0 +1,83 @@
+"""Redis connection pools for the event processor.
+
+Blocking XREADGROUP calls hold a connection for up to ``block_timeout_ms``.
+If they share a pool with dedup checks, SETEX, XACK and DLQ writes, that
+command traffic queues behind the readers. ``RedisConnections`` therefore
+keeps two clients on separate pools, each with its own size and health-check
+settings, and records how long callers wait for a free connection.
+"""
+
+import time
+from typing import Any
+
+import redis.asyncio as redis
+
+from .config import settings
+from .metrics import metrics
+
+pool_wait_seconds = metrics.histogram(
+    "redis_pool_wait_seconds", "Time spent waiting for a free Redis connection"
+)
+pool_timeouts = metrics.counter(
+    "redis_pool_timeouts_total", "Redis connection requests that timed out waiting for the pool"
+)
+
+
+class TimedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """Blocking pool that records connection wait time per pool."""
+
+    def __init__(self, *args: Any, pool_name: str = "default", **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.pool_name = pool_name
+
+    async def get_connection(self, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        except redis.ConnectionError:
+            pool_timeouts.inc(pool=self.pool_name)
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - start, pool=self.pool_name)
+
+
+class RedisConnections:
+    """
+    Separate Redis clients for blocking stream reads and command traffic.
+
+    - ``reader``: XREADGROUP with BLOCK only; sized to the number of read loops
+      (``read_pool_size``, default ``redis_read_pool_size``)
+    - ``commands``: everything else (dedup, XACK, XCLAIM, DLQ, pipelines)
+    """
+
+    def __init__(self, redis_url: str, read_pool_size: int | None = None) -> None:
+        # Blocking reads must not hit the socket timeout while waiting on BLOCK
+        read_socket_timeout = (
+            settings.block_timeout_ms / 1000 + settings.redis_socket_timeout_seconds
+        )
+
+        self.read_pool = TimedBlockingConnectionPool.from_url(
+            redis_url,
+            pool_name="read",
+            max_connections=read_pool_size or settings.redis_read_pool_size,
+            timeout=settings.redis_pool_timeout_seconds,
+            health_check_interval=settings.redis_read_health_check_interval,
+            socket_timeout=read_socket_timeout,
+        )
+        self.command_pool = TimedBlockingConnectionPool.from_url(
+            redis_url,
+            pool_name="command",
+            max_connections=settings.redis_command_pool_size,
+            timeout=settings.redis_pool_timeout_seconds,
+            health_check_interval=settings.redis_command_health_check_interval,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+        )
+        self.reader = redis.Redis(connection_pool=self.read_pool)
+        self.commands = redis.Redis(connection_pool=self.command_pool)
+
+    async def close(self) -> None:
+        """Close both clients and disconnect their pools."""
+        await self.reader.aclose()
+        await self.commands.aclose()
+        await self.read_pool.disconnect()
+        await self.command_pool.disconnect()
@@ -0,0 +1,245 @@
+"""Deduplication stores for processed stream entries.
+
+Deduplication protects against redelivery of an entry whose MongoDB write
+succeeded but whose XACK did not (crash, connection loss). Redis only ever
+redelivers entries that are still in the consumer group's pending entries
+list (PEL), so the store only has to remember processed IDs that could still
+be pending.
+
+Two stores are available (``DEDUP_STORE``):
+
+``keys`` (``KeyPerMessageDedupStore``)
+    The original scheme: one ``dedup:{stream}:{message_id}`` string key with a
+    ``dedup_ttl_seconds`` TTL per processed entry. At ~1M events/day that is
+    ~1M live keys, roughly 90-100 bytes each plus an entry in Redis' expires
+    table, i.e. ~100 MB and constant key-expiry work.
+
+``watermark`` (``WatermarkDedupStore``)
+    A per-stream floor ID plus a sorted-set window:
+
+    - ``dedup:{stream}:floor`` - every ID below it has been acknowledged by
+      the group (it is the oldest pending ID, or just past the last delivered
+      ID when nothing is pending), so it can never be redelivered.
+    - ``dedup:{stream}:window`` - processed IDs at or above the floor, scored
+      by their millisecond timestamp, for entries acked out of order.
+
+    ``compact()`` advances the floor and drops window members below it (and
+    anything older than ``dedup_ttl_seconds`` as a bound if an entry is stuck
+    in the PEL). The window normally holds only the entries processed since
+    the oldest pending one - tens to hundreds of members, a few KB per stream.
+
+``memory_report()`` measures both layouts so the saving can be checked on a
+live instance (legacy keys keep expiring for a TTL after switching). It scans
+the stream's whole dedup keyspace, so the processor only runs it when
+``DEDUP_REPORT_EVERY`` is set.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import redis.asyncio as redis
+import structlog
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+dedup_memory_bytes = metrics.gauge("dedup_memory_bytes", "Redis memory used by dedup state")
+dedup_window_entries = metrics.gauge("dedup_window_entries", "Processed IDs held above the floor")
+
+# Keys sampled with MEMORY USAGE when estimating the key-per-message footprint
+_MEMORY_SAMPLE_SIZE = 20
+
+
+def parse_stream_id(message_id: str) -> tuple[int, int]:
+    """Split a Redis stream ID ("<ms>-<seq>") into comparable integers."""
+    ms, _, seq = message_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+@dataclass
+class DedupMemoryReport:
+    """Redis memory held by dedup state for one stream."""
+
+    stream: str
+    store: str
+    keys: int
+    bytes: int
+    # Per-message keys still present (all of them for the "keys" store; for
+    # the watermark store, legacy keys that have not expired yet)
+    key_per_message_keys: int
+    key_per_message_bytes: int
+
+    @property
+    def saved_bytes(self) -> int:
+        if self.store == "keys":
+            return 0
+        return self.key_per_message_bytes - self.bytes
+
+
+class DedupStore(Protocol):
+    name: str
+
+    async def is_processed(self, stream: str, message_id: str) -> bool: ...
+
+    def mark_processed(self, pipe: Any, stream: str, message_id: str) -> None: ...
+
+    async def compact(self, stream: str) -> None: ...
+
+    async def memory_report(self, stream: str) -> DedupMemoryReport: ...
+
+
+class KeyPerMessageDedupStore:
+    """One ``dedup:{stream}:{message_id}`` key with a TTL per processed entry."""
+
+    name = "keys"
+
+    def __init__(self, redis_client: redis.Redis, ttl_seconds: int) -> None:
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def key(stream: str, message_id: str) -> str:
+        return f"dedup:{stream}:{message_id}"
+
+    async def is_processed(self, stream: str, message_id: str) -> bool:
+        return bool(await self.redis.exists(self.key(stream, message_id)))
+
+    def mark_processed(self, pipe: Any, stream: str, message_id: str) -> None:
+        """Queue the dedup write on the pipeline that also XACKs the entry."""
+        pipe.setex(self.key(stream, message_id), self.ttl_seconds, "1")
+
+    async def compact(self, stream: str) -> None:
+        """Nothing to do; Redis expires the keys."""
+
+    async def memory_report(self, stream: str) -> DedupMemoryReport:
+        keys, estimated = await _estimate_key_per_message(self.redis, stream)
+        dedup_memory_bytes.set(estimated, stream=stream, store=self.name)
+        return DedupMemoryReport(stream, self.name, keys, estimated, keys, estimated)
+
+
+class WatermarkDedupStore:
+    """Per-stream acknowledged-ID floor plus a sorted-set window of processed IDs."""
+
+    name = "watermark"
+
+    def __init__(self, redis_client: redis.Redis, consumer_group: str, ttl_seconds: int) -> None:
+        self.redis = redis_client
+        self.consumer_group = consumer_group
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def floor_key(stream: str) -> str:
+        return f"dedup:{stream}:floor"
+
+    @staticmethod
+    def window_key(stream: str) -> str:
+        return f"dedup:{stream}:window"
+
+    async def is_processed(self, stream: str, message_id: str) -> bool:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.floor_key(stream))
+        pipe.zscore(self.window_key(stream), message_id)
+        floor, score = await pipe.execute()
+
+        if score is not None:
+            return True
+        return floor is not None and parse_stream_id(message_id) < parse_stream_id(_decode(floor))
+
+    def mark_processed(self, pipe: Any, stream: str, message_id: str) -> None:
+        """Queue the dedup write on the pipeline that also XACKs the entry."""
+        pipe.zadd(self.window_key(stream), {message_id: parse_stream_id(message_id)[0]})
+
+    async def compact(self, stream: str) -> None:
+        """Advance the floor to the oldest pending ID and trim the window below it."""
+        floor = await self._safe_floor(stream)
+        window_key = self.window_key(stream)
+        oldest_allowed_ms = int(time.time() * 1000) - self.ttl_seconds * 1000
+
+        pipe = self.redis.pipeline(transaction=False)
+        if floor is not None:
+            current = await self.redis.get(self.floor_key(stream))
+            if current is None or parse_stream_id(floor) > parse_stream_id(_decode(current)):
+                pipe.set(self.floor_key(stream), floor)
+            # Members sharing the floor's millisecond are kept; they are harmless
+            pipe.zremrangebyscore(window_key, "-inf", f"({parse_stream_id(floor)[0]}")
+        pipe.zremrangebyscore(window_key, "-inf", f"({oldest_allowed_ms}")
+        pipe.zcard(window_key)
+        results = await pipe.execute()
+
+        dedup_window_entries.set(results[-1], stream=stream)
+        logger.debug("Dedup window compacted", stream=stream, floor=floor, window=results[-1])
+
+    async def _safe_floor(self, stream: str) -> str | None:
+        """
+        Lowest ID that may still be redelivered to the group.
+
+        That is the oldest pending entry; with nothing pending, it is just
+        past the last delivered ID.
+        """
+        summary = await self.redis.xpending(stream, self.consumer_group)
+        if summary and summary.get("pending"):
+            return _decode(summary["min"])
+
+        for group in await self.redis.xinfo_groups(stream):
+            if _decode(group.get("name")) == self.consumer_group:
+                last = _decode(group.get("last-delivered-id"))
+                if not last or last == "0-0":
+                    return None
+                ms, seq = parse_stream_id(last)
+                return f"{ms}-{seq + 1}"
+        return None
+
+    async def memory_report(self, stream: str) -> DedupMemoryReport:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.memory_usage(self.floor_key(stream))
+        pipe.memory_usage(self.window_key(stream))
+        pipe.zcard(self.window_key(stream))
+        floor_bytes, window_bytes, window_entries = await pipe.execute()
+        used = int(floor_bytes or 0) + int(window_bytes or 0)
+
+        legacy_keys, legacy_bytes = await _estimate_key_per_message(self.redis, stream)
+        dedup_memory_bytes.set(used, stream=stream, store=self.name)
+        dedup_window_entries.set(window_entries, stream=stream)
+        return DedupMemoryReport(stream, self.name, 2, used, legacy_keys, legacy_bytes)
+
+
+async def _estimate_key_per_message(redis_client: redis.Redis, stream: str) -> tuple[int, int]:
+    """
+    Count ``dedup:{stream}:<id>`` keys and estimate their memory.
+
+    Uses SCAN plus MEMORY USAGE on a sample, so it is meant for occasional
+    reports rather than the hot path.
+    """
+    count = 0
+    sample: list[Any] = []
+    async for key in redis_client.scan_iter(match=f"dedup:{stream}:*-*", count=1000):
+        count += 1
+        if len(sample) < _MEMORY_SAMPLE_SIZE:
+            sample.append(key)
+
+    if not count:
+        return 0, 0
+
+    pipe = redis_client.pipeline(transaction=False)
+    for key in sample:
+        pipe.memory_usage(key)
+    sizes = [int(size or 0) for size in await pipe.execute()]
+    average = sum(sizes) / len(sizes) if sizes else 0
+    return count, int(average * count)
+
+
+def create_dedup_store(
+    kind: str, redis_client: redis.Redis, consumer_group: str, ttl_seconds: int
+) -> DedupStore:
+    """Build the configured dedup store ("keys" or "watermark")."""
+    if kind == "watermark":
+        return WatermarkDedupStore(redis_client, consumer_group, ttl_seconds)
+    if kind != "keys":
+        raise ValueError(f"Unknown dedup store: {kind!r} (expected 'keys' or 'watermark')")
+    return KeyPerMessageDedupStore(redis_client, ttl_seconds)
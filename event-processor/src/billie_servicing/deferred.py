@@ -0,0 +1,114 @@
+"""Writes deferred to the end of a processing batch.
+
+Some projection updates are derived from a handler's main write and can be
+applied once per batch instead of once per event, for example fanning a
+customer's new name out to their loan accounts. A handler registers such a
+write with ``defer_write(key, write)``. Within a batch, the last write for a
+key replaces earlier ones, and all of them run together when the batch ends.
+Messages that deferred a write are acknowledged only after it has been
+applied, so ack-after-write still holds.
+
+Outside a batch (pending recovery, retries, tests) there is nothing to defer
+to; ``defer_write`` returns None and the caller writes immediately.
+"""
+
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
+
+import structlog
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+Write = Callable[[], Awaitable[object]]
+
+deferred_writes = metrics.counter(
+    "deferred_writes_total", "Writes deferred to the end of a batch, by outcome"
+)
+
+
+class DeferredWrites:
+    """One processing batch's deferred writes, deduplicated by key."""
+
+    def __init__(self) -> None:
+        self._writes: dict[str, Write] = {}
+        self._futures: dict[str, asyncio.Future[None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def defer(self, key: str, write: Write) -> asyncio.Future[None]:
+        """Replace the key's pending write; the future resolves once the key is written."""
+        if key in self._writes:
+            deferred_writes.inc(outcome="superseded")
+        self._writes[key] = write
+        future = self._futures.get(key)
+        if future is None:
+            future = self._futures[key] = asyncio.get_running_loop().create_future()
+        return future
+
+    async def flush(self) -> None:
+        """Apply every pending write concurrently and resolve (or fail) their futures."""
+        writes, futures = self._writes, self._futures
+        self._writes, self._futures = {}, {}
+        results = await asyncio.gather(
+            *(write() for write in writes.values()), return_exceptions=True
+        )
+        for key, result in zip(writes, results):
+            future = futures[key]
+            if isinstance(result, Exception):
+                logger.error("Deferred write failed", key=key, error=str(result))
+                deferred_writes.inc(outcome="error")
+                future.set_exception(result)
+            else:
+                deferred_writes.inc(outcome="written")
+                future.set_result(None)
+
+
+_batch: contextvars.ContextVar[DeferredWrites | None] = contextvars.ContextVar(
+    "deferred_writes_batch", default=None
+)
+# Futures registered by the handler call in progress
+_collected: contextvars.ContextVar[list[asyncio.Future[None]] | None] = contextvars.ContextVar(
+    "deferred_writes_collected", default=None
+)
+
+
+@contextmanager
+def batch_scope(writes: DeferredWrites) -> Iterator[DeferredWrites]:
+    """Defer writes made by handlers inside the block to ``writes``."""
+    token = _batch.set(writes)
+    try:
+        yield writes
+    finally:
+        _batch.reset(token)
+
+
+@contextmanager
+def collect() -> Iterator[list[asyncio.Future[None]]]:
+    """Collect the futures of writes deferred inside the block (one handler call)."""
+    futures: list[asyncio.Future[None]] = []
+    token = _collected.set(futures)
+    try:
+        yield futures
+    finally:
+        _collected.reset(token)
+
+
+def defer_write(key: str, write: Write) -> asyncio.Future[None] | None:
+    """
+    Defer a write to the end of the current batch.
+
+    Returns None outside a batch; the caller should then run ``write`` itself.
+    """
+    batch = _batch.get()
+    if batch is None:
+        return None
+    future = batch.defer(key, write)
+    collected = _collected.get()
+    if collected is not None and future not in collected:
+        collected.append(future)
+    return future
@@ -0,0 +1,241 @@
+"""Bulk replay of dead-lettered events.
+
+Reads ``dlq:billie-servicing`` in ID ranges, selects entries by event type,
+error text and time window, re-injects them into the stream they originally
+came from with pipelined XADDs at a bounded rate, and deletes the replayed
+entries from the DLQ.
+
+Usage:
+    billie-servicing-dlq-replay --event-type 'account.*' --error 'timed out' \\
+        --since 2025-01-10T02:00 --until 2025-01-10T04:00 --rate 500
+    billie-servicing-dlq-replay --dry-run
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+import redis.asyncio as redis
+import structlog
+
+from .config import settings
+from .partitions import aggregate_key, partition_for, partition_stream
+
+logger = structlog.get_logger()
+
+# Fields added by EventProcessor._move_to_dlq, stripped before re-injection
+DLQ_FIELDS = ("original_message_id", "original_stream", "error", "moved_at")
+
+
+@dataclass
+class ReplayOptions:
+    """Which DLQ entries to replay and how fast."""
+
+    event_types: list[str] = field(default_factory=list)  # fnmatch patterns
+    error_contains: str | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+    batch_size: int = 500
+    rate_per_second: float = 1000.0  # 0 disables throttling
+    limit: int | None = None
+    dry_run: bool = False
+    delete_replayed: bool = True
+
+
+@dataclass
+class ReplayResult:
+    scanned: int = 0
+    matched: int = 0
+    replayed: int = 0
+    deleted: int = 0
+    by_stream: dict[str, int] = field(default_factory=dict)
+
+
+def _decode_fields(fields: dict[Any, Any]) -> dict[str, str]:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in fields.items()
+    }
+
+
+def _to_stream_id(moment: datetime, upper: bool = False) -> str:
+    """Stream ID bound for a point in time (DLQ IDs carry the time they were moved)."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    ms = int(moment.timestamp() * 1000)
+    return f"{ms}-{'18446744073709551615' if upper else '0'}"
+
+
+def event_type_of(fields: dict[str, str]) -> str:
+    return fields.get("msg_type") or fields.get("typ") or fields.get("event_type", "")
+
+
+def target_stream(fields: dict[str, str]) -> str:
+    """
+    Stream an entry should be replayed into.
+
+    Older DLQ entries don't record their source stream; CRM-originated
+    write-off events came from the internal stream, everything else from the inbox
+    (the aggregate's partition when the inbox is partitioned).
+    """
+    if fields.get("original_stream"):
+        return fields["original_stream"]
+    if event_type_of(fields).startswith("writeoff."):
+        return settings.internal_stream
+    if settings.inbox_partitions > 0:
+        index = partition_for(aggregate_key(fields) or "", settings.inbox_partitions)
+        return partition_stream(settings.inbox_stream, index)
+    return settings.inbox_stream
+
+
+def matches(fields: dict[str, str], options: ReplayOptions) -> bool:
+    """Whether a decoded DLQ entry passes the event type and error filters."""
+    if options.event_types:
+        event_type = event_type_of(fields)
+        if not any(fnmatch.fnmatchcase(event_type, pattern) for pattern in options.event_types):
+            return False
+    if options.error_contains and options.error_contains not in fields.get("error", ""):
+        return False
+    return True
+
+
+async def replay_dlq(
+    client: redis.Redis, options: ReplayOptions, dlq_stream: str | None = None
+) -> ReplayResult:
+    """Replay matching DLQ entries into their original streams."""
+    dlq_stream = dlq_stream or settings.dlq_stream
+    result = ReplayResult()
+    start = _to_stream_id(options.since) if options.since else "-"
+    end = _to_stream_id(options.until, upper=True) if options.until else "+"
+    started_at = time.monotonic()
+
+    while True:
+        entries = await client.xrange(dlq_stream, min=start, max=end, count=options.batch_size)
+        if not entries:
+            break
+
+        batch: list[tuple[Any, str, dict[str, str]]] = []
+        for dlq_id, raw_fields in entries:
+            result.scanned += 1
+            fields = _decode_fields(raw_fields)
+            if not matches(fields, options):
+                continue
+            if options.limit is not None and result.matched >= options.limit:
+                break
+            result.matched += 1
+            batch.append((dlq_id, target_stream(fields), fields))
+
+        if batch and not options.dry_run:
+            await _replay_batch(client, dlq_stream, batch, options, result)
+
+            # Throttle to the configured rate across the whole run
+            if options.rate_per_second > 0:
+                expected = result.replayed / options.rate_per_second
+                elapsed = time.monotonic() - started_at
+                if expected > elapsed:
+                    await asyncio.sleep(expected - elapsed)
+        elif options.dry_run:
+            for _, stream, _ in batch:
+                result.by_stream[stream] = result.by_stream.get(stream, 0) + 1
+
+        if options.limit is not None and result.matched >= options.limit:
+            break
+
+        # Continue after the last entry read (exclusive range start)
+        last_id = entries[-1][0]
+        start = "(" + (last_id.decode() if isinstance(last_id, bytes) else last_id)
+
+    logger.info(
+        "DLQ replay finished",
+        dry_run=options.dry_run,
+        scanned=result.scanned,
+        matched=result.matched,
+        replayed=result.replayed,
+        deleted=result.deleted,
+        by_stream=result.by_stream,
+    )
+    return result
+
+
+async def _replay_batch(
+    client: redis.Redis,
+    dlq_stream: str,
+    batch: list[tuple[Any, str, dict[str, str]]],
+    options: ReplayOptions,
+    result: ReplayResult,
+) -> None:
+    """XADD a batch back to its streams in one pipeline, then XDEL it from the DLQ."""
+    pipe = client.pipeline(transaction=False)
+    for _, stream, fields in batch:
+        pipe.xadd(stream, {k: v for k, v in fields.items() if k not in DLQ_FIELDS})
+    await pipe.execute()
+
+    for _, stream, _ in batch:
+        result.by_stream[stream] = result.by_stream.get(stream, 0) + 1
+    result.replayed += len(batch)
+
+    if options.delete_replayed:
+        result.deleted += await client.xdel(dlq_stream, *[dlq_id for dlq_id, _, _ in batch])
+
+
+def _parse_args(argv: list[str] | None) -> tuple[argparse.Namespace, ReplayOptions]:
+    parser = argparse.ArgumentParser(description="Replay dead-lettered events into their streams")
+    parser.add_argument("--redis-url", default=settings.redis_url)
+    parser.add_argument("--dlq-stream", default=settings.dlq_stream)
+    parser.add_argument(
+        "--event-type", action="append", default=[], help="Event type or glob, e.g. 'account.*'"
+    )
+    parser.add_argument("--error", help="Only entries whose error contains this text")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Moved to DLQ at/after (UTC)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Moved to DLQ at/before (UTC)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--rate", type=float, default=1000.0, help="Entries per second (0 = no limit)"
+    )
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--dry-run", action="store_true", help="Count matches without replaying")
+    parser.add_argument("--keep", action="store_true", help="Don't delete replayed entries")
+    args = parser.parse_args(argv)
+
+    options = ReplayOptions(
+        event_types=args.event_type,
+        error_contains=args.error,
+        since=args.since,
+        until=args.until,
+        batch_size=args.batch_size,
+        rate_per_second=args.rate,
+        limit=args.limit,
+        dry_run=args.dry_run,
+        delete_replayed=not args.keep,
+    )
+    return args, options
+
+
+async def _run(args: argparse.Namespace, options: ReplayOptions) -> ReplayResult:
+    client = redis.from_url(args.redis_url, decode_responses=False)
+    try:
+        return await replay_dlq(client, options, args.dlq_stream)
+    finally:
+        await client.aclose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line entry point."""
+    args, options = _parse_args(argv)
+    result = asyncio.run(_run(args, options))
+
+    action = "Would replay" if options.dry_run else "Replayed"
+    print(f"Scanned {result.scanned} DLQ entries, {result.matched} matched")
+    print(f"{action} {result.matched if options.dry_run else result.replayed} entries:")
+    for stream, count in sorted(result.by_stream.items()):
+        print(f"   - {stream}: {count}")
+    if not options.dry_run:
+        print(f"Deleted {result.deleted} replayed entries from {args.dlq_stream}")
+
+
+if __name__ == "__main__":
+    main()
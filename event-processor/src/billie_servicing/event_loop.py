@@ -0,0 +1,138 @@
+"""Event loop selection and loop-lag monitoring.
+
+Everything the processor does runs on one asyncio loop, so the loop's own
+overhead and any blocking call (a synchronous ``print``, parsing a large
+JSON payload, a slow handler loop) delay every other message.
+
+``EVENT_LOOP=uvloop`` runs the processor on uvloop when it is installed
+(``pip install billie-servicing-processor[uvloop]``), falling back to the
+default loop otherwise.
+
+``LoopLagMonitor`` measures how late the loop runs a timer
+(``event_loop_lag_seconds``). A watchdog thread also notices when the loop
+hasn't checked in for longer than the blocking threshold. It then samples
+the loop thread's stack and charges the blocked time to the code running at
+that moment, so the top blocking call sites can be logged. This works the
+same on both loops, which makes it possible to compare them.
+"""
+
+import asyncio
+import collections
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+import structlog
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+loop_lag = metrics.histogram("event_loop_lag_seconds", "Delay in running a scheduled timer")
+loop_blocked = metrics.counter(
+    "event_loop_blocked_seconds_total", "Time the loop was blocked beyond the threshold"
+)
+
+# Frames from this package identify the call site that blocked the loop
+_PACKAGE = __name__.rpartition(".")[0]
+
+
+def loop_factory(kind: str) -> Callable[[], asyncio.AbstractEventLoop] | None:
+    """Loop factory for ``asyncio.Runner`` ("asyncio" or "uvloop"); None means the default."""
+    if kind == "asyncio":
+        return None
+    if kind != "uvloop":
+        raise ValueError(f"Unknown event loop: {kind!r} (expected 'asyncio' or 'uvloop')")
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop requested but not installed, using the default asyncio loop")
+        return None
+    return uvloop.new_event_loop
+
+
+def blocking_site(frame: Any) -> str:
+    """
+    Describe where a stack is: the innermost frame in this package and,
+    if different, the innermost frame overall.
+    """
+    innermost = frame
+    ours = None
+    while frame is not None:
+        if ours is None and frame.f_globals.get("__name__", "").startswith(_PACKAGE):
+            ours = frame
+        frame = frame.f_back
+
+    def describe(f: Any) -> str:
+        return f"{f.f_code.co_filename.rsplit('/', 1)[-1]}:{f.f_lineno} {f.f_code.co_name}"
+
+    if ours is None or ours is innermost:
+        return describe(innermost)
+    return f"{describe(ours)} -> {describe(innermost)}"
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and samples what the loop was doing while blocked."""
+
+    def __init__(self, interval_seconds: float, block_threshold_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.block_threshold_seconds = block_threshold_seconds
+        self.blocking: collections.Counter[str] = collections.Counter()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    async def run(self, report_interval_seconds: float = 0) -> None:
+        """
+        Measure timer lag until cancelled; starts the watchdog thread.
+
+        Logs a report every ``report_interval_seconds`` (0 = never).
+        """
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        last_report = loop.time()
+        try:
+            while True:
+                scheduled = loop.time()
+                await asyncio.sleep(self.interval_seconds)
+                self._heartbeat = time.monotonic()
+                now = loop.time()
+                loop_lag.observe(max(0.0, now - scheduled - self.interval_seconds))
+                if report_interval_seconds and now - last_report >= report_interval_seconds:
+                    self.report()
+                    last_report = now
+        finally:
+            self._stop.set()
+
+    def _watch(self) -> None:
+        """Watchdog thread: sample the loop's stack while it is blocked."""
+        period = max(0.005, self.block_threshold_seconds / 2)
+        allowed = self.interval_seconds + self.block_threshold_seconds
+        while not self._stop.wait(period):
+            if time.monotonic() - self._heartbeat <= allowed:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)  # noqa: SLF001
+            if frame is not None:
+                self.blocking[blocking_site(frame)] += period
+                loop_blocked.inc(period)
+
+    def top_blocking(self, n: int = 5) -> list[tuple[str, float]]:
+        return [(site, round(seconds, 3)) for site, seconds in self.blocking.most_common(n)]
+
+    def report(self, n: int = 5) -> None:
+        """Log lag quantiles and the top blocking call sites, then reset the sites."""
+        logger.info(
+            "Event loop lag",
+            loop=type(asyncio.get_running_loop()).__module__.split(".")[0],
+            p50=loop_lag.quantile(0.5),
+            p95=loop_lag.quantile(0.95),
+            blocked_seconds=round(sum(self.blocking.values()), 3),
+            top_blocking=self.top_blocking(n),
+        )
+        self.blocking.clear()
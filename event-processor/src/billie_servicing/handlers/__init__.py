@@ -14,12 +14,14 @@ from .customer import (
 from .conversation import (
     handle_conversation_started,
     handle_utterance,
+    UtteranceCoalescer,
     handle_final_decision,
     handle_conversation_summary,
     handle_application_detail_changed,
     handle_assessment,
     handle_noticeboard_updated,
 )
+from .ledger import LedgerIngest
 from .writeoff import (
     handle_writeoff_requested,
     handle_writeoff_approved,
@@ -40,11 +42,14 @@ __all__ = [
     # Conversation handlers
     "handle_conversation_started",
     "handle_utterance",
+    "UtteranceCoalescer",
     "handle_final_decision",
     "handle_conversation_summary",
     "handle_application_detail_changed",
     "handle_assessment",
     "handle_noticeboard_updated",
+    # Ledger handlers
+    "LedgerIngest",
     # Write-off handlers (CRM-originated events)
     "handle_writeoff_requested",
     "handle_writeoff_approved",
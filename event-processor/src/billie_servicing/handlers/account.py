@@ -13,6 +13,17 @@ from typing import Any
 
 import structlog
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from ..reorder import in_sequence
+from .counters import ACCOUNTS_BY_STATUS, transition
+from .summary import (
+    ACCOUNT_PROJECTION,
+    account_after,
+    apply_account_change,
+    payment_date,
+    record_payment,
+)
 
 logger = structlog.get_logger()
 
@@ -76,59 +87,117 @@ async def handle_account_created(db: AsyncIOMotorDatabase, parsed_event: Any) ->
         "updatedAt": datetime.utcnow(),
     }
 
-    result = await db["loan-accounts"].update_one(
+    # The previous state (None if new) gives the customer summary deltas
+    before = await db["loan-accounts"].find_one_and_update(
         {"loanAccountId": account_id},
         {
             "$set": document,
             "$setOnInsert": {"createdAt": datetime.utcnow()},
         },
+        projection=ACCOUNT_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
         upsert=True,
     )
 
-    log.info(
-        "Loan account upserted",
-        matched=result.matched_count,
-        modified=result.modified_count,
-        upserted_id=str(result.upserted_id) if result.upserted_id else None,
-    )
+    log.info("Loan account upserted", created=before is None)
 
+    await apply_account_change(db, before, document)
+    await transition(db, ACCOUNTS_BY_STATUS, (before or {}).get("accountStatus"), account_status)
 
-async def handle_account_updated(db: AsyncIOMotorDatabase, parsed_event: Any) -> None:
-    """
-    Handle account.updated.v1 event.
 
-    Fields: account_id, current_balance, status, last_payment_date, last_payment_amount
-    """
-    payload = parsed_event.payload
-    account_id = payload.account_id
+def _sdk_status(value: Any) -> str:
+    """SDK status name without its enum prefix (e.g. "AccountStatus.ACTIVE" -> "ACTIVE")."""
+    sdk_status = str(value)
+    if "." in sdk_status:
+        sdk_status = sdk_status.split(".")[-1]
+    return sdk_status
 
-    log = logger.bind(account_id=account_id)
-    log.info("Processing account.updated.v1")
 
-    update_doc: dict[str, Any] = {"updatedAt": datetime.utcnow()}
+def account_update_fields(payload: Any) -> dict[str, Any]:
+    """Loan account fields set by an account.updated.v1 payload."""
+    fields: dict[str, Any] = {}
 
     if payload.current_balance is not None:
-        update_doc["balances.currentBalance"] = float(payload.current_balance)
-        update_doc["balances.totalOutstanding"] = float(payload.current_balance)
+        fields["balances.currentBalance"] = float(payload.current_balance)
+        fields["balances.totalOutstanding"] = float(payload.current_balance)
 
     if payload.status:
-        sdk_status = str(payload.status)
-        if "." in sdk_status:
-            sdk_status = sdk_status.split(".")[-1]
-        update_doc["sdkStatus"] = sdk_status
-        update_doc["accountStatus"] = SDK_STATUS_MAP.get(sdk_status, "active")
+        sdk_status = _sdk_status(payload.status)
+        fields["sdkStatus"] = sdk_status
+        fields["accountStatus"] = SDK_STATUS_MAP.get(sdk_status, "active")
 
     if hasattr(payload, "last_payment_date") and payload.last_payment_date:
-        update_doc["lastPayment.date"] = payload.last_payment_date
+        fields["lastPayment.date"] = payload.last_payment_date
 
     if hasattr(payload, "last_payment_amount") and payload.last_payment_amount is not None:
-        update_doc["lastPayment.amount"] = float(payload.last_payment_amount)
+        fields["lastPayment.amount"] = float(payload.last_payment_amount)
 
-    result = await db["loan-accounts"].update_one(
-        {"loanAccountId": account_id}, {"$set": update_doc}
+    return fields
+
+
+def status_change_fields(payload: Any) -> dict[str, Any]:
+    """Loan account fields set by an account.status_changed.v1 payload."""
+    sdk_status = _sdk_status(payload.new_status)
+    return {"sdkStatus": sdk_status, "accountStatus": SDK_STATUS_MAP.get(sdk_status, "active")}
+
+
+async def apply_account_update(
+    db: AsyncIOMotorDatabase, account_id: str, fields: dict[str, Any]
+) -> dict[str, Any] | None:
+    """
+    Set ``fields`` on an existing loan account and update the projections derived
+    from it (status counter, customer summary, last payment).
+
+    Returns the account's previous state, or None if there is no such account.
+    """
+    before = await db["loan-accounts"].find_one_and_update(
+        {"loanAccountId": account_id},
+        {"$set": {**fields, "updatedAt": datetime.utcnow()}},
+        projection=ACCOUNT_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
     )
+    if before is None:
+        return None
 
-    log.info("Loan account updated", matched=result.matched_count, modified=result.modified_count)
+    if "accountStatus" in fields:
+        await transition(
+            db, ACCOUNTS_BY_STATUS, before.get("accountStatus"), fields["accountStatus"]
+        )
+    await apply_account_change(
+        db,
+        before,
+        account_after(
+            before,
+            status=fields.get("accountStatus"),
+            outstanding=fields.get("balances.totalOutstanding"),
+        ),
+    )
+    if "lastPayment.date" in fields:
+        await record_payment(
+            db,
+            before.get("customerIdString"),
+            account_id,
+            payment_date(fields["lastPayment.date"]),
+            fields.get("lastPayment.amount"),
+        )
+    return before
+
+
+async def handle_account_updated(db: AsyncIOMotorDatabase, parsed_event: Any) -> None:
+    """
+    Handle account.updated.v1 event.
+
+    Fields: account_id, current_balance, status, last_payment_date, last_payment_amount
+    """
+    payload = parsed_event.payload
+    account_id = payload.account_id
+
+    log = logger.bind(account_id=account_id)
+    log.info("Processing account.updated.v1")
+
+    before = await apply_account_update(db, account_id, account_update_fields(payload))
+
+    log.info("Loan account updated", matched=before is not None)
 
 
 async def handle_account_status_changed(db: AsyncIOMotorDatabase, parsed_event: Any) -> None:
@@ -143,27 +212,14 @@ async def handle_account_status_changed(db: AsyncIOMotorDatabase, parsed_event:
     log = logger.bind(account_id=account_id)
     log.info("Processing account.status_changed.v1")
 
-    sdk_status = str(payload.new_status)
-    if "." in sdk_status:
-        sdk_status = sdk_status.split(".")[-1]
-    account_status = SDK_STATUS_MAP.get(sdk_status, "active")
-
-    result = await db["loan-accounts"].update_one(
-        {"loanAccountId": account_id},
-        {
-            "$set": {
-                "sdkStatus": sdk_status,
-                "accountStatus": account_status,
-                "updatedAt": datetime.utcnow(),
-            }
-        },
-    )
+    fields = status_change_fields(payload)
+    before = await apply_account_update(db, account_id, fields)
 
     log.info(
         "Account status changed",
-        new_status=account_status,
-        matched=result.matched_count,
-        modified=result.modified_count,
+        new_status=fields["accountStatus"],
+        previous_status=(before or {}).get("accountStatus"),
+        matched=before is not None,
     )
 
 
@@ -172,7 +228,8 @@ async def handle_schedule_created(db: AsyncIOMotorDatabase, parsed_event: Any) -
     Handle account.schedule.created.v1 event.
 
     Adds repayment schedule to loan account.
-    Preserves existing payment statuses to handle out-of-order event processing
+    Unless the reorder buffer released this event in sequence, preserves
+    existing payment statuses to handle out-of-order event processing
     (e.g., if schedule.updated arrived before schedule.created).
 
     Fields: account_id, schedule_id, loan_amount, total_amount, fee,
@@ -186,11 +243,14 @@ async def handle_schedule_created(db: AsyncIOMotorDatabase, parsed_event: Any) -
     log = logger.bind(account_id=account_id, schedule_id=payload.schedule_id)
     log.info("Processing account.schedule.created.v1")
 
-    # Check if schedule already exists with payment statuses (out-of-order handling)
-    existing_account = await db["loan-accounts"].find_one(
-        {"loanAccountId": account_id},
-        {"repaymentSchedule.payments": 1},
-    )
+    # Check if schedule already exists with payment statuses (out-of-order handling).
+    # In sequence, no schedule.updated can have been applied yet: skip the read
+    existing_account = None
+    if not in_sequence():
+        existing_account = await db["loan-accounts"].find_one(
+            {"loanAccountId": account_id},
+            {"repaymentSchedule.payments": 1},
+        )
 
     # Build a lookup of existing payment statuses
     existing_statuses: dict[int, dict[str, Any]] = {}
@@ -273,6 +333,8 @@ async def handle_schedule_updated(db: AsyncIOMotorDatabase, parsed_event: Any) -
 
     If the schedule/payment doesn't exist yet (out-of-order processing),
     creates placeholder entries that will be enriched when schedule.created arrives.
+    Events released in sequence by the reorder buffer follow schedule.created,
+    so a missing payment is logged instead.
 
     Fields: account_id, schedule_id, payments[]
     Payments[]: payment_number, status, paid_date (optional), paid_amount (optional)
@@ -294,8 +356,10 @@ async def handle_schedule_updated(db: AsyncIOMotorDatabase, parsed_event: Any) -
     # Update each payment's status individually
     # Using positional operator $ to update specific array elements
     total_matched = 0
-    total_modified = 0
     total_created = 0
+    # Most recent payment made, for the customer summary
+    latest_payment: tuple[datetime, float | None] | None = None
+    customer_id = None
 
     for payment in payment_updates:
         payment_number = payment.payment_number
@@ -337,18 +401,31 @@ async def handle_schedule_updated(db: AsyncIOMotorDatabase, parsed_event: Any) -
         if hasattr(payment, "last_updated") and payment.last_updated:
             update_fields["repaymentSchedule.payments.$.lastUpdated"] = str(payment.last_updated)
 
-        # Try to update the specific payment in the array
-        result = await db["loan-accounts"].update_one(
+        # Try to update the specific payment in the array; the account's summary
+        # fields come back with it (None if the payment isn't there)
+        account = await db["loan-accounts"].find_one_and_update(
             {
                 "loanAccountId": account_id,
                 "repaymentSchedule.payments.paymentNumber": payment_number,
             },
             {"$set": update_fields},
+            projection=ACCOUNT_PROJECTION,
         )
 
-        if result.matched_count > 0:
-            total_matched += result.matched_count
-            total_modified += result.modified_count
+        if paid_date:
+            paid_at = payment_date(payment.paid_date)
+            if latest_payment is None or paid_at > latest_payment[0]:
+                latest_payment = (paid_at, amount_paid)
+
+        if account is not None:
+            total_matched += 1
+            customer_id = account.get("customerIdString") or customer_id
+        elif in_sequence():
+            log.warning(
+                "Payment not in repayment schedule",
+                payment_number=payment_number,
+                new_status=new_status,
+            )
         else:
             # Payment not found - create placeholder for out-of-order handling
             # This will be enriched when schedule.created arrives
@@ -399,15 +476,15 @@ async def handle_schedule_updated(db: AsyncIOMotorDatabase, parsed_event: Any) -
             "Payment status updated",
             payment_number=payment_number,
             new_status=new_status,
-            matched=result.matched_count,
-            modified=result.modified_count,
+            matched=account is not None,
         )
 
     log.info(
         "Repayment schedule updated",
         payments_processed=len(payment_updates),
         total_matched=total_matched,
-        total_modified=total_modified,
         placeholders_created=total_created,
     )
 
+    if latest_payment is not None:
+        await record_payment(db, customer_id, account_id, *latest_payment)
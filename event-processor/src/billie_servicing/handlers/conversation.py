@@ -13,11 +13,17 @@ Handles all chat/conversation events (ported from worker.ts):
 - conversation_summary
 """
 
+import asyncio
 from datetime import datetime
 from typing import Any
 
 import structlog
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from ..coalescing import WriteCoalescer
+from .counters import CONVERSATIONS_BY_STATUS, transition
+from .customer import fan_out_customer_name
 
 logger = structlog.get_logger()
 
@@ -64,20 +70,20 @@ async def handle_conversation_started(db: AsyncIOMotorDatabase, event: dict[str,
         "version": 1,
     }
 
-    result = await db.conversations.update_one(
+    before = await db.conversations.find_one_and_update(
         {"conversationId": conversation_id},
         {
             "$set": document,
             "$setOnInsert": {"createdAt": datetime.utcnow()},
         },
+        projection={"status": 1},
+        return_document=ReturnDocument.BEFORE,
         upsert=True,
     )
 
-    log.info(
-        "Conversation created",
-        matched=result.matched_count,
-        upserted_id=str(result.upserted_id) if result.upserted_id else None,
-    )
+    log.info("Conversation created", created=before is None)
+
+    await transition(db, CONVERSATIONS_BY_STATUS, (before or {}).get("status"), "active")
 
 
 async def handle_utterance(db: AsyncIOMotorDatabase, event: dict[str, Any]) -> None:
@@ -86,42 +92,13 @@ async def handle_utterance(db: AsyncIOMotorDatabase, event: dict[str, Any]) -> N
 
     Appends utterance to conversation.
     """
-    conversation_id = event.get("cid") or event.get("conv") or event.get("conversation_id")
+    conversation_id = _get_conversation_id(event)
     event_type = event.get("msg_type") or event.get("typ") or event.get("event_type", "")
 
     log = logger.bind(conversation_id=conversation_id, event_type=event_type)
     log.info("Processing utterance")
 
-    # Determine speaker
-    username = "customer" if event_type == "user_input" else "assistant"
-
-    # Get utterance content from payload or event
-    payload = event.get("payload", {})
-    if isinstance(payload, dict):
-        utterance_text = payload.get("utterance", "")
-        created_at = payload.get("created_at")
-        rationale = payload.get("rationale")
-        answer_input_type = payload.get("answer_input_type")
-        end_conversation = payload.get("end_conversation", False)
-        additional_data = payload.get("additional_data")
-    else:
-        utterance_text = event.get("utterance", "")
-        created_at = event.get("created_at")
-        rationale = event.get("rationale")
-        answer_input_type = event.get("answer_input_type")
-        end_conversation = event.get("end_conversation", False)
-        additional_data = event.get("additional_data")
-
-    utterance = {
-        "username": username,
-        "utterance": utterance_text,
-        "rationale": rationale,
-        "createdAt": created_at or datetime.utcnow(),
-        "answerInputType": answer_input_type,
-        "prevSeq": event.get("prev_seq") or event.get("seq"),
-        "endConversation": end_conversation,
-        "additionalData": additional_data,
-    }
+    utterance = _build_utterance(event)
 
     # Ensure conversation exists
     await _ensure_conversation_exists(db, conversation_id, event)
@@ -140,12 +117,44 @@ async def handle_utterance(db: AsyncIOMotorDatabase, event: dict[str, Any]) -> N
 
     log.info(
         "Utterance added",
-        username=username,
+        username=utterance["username"],
         matched=result.matched_count,
         modified=result.modified_count,
     )
 
 
+class UtteranceCoalescer:
+    """
+    Coalescing variant of handle_utterance.
+
+    Utterances for the same conversation that arrive within ``window_ms`` of
+    each other (up to ``max_events``) are appended with a single
+    ``$push: {$each: [...]}`` and a matching ``$inc`` of the version. Order is
+    preserved, and awaiting the handler only returns once the write containing
+    the utterance has completed.
+
+    The processor detects ``submit``/``flush`` and submits consecutive
+    utterances without waiting for each write in turn.
+    """
+
+    def __init__(self, window_ms: int, max_events: int) -> None:
+        self._coalescer: WriteCoalescer[tuple[dict[str, Any], dict[str, Any]]] = WriteCoalescer(
+            _append_utterances, window_ms=window_ms, max_items=max_events
+        )
+
+    async def __call__(self, db: AsyncIOMotorDatabase, event: dict[str, Any]) -> None:
+        await self.submit(db, event)
+
+    def submit(self, db: AsyncIOMotorDatabase, event: dict[str, Any]) -> asyncio.Future[None]:
+        """Buffer an utterance event; the future resolves once it has been written."""
+        conversation_id = _get_conversation_id(event)
+        return self._coalescer.submit(db, conversation_id, (_build_utterance(event), event))
+
+    async def flush(self) -> None:
+        """Write all buffered utterances now."""
+        await self._coalescer.flush()
+
+
 async def handle_application_detail_changed(
     db: AsyncIOMotorDatabase, event: dict[str, Any]
 ) -> None:
@@ -305,7 +314,7 @@ async def handle_final_decision(db: AsyncIOMotorDatabase, event: dict[str, Any])
     }
     status = status_map.get(decision, "hard_end")
 
-    result = await db.conversations.update_one(
+    before = await db.conversations.find_one_and_update(
         {"conversationId": conversation_id},
         {
             "$set": {
@@ -315,15 +324,20 @@ async def handle_final_decision(db: AsyncIOMotorDatabase, event: dict[str, Any])
             },
             "$inc": {"version": 1},
         },
+        projection={"status": 1},
+        return_document=ReturnDocument.BEFORE,
     )
 
     log.info(
         "Final decision recorded",
         status=status,
-        matched=result.matched_count,
-        modified=result.modified_count,
+        previous_status=(before or {}).get("status"),
+        matched=before is not None,
     )
 
+    if before is not None:
+        await transition(db, CONVERSATIONS_BY_STATUS, before.get("status"), status)
+
 
 async def handle_conversation_summary(db: AsyncIOMotorDatabase, event: dict[str, Any]) -> None:
     """
@@ -369,6 +383,79 @@ async def handle_conversation_summary(db: AsyncIOMotorDatabase, event: dict[str,
 # =============================================================================
 
 
+def _get_conversation_id(event: dict[str, Any]) -> str:
+    """Get the conversation ID from any of the envelope fields that carry it."""
+    return event.get("cid") or event.get("conv") or event.get("conversation_id")
+
+
+def _build_utterance(event: dict[str, Any]) -> dict[str, Any]:
+    """Build the utterance subdocument for a user_input/assistant_response event."""
+    event_type = event.get("msg_type") or event.get("typ") or event.get("event_type", "")
+
+    # Determine speaker
+    username = "customer" if event_type == "user_input" else "assistant"
+
+    # Get utterance content from payload or event
+    payload = event.get("payload", {})
+    if isinstance(payload, dict):
+        utterance_text = payload.get("utterance", "")
+        created_at = payload.get("created_at")
+        rationale = payload.get("rationale")
+        answer_input_type = payload.get("answer_input_type")
+        end_conversation = payload.get("end_conversation", False)
+        additional_data = payload.get("additional_data")
+    else:
+        utterance_text = event.get("utterance", "")
+        created_at = event.get("created_at")
+        rationale = event.get("rationale")
+        answer_input_type = event.get("answer_input_type")
+        end_conversation = event.get("end_conversation", False)
+        additional_data = event.get("additional_data")
+
+    return {
+        "username": username,
+        "utterance": utterance_text,
+        "rationale": rationale,
+        "createdAt": created_at or datetime.utcnow(),
+        "answerInputType": answer_input_type,
+        "prevSeq": event.get("prev_seq") or event.get("seq"),
+        "endConversation": end_conversation,
+        "additionalData": additional_data,
+    }
+
+
+async def _append_utterances(
+    db: AsyncIOMotorDatabase,
+    conversation_id: str,
+    items: list[tuple[dict[str, Any], dict[str, Any]]],
+) -> None:
+    """Append a run of (utterance, event) pairs to a conversation in one write."""
+    utterances = [utterance for utterance, _ in items]
+
+    # Ensure conversation exists
+    await _ensure_conversation_exists(db, conversation_id, items[0][1])
+
+    result = await db.conversations.update_one(
+        {"conversationId": conversation_id},
+        {
+            "$push": {"utterances": {"$each": utterances}},
+            "$set": {
+                "updatedAt": datetime.utcnow(),
+                "lastUtteranceTime": utterances[-1]["createdAt"],
+            },
+            "$inc": {"version": len(utterances)},
+        },
+    )
+
+    logger.info(
+        "Utterances added",
+        conversation_id=conversation_id,
+        count=len(utterances),
+        matched=result.matched_count,
+        modified=result.modified_count,
+    )
+
+
 async def _ensure_conversation_exists(
     db: AsyncIOMotorDatabase, conversation_id: str, event: dict[str, Any]
 ) -> None:
@@ -394,6 +481,7 @@ async def _ensure_conversation_exists(
                 "version": 1,
             }
         )
+        await transition(db, CONVERSATIONS_BY_STATUS, None, "active")
 
 
 async def _sync_customer(
@@ -483,3 +571,6 @@ async def _sync_customer(
     )
 
     log.info("Customer synced from conversation")
+
+    # Always fanned out (see apply_customer_changes)
+    await fan_out_customer_name(db, customer_id, full_name)
@@ -0,0 +1,88 @@
+"""Dashboard counters (``dashboard-counters``).
+
+The dashboard and the approvals view show counts such as pending write-offs
+by priority, loan accounts by status and conversations by status. Rather
+than counting a whole collection per view, the handlers keep one counter
+document per (counter, key) current with atomic ``$inc`` on every state
+transition::
+
+    {"_id": "accounts_by_status:active", "counter": "accounts_by_status",
+     "key": "active", "value": 1423}
+
+Handlers learn the previous state atomically with their write
+(``find_one_and_update`` returning the previous document), so a redelivered
+event whose transition already happened changes no counter. A new write-off
+request carries a ``pendingCounted`` flag that one delivery flips before
+counting it, so a redelivery also adds a request the first attempt inserted
+but didn't count. Counters can
+still drift (a failure between the handler's write and the counter update,
+or manual edits); ``billie-servicing-reconcile`` recounts them from the
+collections and corrects the difference.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+import structlog
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = structlog.get_logger()
+
+COLLECTION = "dashboard-counters"
+
+PENDING_WRITEOFFS_BY_PRIORITY = "pending_writeoffs_by_priority"
+ACCOUNTS_BY_STATUS = "accounts_by_status"
+CONVERSATIONS_BY_STATUS = "conversations_by_status"
+
+
+@dataclass(frozen=True)
+class CounterSpec:
+    """What a counter counts: documents in ``collection`` matching ``match``, by ``key_field``."""
+
+    collection: str
+    key_field: str
+    match: dict[str, Any] = field(default_factory=dict)
+
+
+COUNTERS: dict[str, CounterSpec] = {
+    PENDING_WRITEOFFS_BY_PRIORITY: CounterSpec(
+        "write-off-requests", "priority", {"status": "pending"}
+    ),
+    ACCOUNTS_BY_STATUS: CounterSpec("loan-accounts", "accountStatus"),
+    CONVERSATIONS_BY_STATUS: CounterSpec("conversations", "status"),
+}
+
+
+def counter_update(counter: str, key: str, delta: int) -> UpdateOne:
+    """Upsert adding ``delta`` to one counter key."""
+    return UpdateOne(
+        {"_id": f"{counter}:{key}"},
+        {
+            "$inc": {"value": delta},
+            "$set": {"updatedAt": datetime.utcnow()},
+            "$setOnInsert": {"counter": counter, "key": key},
+        },
+        upsert=True,
+    )
+
+
+async def transition(
+    db: AsyncIOMotorDatabase, counter: str, before: str | None, after: str | None
+) -> None:
+    """
+    Move one item from key ``before`` to key ``after`` of a counter.
+
+    None means the item was not counted on that side (new document, or one
+    that left the counted set). Nothing is written when the keys are equal.
+    """
+    if before == after:
+        return
+    updates = []
+    if before is not None:
+        updates.append(counter_update(counter, before, -1))
+    if after is not None:
+        updates.append(counter_update(counter, after, 1))
+    await db[COLLECTION].bulk_write(updates, ordered=False)
+    logger.debug("Counter moved", counter=counter, before=before, after=after)
@@ -13,9 +13,46 @@ from typing import Any
 import structlog
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from ..deferred import defer_write
+
 logger = structlog.get_logger()
 
 
+# SDK payload fields a customer event may set (events may be partial updates)
+CUSTOMER_FIELDS = (
+    "first_name",
+    "last_name",
+    "email_address",
+    "mobile_phone_number",
+    "date_of_birth",
+    "ekyc_status",
+    "residential_address",
+)
+
+# Map SDK fields to Payload fields
+_FIELD_MAPPINGS = {
+    "first_name": "firstName",
+    "last_name": "lastName",
+    "email_address": "emailAddress",
+    "mobile_phone_number": "mobilePhoneNumber",
+    "date_of_birth": "dateOfBirth",
+    "ekyc_status": "ekycStatus",
+}
+
+
+def customer_changes(payload: Any) -> dict[str, Any]:
+    """The SDK fields a customer event payload sets; absent ones are left out."""
+    changes: dict[str, Any] = {}
+    for sdk_field in CUSTOMER_FIELDS:
+        value = getattr(payload, sdk_field, None)
+        if value is None:
+            continue
+        if sdk_field == "residential_address" and not value:
+            continue
+        changes[sdk_field] = value
+    return changes
+
+
 async def handle_customer_changed(db: AsyncIOMotorDatabase, parsed_event: Any) -> None:
     """
     Handle customer.changed.v1, customer.created.v1, customer.updated.v1 events.
@@ -26,8 +63,13 @@ async def handle_customer_changed(db: AsyncIOMotorDatabase, parsed_event: Any) -
             residential_address, changed_at
     """
     payload = parsed_event.payload
-    customer_id = payload.customer_id
+    await apply_customer_changes(db, payload.customer_id, customer_changes(payload))
+
 
+async def apply_customer_changes(
+    db: AsyncIOMotorDatabase, customer_id: str, changes: dict[str, Any]
+) -> None:
+    """Merge ``changes`` (as built by ``customer_changes``) into a customer document."""
     log = logger.bind(customer_id=customer_id)
     log.info("Processing customer event")
 
@@ -35,8 +77,8 @@ async def handle_customer_changed(db: AsyncIOMotorDatabase, parsed_event: Any) -
     existing = await db.customers.find_one({"customerId": customer_id})
 
     # Build full name
-    first = getattr(payload, "first_name", None) or (existing or {}).get("firstName", "")
-    last = getattr(payload, "last_name", None) or (existing or {}).get("lastName", "")
+    first = changes.get("first_name") or (existing or {}).get("firstName", "")
+    last = changes.get("last_name") or (existing or {}).get("lastName", "")
     full_name = f"{first} {last}".strip()
 
     update_doc: dict[str, Any] = {
@@ -45,24 +87,13 @@ async def handle_customer_changed(db: AsyncIOMotorDatabase, parsed_event: Any) -
         "updatedAt": datetime.utcnow(),
     }
 
-    # Map SDK fields to Payload fields
-    field_mappings = {
-        "first_name": "firstName",
-        "last_name": "lastName",
-        "email_address": "emailAddress",
-        "mobile_phone_number": "mobilePhoneNumber",
-        "date_of_birth": "dateOfBirth",
-        "ekyc_status": "ekycStatus",
-    }
-
-    for sdk_field, payload_field in field_mappings.items():
-        value = getattr(payload, sdk_field, None)
-        if value is not None:
-            update_doc[payload_field] = value
+    for sdk_field, payload_field in _FIELD_MAPPINGS.items():
+        if sdk_field in changes:
+            update_doc[payload_field] = changes[sdk_field]
 
     # Handle residential address
-    if hasattr(payload, "residential_address") and payload.residential_address:
-        addr = payload.residential_address
+    if "residential_address" in changes:
+        addr = changes["residential_address"]
         update_doc["residentialAddress"] = {
             "streetNumber": getattr(addr, "street_number", None),
             "streetName": getattr(addr, "street_name", None),
@@ -95,6 +126,38 @@ async def handle_customer_changed(db: AsyncIOMotorDatabase, parsed_event: Any) -
         upserted_id=str(result.upserted_id) if result.upserted_id else None,
     )
 
+    # Loan accounts carry a copy of the name. Fanned out even when the customer
+    # already had it: a redelivery after a failed fan-out must still repair the
+    # accounts, and the fan-out's $ne filter makes the no-op case cheap
+    if full_name:
+        await fan_out_customer_name(db, customer_id, full_name)
+
+
+async def fan_out_customer_name(db: AsyncIOMotorDatabase, customer_id: str, full_name: str) -> None:
+    """
+    Copy a customer's name to their loan accounts (``customerName``).
+
+    Deferred to the end of the processing batch when there is one, so several
+    changes to one customer in a batch cost a single write with the latest
+    name. Uses the ``customerIdString`` index; accounts that already have the
+    name are not modified, so calling it for an unchanged name costs one
+    index lookup.
+    """
+
+    async def write() -> None:
+        result = await db["loan-accounts"].update_many(
+            {"customerIdString": customer_id, "customerName": {"$ne": full_name}},
+            {"$set": {"customerName": full_name, "updatedAt": datetime.utcnow()}},
+        )
+        logger.info(
+            "Customer name fanned out to loan accounts",
+            customer_id=customer_id,
+            modified=result.modified_count,
+        )
+
+    if defer_write(f"customer-name:{customer_id}", write) is None:
+        await write()
+
 
 def _build_street_address(addr: Any) -> str:
     """Build a single-line street address from components."""
@@ -0,0 +1,250 @@
+"""Ledger event handlers using Billie Ledger SDK.
+
+Handles events:
+- ledger.transaction.posted.v1
+- ledger.transaction.reversed.v1
+
+Each transaction is stored as one measurement in the ``ledger-transactions``
+time-series collection (see ``indexes.REQUIRED_TIME_SERIES``), with
+``transactionDate`` as the time field and ``loanAccountId`` as the meta
+field, so MongoDB buckets an account's transactions together. An account's
+history, filtered by date range and type, is read from a handful of buckets
+on the ``loanAccountId``/``transactionDate`` index instead of a call to the
+ledger service.
+
+The event payload carries the ledger's ``Transaction`` message
+(proto/accounting_ledger.proto); the document keeps every field
+GET /api/ledger/transactions returns::
+
+    {
+        "transactionDate": datetime,
+        "loanAccountId": "ACC-...",
+        "transactionId": "TXN-...",
+        "type": "REPAYMENT",
+        "effectiveDate": "2024-02-05",
+        "principalDelta": -120.0,
+        "feeDelta": -25.0,
+        "totalDelta": -145.0,
+        "principalAfter": 1000.0,
+        "feeAfter": 95.5,
+        "totalAfter": 1095.5,
+        "description": "...",
+        "referenceType": "...",
+        "referenceId": "...",
+        "createdBy": "...",
+        "createdAt": datetime,
+        "notes": "...",
+    }
+
+A reversal is a transaction of its own, pointing at the original through
+``referenceType``/``referenceId``.
+
+Transactions are inserted in bulk by ``LedgerIngest``. Time-series
+collections cannot have unique indexes, so each transaction ID is first
+claimed in ``ledger-transaction-claims``, an ordinary collection keyed by
+``_id``, in the same flush. Only the flush whose claim succeeds inserts the
+transaction, so concurrent consumers and redeliveries don't add it twice.
+
+Rows an insert reports as failed have their claims released. A
+transaction whose claim exists but whose row doesn't (its claimer died
+between the two writes, or lost its connection) is taken over once the
+claim is older than ``CLAIM_LEASE``. Until then flushes that include it
+fail, and its event may end up in the DLQ; a replay after the lease
+inserts it.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import structlog
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+
+from ..coalescing import WriteCoalescer
+
+logger = structlog.get_logger()
+
+COLLECTION = "ledger-transactions"
+CLAIMS = "ledger-transaction-claims"
+
+# Longer than any flush takes; an unfinished claim this old was abandoned
+CLAIM_LEASE = timedelta(minutes=5)
+
+_DUPLICATE_KEY = 11000
+
+# All transactions share one buffer, so each flush is a single insert_many
+_INGEST_KEY = "ledger"
+
+
+def _enum_name(value: Any) -> str | None:
+    """SDK enum value without its prefix (e.g. "TransactionType.REPAYMENT" -> "REPAYMENT")."""
+    if value is None:
+        return None
+    return str(value).split(".")[-1]
+
+
+def _as_datetime(value: Any) -> datetime | None:
+    """
+    A timestamp as a naive UTC datetime, like every other stored date.
+
+    Time-series time fields must be BSON dates; the SDK may give datetimes,
+    protobuf Timestamps or ISO strings.
+    """
+    if value is None or value == "":
+        return None
+    if hasattr(value, "ToDatetime"):
+        return value.ToDatetime()
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _amount(value: Any) -> float | None:
+    """Ledger amounts are decimal strings; unset proto3 strings are empty."""
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def transaction_document(parsed_event: Any) -> dict[str, Any]:
+    """
+    The ledger-transactions document for a transaction event.
+
+    SDK Models: TransactionPostedV1, TransactionReversedV1 (ledger Transaction)
+    Fields: transaction_id, loan_account_id, type, transaction_date, effective_date,
+            principal_delta, fee_delta, total_delta, principal_after, fee_after,
+            total_after, description, reference_type, reference_id, created_by,
+            created_at, notes (optional)
+    """
+    payload = parsed_event.payload
+    return {
+        "transactionDate": _as_datetime(payload.transaction_date),
+        "loanAccountId": payload.loan_account_id,
+        "transactionId": payload.transaction_id,
+        "type": _enum_name(payload.type),
+        "effectiveDate": payload.effective_date or None,
+        "principalDelta": _amount(payload.principal_delta),
+        "feeDelta": _amount(payload.fee_delta),
+        "totalDelta": _amount(payload.total_delta),
+        "principalAfter": _amount(payload.principal_after),
+        "feeAfter": _amount(payload.fee_after),
+        "totalAfter": _amount(payload.total_after),
+        "description": payload.description,
+        "referenceType": payload.reference_type or None,
+        "referenceId": payload.reference_id or None,
+        "createdBy": payload.created_by or None,
+        "createdAt": _as_datetime(payload.created_at),
+        "notes": getattr(payload, "notes", None) or None,
+        "ingestedAt": datetime.utcnow(),
+    }
+
+
+async def _claim(
+    db: AsyncIOMotorDatabase, documents: dict[str, dict[str, Any]], now: datetime
+) -> tuple[set[str], set[str], list[str]]:
+    """
+    Claim transaction IDs for insertion.
+
+    Returns the IDs this flush should insert, the ones already stored, and
+    the ones another flush claimed recently but hasn't stored yet.
+    """
+    taken: set[str] = set()
+    try:
+        await db[CLAIMS].insert_many(
+            [{"_id": transaction_id, "claimedAt": now} for transaction_id in documents],
+            ordered=False,
+        )
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != _DUPLICATE_KEY for error in errors):
+            raise
+        taken = {error["op"]["_id"] for error in errors}
+
+    claimed = set(documents) - taken
+    if not taken:
+        return claimed, set(), []
+
+    stored = {
+        doc["transactionId"]
+        async for doc in db[COLLECTION].find(
+            {
+                "loanAccountId": {"$in": sorted({documents[t]["loanAccountId"] for t in taken})},
+                "transactionId": {"$in": sorted(taken)},
+            },
+            {"transactionId": 1, "_id": 0},
+        )
+    }
+
+    in_progress = []
+    for transaction_id in sorted(taken - stored):
+        # Only one flush can move an abandoned claim's timestamp forward
+        result = await db[CLAIMS].update_one(
+            {"_id": transaction_id, "claimedAt": {"$lt": now - CLAIM_LEASE}},
+            {"$set": {"claimedAt": now}},
+        )
+        if result.modified_count:
+            claimed.add(transaction_id)
+        else:
+            in_progress.append(transaction_id)
+    return claimed, stored, in_progress
+
+
+async def insert_transactions(
+    db: AsyncIOMotorDatabase, key: str, documents: list[dict[str, Any]]
+) -> None:
+    """Insert the transactions this flush claims in one unordered bulk insert."""
+    by_id = {document["transactionId"]: document for document in documents}
+    now = datetime.utcnow()
+    claimed, stored, in_progress = await _claim(db, by_id, now)
+    new = [document for transaction_id, document in by_id.items() if transaction_id in claimed]
+
+    if new:
+        try:
+            await db[COLLECTION].insert_many(new, ordered=False)
+        except BulkWriteError as e:
+            # Release the claims of the rows known not to be stored, so their retry
+            # doesn't wait out the lease (the others were inserted)
+            failed = [new[error["index"]]["transactionId"] for error in e.details["writeErrors"]]
+            await db[CLAIMS].delete_many({"_id": {"$in": failed}, "claimedAt": now})
+            raise
+
+    logger.info(
+        "Ledger transactions ingested",
+        inserted=len(new),
+        duplicates=len(stored),
+        in_progress=len(in_progress),
+    )
+    if in_progress:
+        # Fails the flush; its events are retried once the other claim has finished
+        raise RuntimeError(f"Ledger transactions claimed by another consumer: {in_progress}")
+
+
+class LedgerIngest:
+    """
+    Bulk ingestion of ledger transaction events.
+
+    Transactions are buffered and inserted with one ``insert_many`` once
+    ``max_events`` are waiting or ``window_ms`` has passed, whichever is
+    first; the processor also flushes the buffer before any other event and
+    at the end of each batch. Awaiting the handler only returns once the
+    insert containing the transaction has completed.
+    """
+
+    def __init__(self, window_ms: int, max_events: int) -> None:
+        self._coalescer: WriteCoalescer[dict[str, Any]] = WriteCoalescer(
+            insert_transactions, window_ms=window_ms, max_items=max_events
+        )
+
+    async def __call__(self, db: AsyncIOMotorDatabase, parsed_event: Any) -> None:
+        await self.submit(db, parsed_event)
+
+    def submit(self, db: AsyncIOMotorDatabase, parsed_event: Any) -> asyncio.Future[None]:
+        """Buffer a transaction event; the future resolves once it has been inserted."""
+        return self._coalescer.submit(db, _INGEST_KEY, transaction_document(parsed_event))
+
+    async def flush(self) -> None:
+        """Insert all buffered transactions now."""
+        await self._coalescer.flush()
@@ -0,0 +1,172 @@
+"""Per-customer summary of loan accounts (``customer-summaries``).
+
+The servicing view shows each customer's total outstanding, how many of their
+accounts are active, in arrears and paid off, and their most recent payment.
+Instead of adding up the loan accounts on every page load, the account
+handlers keep one summary document per customer current with ``$inc``
+deltas, so the profile page is a single read on the unique ``customerId``
+index however many accounts the customer holds.
+
+A delta is the difference between an account's contribution before and
+after a handler's write. Handlers get the "before" state atomically with
+the write (``find_one_and_update`` returning the previous document), so a
+redelivered event that changes nothing adds nothing.
+
+Summary document::
+
+    {
+        "customerId": "CUS-...",
+        "accountCount": 3,
+        "totalOutstanding": 1240.5,
+        "accountsByStatus": {"active": 2, "in_arrears": 0, "paid_off": 1},
+        "lastPayment": {"date": "...", "amount": 145.0, "loanAccountId": "..."},
+    }
+"""
+
+from datetime import date, datetime, timezone
+from typing import Any
+
+import structlog
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = structlog.get_logger()
+
+COLLECTION = "customer-summaries"
+
+# Loan account fields a summary is derived from; handlers fetch these as "before"
+ACCOUNT_PROJECTION = {
+    "customerIdString": 1,
+    "accountStatus": 1,
+    "balances.totalOutstanding": 1,
+}
+
+
+def _contribution(account: dict[str, Any] | None) -> tuple[str | None, dict[str, float]]:
+    """The customer an account counts towards and what it adds to their summary."""
+    if not account or not account.get("customerIdString"):
+        return None, {}
+    outstanding = (account.get("balances") or {}).get("totalOutstanding") or 0.0
+    contribution: dict[str, float] = {"accountCount": 1, "totalOutstanding": float(outstanding)}
+    if account.get("accountStatus"):
+        contribution[f"accountsByStatus.{account['accountStatus']}"] = 1
+    return account["customerIdString"], contribution
+
+
+def summary_deltas(
+    before: dict[str, Any] | None, after: dict[str, Any] | None
+) -> dict[str, dict[str, float]]:
+    """
+    ``$inc`` deltas per customer for an account going from ``before`` to ``after``.
+
+    Either side may be None (no account, or one not yet linked to a customer).
+    Fields that net to zero are left out, as are customers with no change.
+    """
+    deltas: dict[str, dict[str, float]] = {}
+    for sign, account in ((-1, before), (1, after)):
+        customer_id, contribution = _contribution(account)
+        if customer_id is None:
+            continue
+        inc = deltas.setdefault(customer_id, {})
+        for field_name, value in contribution.items():
+            inc[field_name] = inc.get(field_name, 0) + sign * value
+
+    changed: dict[str, dict[str, float]] = {}
+    for customer_id, inc in deltas.items():
+        if "totalOutstanding" in inc:
+            inc["totalOutstanding"] = round(inc["totalOutstanding"], 2)
+        inc = {field_name: value for field_name, value in inc.items() if value}
+        if inc:
+            changed[customer_id] = inc
+    return changed
+
+
+def account_after(
+    before: dict[str, Any] | None,
+    status: str | None = None,
+    outstanding: float | None = None,
+) -> dict[str, Any] | None:
+    """An account's summary fields after an update; None arguments are unchanged."""
+    if before is None:
+        return None
+    balances = before.get("balances") or {}
+    return {
+        "customerIdString": before.get("customerIdString"),
+        "accountStatus": status if status is not None else before.get("accountStatus"),
+        "balances": {
+            "totalOutstanding": (
+                outstanding if outstanding is not None else balances.get("totalOutstanding")
+            )
+        },
+    }
+
+
+def payment_date(value: Any) -> datetime:
+    """
+    A payment date as a naive UTC datetime, so dates compare in time order.
+
+    The SDK gives dates, datetimes or ISO strings (with or without a ``Z`` or
+    offset), and comparing those as strings puts them in the wrong order.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day)
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def summary_change(customer_id: str, inc: dict[str, float]) -> tuple[dict, dict]:
+    """Filter and update adding ``inc`` to a customer's summary (created if missing)."""
+    return (
+        {"customerId": customer_id},
+        {
+            "$inc": inc,
+            "$set": {"updatedAt": datetime.utcnow()},
+            "$setOnInsert": {"createdAt": datetime.utcnow()},
+        },
+    )
+
+
+def payment_change(
+    customer_id: str, account_id: str, paid_at: Any, amount: float | None
+) -> tuple[dict, dict]:
+    """Filter and update making a payment ``lastPayment`` unless a later one is recorded."""
+    paid_at = payment_date(paid_at)
+    return (
+        # $not/$gte also matches summaries without a lastPayment yet, and ones
+        # recorded as strings before dates were normalised (types don't compare)
+        {"customerId": customer_id, "lastPayment.date": {"$not": {"$gte": paid_at}}},
+        {
+            "$set": {
+                "lastPayment": {"date": paid_at, "amount": amount, "loanAccountId": account_id},
+                "updatedAt": datetime.utcnow(),
+            }
+        },
+    )
+
+
+async def apply_account_change(
+    db: AsyncIOMotorDatabase,
+    before: dict[str, Any] | None,
+    after: dict[str, Any] | None,
+) -> None:
+    """Apply the summary deltas for an account going from ``before`` to ``after``."""
+    for customer_id, inc in summary_deltas(before, after).items():
+        await db[COLLECTION].update_one(*summary_change(customer_id, inc), upsert=True)
+        logger.debug("Customer summary updated", customer_id=customer_id, inc=inc)
+
+
+async def record_payment(
+    db: AsyncIOMotorDatabase,
+    customer_id: str | None,
+    account_id: str,
+    paid_at: Any,
+    amount: float | None,
+) -> None:
+    """Make a payment the customer's ``lastPayment`` unless a later one is recorded."""
+    if not customer_id:
+        return
+    await db[COLLECTION].update_one(*payment_change(customer_id, account_id, paid_at, amount))
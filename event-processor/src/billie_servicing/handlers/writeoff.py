@@ -18,9 +18,16 @@ from typing import Any
 
 import structlog
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .counters import PENDING_WRITEOFFS_BY_PRIORITY, transition
 
 logger = structlog.get_logger()
 
+# Fields of the previous request state needed to update the counters
+_COUNTED_FIELDS = {"status": 1, "priority": 1, "pendingCounted": 1}
+
 
 def _parse_payload(event: dict[str, Any]) -> dict[str, Any]:
     """Parse the payload from event dict.
@@ -36,6 +43,41 @@ def _parse_payload(event: dict[str, Any]) -> dict[str, Any]:
     return payload
 
 
+async def _count_pending(db: AsyncIOMotorDatabase, request_id: str) -> None:
+    """
+    Add a new request to the pending counter, once.
+
+    The request is inserted with ``pendingCounted: False`` and only the
+    delivery that flips the flag moves the counter, so a redelivery after a
+    failure between the insert and the ``$inc`` repairs the count, and
+    concurrent deliveries can't count it twice. The status and priority come
+    from the stored request, not the redelivered event.
+    """
+    requests = db["write-off-requests"]
+    claimed = await requests.find_one_and_update(
+        {"requestId": request_id, "status": "pending", "pendingCounted": False},
+        {"$set": {"pendingCounted": True}},
+        projection=_COUNTED_FIELDS,
+    )
+    if claimed is None:
+        return
+    try:
+        await transition(db, PENDING_WRITEOFFS_BY_PRIORITY, None, claimed.get("priority"))
+    except Exception:
+        # Let the retry count it
+        await requests.update_one(
+            {"requestId": request_id}, {"$set": {"pendingCounted": False}}
+        )
+        raise
+
+
+async def _leave_pending(db: AsyncIOMotorDatabase, before: dict[str, Any] | None) -> None:
+    """Take a resolved request out of the pending counter if it was counted as pending."""
+    # Requests from before the flag have no pendingCounted and were counted
+    if before and before.get("status") == "pending" and before.get("pendingCounted", True):
+        await transition(db, PENDING_WRITEOFFS_BY_PRIORITY, before.get("priority"), None)
+
+
 def _generate_request_number() -> str:
     """Generate a human-readable write-off request number.
     
@@ -101,6 +143,8 @@ async def handle_writeoff_requested(
         "notes": payload.get("notes"),
         "priority": payload.get("priority", "normal"),
         "status": "pending",
+        # Set once the request is in the pending counter (see _count_pending)
+        "pendingCounted": False,
         
         # Audit
         "requestedBy": payload.get("requestedBy"),
@@ -112,13 +156,20 @@ async def handle_writeoff_requested(
         "updatedAt": now,
     }
     
-    result = await db["write-off-requests"].insert_one(document)
-    
-    log.info(
-        "Write-off request created",
-        request_number=request_number,
-        inserted_id=str(result.inserted_id),
-    )
+    try:
+        result = await db["write-off-requests"].insert_one(document)
+    except DuplicateKeyError:
+        # Redelivered after the insert succeeded (requestId is uniquely indexed);
+        # the counter may still be missing it
+        log.info("Write-off request already exists")
+    else:
+        log.info(
+            "Write-off request created",
+            request_number=request_number,
+            inserted_id=str(result.inserted_id),
+        )
+
+    await _count_pending(db, request_id)
 
 
 async def handle_writeoff_approved(
@@ -152,7 +203,7 @@ async def handle_writeoff_approved(
     
     now = datetime.utcnow()
     
-    result = await db["write-off-requests"].update_one(
+    before = await db["write-off-requests"].find_one_and_update(
         {"requestId": request_id},
         {
             "$set": {
@@ -166,14 +217,18 @@ async def handle_writeoff_approved(
                 "updatedAt": now,
             }
         },
+        projection=_COUNTED_FIELDS,
+        return_document=ReturnDocument.BEFORE,
     )
     
     log.info(
         "Write-off request approved",
-        matched=result.matched_count,
-        modified=result.modified_count,
+        matched=before is not None,
+        previous_status=(before or {}).get("status"),
     )
 
+    await _leave_pending(db, before)
+
 
 async def handle_writeoff_rejected(
     db: AsyncIOMotorDatabase, parsed_event: dict[str, Any]
@@ -206,7 +261,7 @@ async def handle_writeoff_rejected(
     
     now = datetime.utcnow()
     
-    result = await db["write-off-requests"].update_one(
+    before = await db["write-off-requests"].find_one_and_update(
         {"requestId": request_id},
         {
             "$set": {
@@ -220,14 +275,18 @@ async def handle_writeoff_rejected(
                 "updatedAt": now,
             }
         },
+        projection=_COUNTED_FIELDS,
+        return_document=ReturnDocument.BEFORE,
     )
     
     log.info(
         "Write-off request rejected",
-        matched=result.matched_count,
-        modified=result.modified_count,
+        matched=before is not None,
+        previous_status=(before or {}).get("status"),
     )
 
+    await _leave_pending(db, before)
+
 
 async def handle_writeoff_cancelled(
     db: AsyncIOMotorDatabase, parsed_event: dict[str, Any]
@@ -259,7 +318,7 @@ async def handle_writeoff_cancelled(
     
     now = datetime.utcnow()
     
-    result = await db["write-off-requests"].update_one(
+    before = await db["write-off-requests"].find_one_and_update(
         {"requestId": request_id},
         {
             "$set": {
@@ -272,10 +331,14 @@ async def handle_writeoff_cancelled(
                 "updatedAt": now,
             }
         },
+        projection=_COUNTED_FIELDS,
+        return_document=ReturnDocument.BEFORE,
     )
     
     log.info(
         "Write-off request cancelled",
-        matched=result.matched_count,
-        modified=result.modified_count,
+        matched=before is not None,
+        previous_status=(before or {}).get("status"),
     )
+
+    await _leave_pending(db, before)
@@ -0,0 +1,262 @@
+"""MongoDB index bootstrapping and verification.
+
+Every handler looks documents up by a business key rather than ``_id``.
+Without an index on that key each event turns into a collection scan, so the
+processor declares the indexes it relies on and makes sure they exist at
+startup. Indexes can also be managed elsewhere (e.g. by Payload or a DBA); in
+that case creation is skipped and the indexes are only verified.
+
+Time-series collections are bootstrapped the same way. They have to be
+created explicitly before the first insert, which would otherwise create
+an ordinary collection.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any
+
+import structlog
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+
+logger = structlog.get_logger()
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """An index the processor's queries depend on."""
+
+    collection: str
+    keys: tuple[tuple[str, int], ...]
+    unique: bool = False
+
+    @property
+    def name(self) -> str:
+        """Default MongoDB index name (matches what Payload/Mongoose generate)."""
+        return "_".join(f"{field_name}_{direction}" for field_name, direction in self.keys)
+
+
+# Lookups performed by the handlers. Unique where a duplicate would cause a
+# handler to update the wrong document or insert a second copy on redelivery.
+#
+# handle_schedule_updated filters on loanAccountId plus
+# repaymentSchedule.payments.paymentNumber; the unique loanAccountId index
+# already narrows that to a single document, so no multikey index is needed.
+#
+# Customer name changes are fanned out to loan-accounts by customerIdString,
+# which is not unique (a customer can hold several accounts).
+#
+# The account handlers upsert one customer-summaries document per customer.
+#
+# ledger-transactions is a time-series collection (REQUIRED_TIME_SERIES), so it
+# cannot have unique indexes; the ingest claims transaction IDs by _id in
+# ledger-transaction-claims instead. loanAccountId/transactionDate matches the index MongoDB creates
+# on the meta and time fields, and serves an account's transaction listing.
+REQUIRED_INDEXES: tuple[IndexSpec, ...] = (
+    IndexSpec("loan-accounts", (("loanAccountId", 1),), unique=True),
+    IndexSpec("loan-accounts", (("customerIdString", 1),)),
+    IndexSpec("customers", (("customerId", 1),), unique=True),
+    IndexSpec("customer-summaries", (("customerId", 1),), unique=True),
+    IndexSpec("conversations", (("conversationId", 1),), unique=True),
+    IndexSpec("write-off-requests", (("requestId", 1),), unique=True),
+    IndexSpec("ledger-transactions", (("loanAccountId", 1), ("transactionDate", 1))),
+    IndexSpec("ledger-transactions", (("transactionId", 1),)),
+)
+
+
+@dataclass(frozen=True)
+class TimeSeriesSpec:
+    """A time-series collection the handlers insert into."""
+
+    collection: str
+    time_field: str
+    meta_field: str
+    granularity: str = "hours"
+
+    @property
+    def options(self) -> dict[str, str]:
+        return {
+            "timeField": self.time_field,
+            "metaField": self.meta_field,
+            "granularity": self.granularity,
+        }
+
+
+# Ledger transactions are bucketed by account. An account sees a few
+# transactions a month, so "hours" granularity keeps its buckets well filled.
+REQUIRED_TIME_SERIES: tuple[TimeSeriesSpec, ...] = (
+    TimeSeriesSpec("ledger-transactions", time_field="transactionDate", meta_field="loanAccountId"),
+)
+
+
+@dataclass
+class IndexReport:
+    """Outcome of an index bootstrap/verification run."""
+
+    created: list[str] = field(default_factory=list)
+    existing: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+    unused: list[str] = field(default_factory=list)
+
+    @property
+    def healthy(self) -> bool:
+        return not self.missing and not self.conflicts
+
+
+async def ensure_indexes(
+    db: AsyncIOMotorDatabase,
+    create: bool = True,
+    specs: tuple[IndexSpec, ...] = REQUIRED_INDEXES,
+) -> IndexReport:
+    """
+    Create (optionally) and verify the indexes the handlers rely on.
+
+    Failures never abort startup: an index that cannot be created because of
+    conflicting options or duplicate data is reported instead.
+    """
+    report = IndexReport()
+    collections = sorted({spec.collection for spec in specs})
+    existing = {name: await _list_indexes(db, name) for name in collections}
+
+    for spec in specs:
+        label = f"{spec.collection}.{spec.name}"
+        current = _find_index(existing[spec.collection], spec)
+
+        if current is not None:
+            if bool(current.get("unique", False)) != spec.unique:
+                report.conflicts.append(label)
+                logger.warning(
+                    "Index exists with different options",
+                    index=label,
+                    expected_unique=spec.unique,
+                    actual_name=current.get("name"),
+                )
+            else:
+                report.existing.append(label)
+            continue
+
+        if not create:
+            report.missing.append(label)
+            continue
+
+        try:
+            await db[spec.collection].create_index(
+                list(spec.keys), unique=spec.unique, name=spec.name
+            )
+            report.created.append(label)
+            logger.info("Created index", index=label, unique=spec.unique)
+        except DuplicateKeyError as e:
+            report.missing.append(label)
+            logger.error("Cannot create unique index, duplicate keys exist", index=label, error=str(e))
+        except OperationFailure as e:
+            report.conflicts.append(label)
+            logger.error("Cannot create index", index=label, error=str(e))
+
+    for name in collections:
+        report.unused.extend(await _find_unused_indexes(db, name, specs))
+
+    logger.info(
+        "Index verification complete",
+        created=report.created,
+        missing=report.missing,
+        conflicts=report.conflicts,
+        unused=report.unused,
+    )
+    return report
+
+
+async def ensure_time_series(
+    db: AsyncIOMotorDatabase,
+    create: bool = True,
+    specs: tuple[TimeSeriesSpec, ...] = REQUIRED_TIME_SERIES,
+) -> IndexReport:
+    """
+    Create (optionally) and verify the time-series collections.
+
+    Must run before ``ensure_indexes``, which would otherwise create them as
+    ordinary collections. A collection that already exists without matching
+    time-series options is reported as a conflict; it has to be migrated by
+    hand.
+    """
+    report = IndexReport()
+
+    for spec in specs:
+        label = f"{spec.collection} (time-series)"
+        info = await db.list_collections(filter={"name": spec.collection}).to_list(length=None)
+
+        if info:
+            timeseries = info[0].get("options", {}).get("timeseries") or {}
+            if (timeseries.get("timeField"), timeseries.get("metaField")) == (
+                spec.time_field,
+                spec.meta_field,
+            ):
+                report.existing.append(label)
+            else:
+                report.conflicts.append(label)
+                logger.warning(
+                    "Collection exists without the expected time-series options",
+                    collection=spec.collection,
+                    expected=spec.options,
+                    actual=timeseries,
+                )
+            continue
+
+        if not create:
+            report.missing.append(label)
+            continue
+
+        try:
+            await db.create_collection(spec.collection, timeseries=spec.options)
+            report.created.append(label)
+            logger.info("Created time-series collection", collection=spec.collection)
+        except CollectionInvalid:
+            # Created concurrently by another worker
+            report.existing.append(label)
+        except OperationFailure as e:
+            report.conflicts.append(label)
+            logger.error("Cannot create time-series collection", collection=label, error=str(e))
+
+    return report
+
+
+async def _list_indexes(db: AsyncIOMotorDatabase, collection: str) -> list[dict[str, Any]]:
+    """List a collection's indexes (empty if the collection doesn't exist yet)."""
+    try:
+        return await db[collection].list_indexes().to_list(length=None)
+    except OperationFailure:
+        return []
+
+
+def _find_index(indexes: list[dict[str, Any]], spec: IndexSpec) -> dict[str, Any] | None:
+    """Find an existing index with the same key pattern as the spec."""
+    for index in indexes:
+        keys = tuple((k, int(v)) for k, v in dict(index.get("key", {})).items())
+        if keys == spec.keys:
+            return index
+    return None
+
+
+async def _find_unused_indexes(
+    db: AsyncIOMotorDatabase, collection: str, specs: tuple[IndexSpec, ...]
+) -> list[str]:
+    """
+    Report indexes with no recorded accesses that the processor doesn't need.
+
+    ``$indexStats`` counters reset when mongod restarts, so this is a hint
+    rather than proof that an index can be dropped.
+    """
+    required = {spec.name for spec in specs if spec.collection == collection}
+    try:
+        stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(length=None)
+    except OperationFailure as e:
+        logger.debug("Index usage stats unavailable", collection=collection, error=str(e))
+        return []
+
+    unused = []
+    for stat in stats:
+        name = stat.get("name")
+        if name == "_id_" or name in required:
+            continue
+        if stat.get("accesses", {}).get("ops", 0) == 0:
+            unused.append(f"{collection}.{name}")
+    return unused
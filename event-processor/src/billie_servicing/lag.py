@@ -0,0 +1,183 @@
+"""Consumer-group lag and end-to-end event age.
+
+Two views of how far behind the CRM's projections are:
+
+- **Consumer lag** per stream, measured periodically: entries not yet
+  delivered to the group (``lag`` from XINFO GROUPS), entries delivered but
+  not acknowledged, and the age in seconds of the oldest entry in either set.
+  Stream IDs carry the millisecond they were added, so no extra bookkeeping is
+  needed.
+- **Event age** at ack time: now minus the event's own time. That is the
+  envelope's timestamp when the producer set one, otherwise the time in the
+  stream ID.
+
+Both are compared against SLO thresholds. A stream whose projections are
+stale gets ``projections_stale{stream}`` set to 1 and a warning is logged
+when it starts and when it recovers.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import redis.asyncio as redis
+import structlog
+
+from .dedup import parse_stream_id
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+# Buckets up to a day: a processor that was down overnight should still show
+# meaningful quantiles while it catches up
+AGE_BUCKETS: tuple[float, ...] = (
+    0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 86400.0,
+)
+
+# Envelope fields producers use for the time an event happened
+EVENT_TIME_FIELDS = ("timestamp", "ts", "event_time", "occurred_at")
+
+event_age_seconds = metrics.histogram(
+    "event_age_seconds", "Event time to acknowledgement", buckets=AGE_BUCKETS
+)
+consumer_lag_entries = metrics.gauge("consumer_lag_entries", "Entries not yet delivered to the group")
+consumer_pending_entries = metrics.gauge("consumer_pending_entries", "Entries delivered but unacked")
+consumer_lag_seconds = metrics.gauge(
+    "consumer_lag_seconds", "Age of the oldest unprocessed entry in the stream"
+)
+projections_stale = metrics.gauge("projections_stale", "1 while a stream is outside its SLO")
+
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def stream_id_seconds(message_id: Any) -> float:
+    """Time (epoch seconds) at which an entry was added to its stream."""
+    return parse_stream_id(_decode(message_id))[0] / 1000
+
+
+def event_time(fields: dict[Any, Any]) -> float | None:
+    """
+    The envelope's own event time (epoch seconds), if it carries one.
+
+    Accepts ISO-8601 strings and epoch numbers in seconds or milliseconds.
+    """
+    for name in EVENT_TIME_FIELDS:
+        raw = fields.get(name)
+        if raw is None:
+            raw = fields.get(name.encode())
+        raw = _decode(raw)
+        if raw in (None, ""):
+            continue
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            try:
+                moment = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+            except ValueError:
+                continue
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            return moment.timestamp()
+        # Epoch milliseconds are 13 digits for any date after 2001
+        return value / 1000 if value > 1e11 else value
+    return None
+
+
+@dataclass
+class StreamLag:
+    """Consumer-group lag for one stream."""
+
+    stream: str
+    # None when Redis can't tell (before 7.0, or after entries were deleted)
+    entries: int | None
+    pending: int
+    seconds: float
+    # Oldest event acknowledged since the previous measurement
+    max_event_age_seconds: float
+    stale: bool
+
+
+class LagMonitor:
+    """Measures consumer lag and event age against SLO thresholds."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        consumer_group: str,
+        max_lag_seconds: float,
+        max_event_age_seconds: float,
+    ) -> None:
+        self.redis = redis_client
+        self.consumer_group = consumer_group
+        self.max_lag_seconds = max_lag_seconds
+        self.max_event_age_seconds = max_event_age_seconds
+        self._max_age: dict[str, float] = {}
+        self._stale: dict[str, bool] = {}
+
+    def observe_ack(self, stream: str, message_id: Any, fields: dict[Any, Any]) -> float:
+        """Record the end-to-end age of an event that has just been acknowledged."""
+        occurred = event_time(fields)
+        source = "envelope"
+        if occurred is None:
+            occurred = stream_id_seconds(message_id)
+            source = "stream_id"
+        age = max(0.0, time.time() - occurred)
+        event_age_seconds.observe(age, stream=stream, source=source)
+        self._max_age[stream] = max(self._max_age.get(stream, 0.0), age)
+        return age
+
+    async def measure(self, stream: str) -> StreamLag:
+        """Measure lag for a stream, update the gauges and flag SLO breaches."""
+        entries: int | None = None
+        pending = 0
+        last_delivered = "0-0"
+        for group in await self.redis.xinfo_groups(stream):
+            if _decode(group.get("name")) == self.consumer_group:
+                entries = group.get("lag")
+                pending = int(group.get("pending") or 0)
+                last_delivered = _decode(group.get("last-delivered-id")) or "0-0"
+                break
+
+        oldest: float | None = None
+        if pending:
+            summary = await self.redis.xpending(stream, self.consumer_group)
+            if summary and summary.get("min"):
+                oldest = stream_id_seconds(summary["min"])
+        undelivered = await self.redis.xrange(stream, min=f"({last_delivered}", max="+", count=1)
+        if undelivered:
+            first = stream_id_seconds(undelivered[0][0])
+            oldest = first if oldest is None else min(oldest, first)
+
+        seconds = max(0.0, time.time() - oldest) if oldest is not None else 0.0
+        max_age = self._max_age.pop(stream, 0.0)
+        stale = seconds > self.max_lag_seconds or max_age > self.max_event_age_seconds
+
+        if entries is not None:
+            consumer_lag_entries.set(int(entries), stream=stream)
+        consumer_pending_entries.set(pending, stream=stream)
+        consumer_lag_seconds.set(round(seconds, 3), stream=stream)
+        projections_stale.set(int(stale), stream=stream)
+
+        lag = StreamLag(stream, entries, pending, seconds, max_age, stale)
+        self._report_transition(lag)
+        return lag
+
+    def _report_transition(self, lag: StreamLag) -> None:
+        was_stale = self._stale.get(lag.stream, False)
+        self._stale[lag.stream] = lag.stale
+        if lag.stale and not was_stale:
+            logger.warning(
+                "Projections stale",
+                stream=lag.stream,
+                lag_entries=lag.entries,
+                pending=lag.pending,
+                lag_seconds=round(lag.seconds, 1),
+                max_event_age_seconds=round(lag.max_event_age_seconds, 1),
+                slo_lag_seconds=self.max_lag_seconds,
+                slo_event_age_seconds=self.max_event_age_seconds,
+            )
+        elif was_stale and not lag.stale:
+            logger.info("Projections caught up", stream=lag.stream, lag_seconds=round(lag.seconds, 1))
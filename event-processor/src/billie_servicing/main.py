@@ -4,35 +4,15 @@ import asyncio
 import logging
 import signal
 import sys
+from typing import TYPE_CHECKING
 
 import structlog
 
 from .config import settings
-from .handlers import (
-    # Account handlers
-    handle_account_created,
-    handle_account_status_changed,
-    handle_account_updated,
-    handle_schedule_created,
-    handle_schedule_updated,
-    # Customer handlers
-    handle_customer_changed,
-    handle_customer_verified,
-    # Conversation handlers
-    handle_conversation_started,
-    handle_utterance,
-    handle_final_decision,
-    handle_conversation_summary,
-    handle_application_detail_changed,
-    handle_assessment,
-    handle_noticeboard_updated,
-    # Write-off handlers (CRM-originated events)
-    handle_writeoff_requested,
-    handle_writeoff_approved,
-    handle_writeoff_rejected,
-    handle_writeoff_cancelled,
-)
-from .processor import EventProcessor
+from .event_loop import LoopLagMonitor, loop_factory
+
+if TYPE_CHECKING:
+    from .processor import EventProcessor
 
 # Configure standard logging first
 logging.basicConfig(
@@ -63,8 +43,35 @@ structlog.configure(
 logger = structlog.get_logger()
 
 
-def setup_handlers(processor: EventProcessor) -> None:
+def setup_handlers(processor: "EventProcessor") -> None:
     """Register all event handlers with the processor."""
+    from .handlers import (
+        # Account handlers
+        handle_account_created,
+        handle_account_status_changed,
+        handle_account_updated,
+        handle_schedule_created,
+        handle_schedule_updated,
+        # Customer handlers
+        handle_customer_changed,
+        handle_customer_verified,
+        # Conversation handlers
+        handle_conversation_started,
+        handle_utterance,
+        handle_final_decision,
+        handle_conversation_summary,
+        handle_application_detail_changed,
+        handle_assessment,
+        handle_noticeboard_updated,
+        UtteranceCoalescer,
+        # Ledger handlers
+        LedgerIngest,
+        # Write-off handlers (CRM-originated events)
+        handle_writeoff_requested,
+        handle_writeoff_approved,
+        handle_writeoff_rejected,
+        handle_writeoff_cancelled,
+    )
 
     # =========================================================================
     # Account events (using billie_accounts_events SDK)
@@ -83,14 +90,30 @@ def setup_handlers(processor: EventProcessor) -> None:
     processor.register_handler("customer.updated.v1", handle_customer_changed)
     processor.register_handler("customer.verified.v1", handle_customer_verified)
 
+    # =========================================================================
+    # Ledger events (using billie_ledger_events SDK, inserted in bulk)
+    # =========================================================================
+    ledger_ingest = LedgerIngest(
+        window_ms=settings.ledger_ingest_window_ms,
+        max_events=settings.ledger_ingest_max_events,
+    )
+    processor.register_handler("ledger.transaction.posted.v1", ledger_ingest)
+    processor.register_handler("ledger.transaction.reversed.v1", ledger_ingest)
+
     # =========================================================================
     # Conversation/Chat events (manual parsing - from worker.ts)
     # =========================================================================
     processor.register_handler("conversation_started", handle_conversation_started)
 
-    # Utterances
-    processor.register_handler("user_input", handle_utterance)
-    processor.register_handler("assistant_response", handle_utterance)
+    # Utterances (optionally coalesced into one append per conversation)
+    utterance_handler = handle_utterance
+    if settings.utterance_coalesce_window_ms > 0:
+        utterance_handler = UtteranceCoalescer(
+            window_ms=settings.utterance_coalesce_window_ms,
+            max_events=settings.utterance_coalesce_max_events,
+        )
+    processor.register_handler("user_input", utterance_handler)
+    processor.register_handler("assistant_response", utterance_handler)
 
     # Application changes
     processor.register_handler("applicationDetail_changed", handle_application_detail_changed)
@@ -120,6 +143,15 @@ def setup_handlers(processor: EventProcessor) -> None:
 
 async def run() -> None:
     """Run the event processor."""
+    # The processor, handlers and optional services are imported here rather
+    # than with this module, so the banner is printed before they load
+    from .processor import EventProcessor
+    from .profiling import Profiler
+    from .tracing import configure_tracing
+
+    configure_tracing(
+        settings.tracing_exporter, settings.tracing_file_path, settings.tracing_service_name
+    )
     processor = EventProcessor()
     setup_handlers(processor)
 
@@ -134,6 +166,36 @@ async def run() -> None:
     for sig in (signal.SIGTERM, signal.SIGINT):
         loop.add_signal_handler(sig, shutdown_handler, sig)
 
+    # Profiles can be captured from a live worker with SIGUSR1/SIGUSR2
+    profiler = Profiler(
+        settings.profile_dir, settings.profile_top_n, lambda: processor.handlers.values()
+    )
+    profiler.install_signal_handlers(loop)
+
+    loop_monitor_task = None
+    if settings.loop_lag_interval_ms > 0:
+        loop_monitor = LoopLagMonitor(
+            settings.loop_lag_interval_ms / 1000, settings.loop_block_threshold_ms / 1000
+        )
+        loop_monitor_task = asyncio.create_task(
+            loop_monitor.run(settings.metrics_log_interval_seconds)
+        )
+
+    admin = None
+    if settings.admin_port:
+        from .admin import AdminServer
+
+        admin = AdminServer(settings.admin_host, settings.admin_port)
+        profiler.add_admin_routes(admin)
+
+        async def ready() -> tuple[int, str, str]:
+            if processor.startup.ready.is_set():
+                return 200, "text/plain", "ready\n"
+            return 503, "text/plain", "not ready\n"
+
+        admin.add_route("GET", "/ready", ready)
+        await admin.start()
+
     # Start processor in background
     processor_task = asyncio.create_task(processor.start())
 
@@ -142,6 +204,7 @@ async def run() -> None:
 
     # Stop processor gracefully
     logger.info("Shutting down processor...")
+    profiler.stop()
     await processor.stop()
 
     # Cancel processor task
@@ -151,6 +214,11 @@ async def run() -> None:
     except asyncio.CancelledError:
         pass
 
+    if admin:
+        await admin.stop()
+    if loop_monitor_task:
+        loop_monitor_task.cancel()
+
     logger.info("Processor shutdown complete")
 
 
@@ -163,8 +231,12 @@ def main() -> None:
     print(f"Database URI:    {settings.database_uri}")
     print(f"Database:        {settings.db_name}")
     print(f"External Stream: {settings.inbox_stream}")
+    if settings.inbox_partitions:
+        owned = settings.inbox_owned_partitions or "all"
+        print(f"Partitions:      {settings.inbox_partitions} (owned: {owned})")
     print(f"Internal Stream: {settings.internal_stream}")
     print(f"Consumer Group:  {settings.consumer_group}")
+    print(f"Event Loop:      {settings.event_loop}")
     print("=" * 60)
     print("Starting processor... (Ctrl+C to stop)")
     print()
@@ -175,12 +247,14 @@ def main() -> None:
         database_uri=settings.database_uri,
         db_name=settings.db_name,
         external_stream=settings.inbox_stream,
+        inbox_partitions=settings.inbox_partitions,
         internal_stream=settings.internal_stream,
         consumer_group=settings.consumer_group,
     )
 
     try:
-        asyncio.run(run())
+        with asyncio.Runner(loop_factory=loop_factory(settings.event_loop)) as runner:
+            runner.run(run())
     except KeyboardInterrupt:
         print("\nInterrupted by user")
         sys.exit(0)
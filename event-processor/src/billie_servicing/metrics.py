@@ -0,0 +1,214 @@
+"""In-process metrics for the event processor.
+
+A small registry of counters, gauges and histograms with optional labels.
+Metrics are logged periodically as a structured snapshot and can be scraped
+in Prometheus text format from the local admin endpoint (see ``admin.py``).
+
+Each metric guards its values with a lock: most updates come from the event
+loop, but MongoDB command accounting (``mongo_commands.py``) records from
+pymongo's monitoring threads.
+"""
+
+import bisect
+import math
+import threading
+from typing import Any
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: dict[str, str] | None = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.values: dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {_format_labels(k) or "value": v for k, v in self.values.items()}
+
+    def render(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in self.values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = value
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class _HistogramSeries:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.series: dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = _HistogramSeries(self.buckets)
+            series.counts[bucket] += 1
+            series.count += 1
+            series.sum += value
+            series.max = max(series.max, value)
+
+    def count(self, **labels: Any) -> int:
+        series = self.series.get(_label_key(labels))
+        return series.count if series else 0
+
+    def quantile(self, q: float, **labels: Any) -> float:
+        """Approximate quantile (upper bound of the bucket containing it)."""
+        with self._lock:
+            return self._quantile(self.series.get(_label_key(labels)), q)
+
+    def _quantile(self, series: _HistogramSeries | None, q: float) -> float:
+        if not series or not series.count:
+            return 0.0
+        rank = math.ceil(q * series.count)
+        seen = 0
+        for i, bucket_count in enumerate(series.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else series.max
+        return series.max
+
+    def snapshot(self) -> dict[str, Any]:
+        result = {}
+        with self._lock:
+            for key, series in self.series.items():
+                result[_format_labels(key) or "value"] = {
+                    "count": series.count,
+                    "avg": round(series.sum / series.count, 6) if series.count else 0.0,
+                    "p50": self._quantile(series, 0.5),
+                    "p95": self._quantile(series, 0.95),
+                    "max": round(series.max, 6),
+                }
+        return result
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, series in self.series.items():
+                cumulative = 0
+                for bucket, bucket_count in zip(self.buckets, series.counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(key, {"le": str(bucket)})
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                inf = _format_labels(key, {"le": "+Inf"})
+                lines.append(f"{self.name}_bucket{inf} {series.count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series.sum}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registry of named metrics; creating an existing metric returns it."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, description))  # type: ignore[return-value]
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, description))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, description: str = "", buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(  # type: ignore[return-value]
+            name, lambda: Histogram(name, description, buckets)
+        )
+
+    def _get_or_create(self, name: str, factory: Any) -> Counter | Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = factory()
+        return metric
+
+    def snapshot(self) -> dict[str, Any]:
+        """All metrics with at least one value, for structured logging."""
+        return {
+            name: metric.snapshot()
+            for name, metric in sorted(self._metrics.items())
+            if metric.snapshot()
+        }
+
+    def render_prometheus(self) -> str:
+        """All metrics in Prometheus text exposition format."""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            if metric.description:
+                lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Clear recorded values, keeping registered metrics (used by tests)."""
+        for metric in self._metrics.values():
+            with metric._lock:
+                if isinstance(metric, Histogram):
+                    metric.series.clear()
+                else:
+                    metric.values.clear()
+
+
+metrics = MetricsRegistry()
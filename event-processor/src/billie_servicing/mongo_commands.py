@@ -0,0 +1,212 @@
+"""MongoDB command accounting per event type.
+
+Handlers issue a varying number of MongoDB commands per event (a lookup, an
+update, sometimes a second update or an insert). ``CommandAccounting`` is a
+pymongo command listener that attributes every command to the event being
+handled. The processor sets that event in a context variable
+(``attribute_to``), and motor runs pymongo on an executor with a copy of the
+caller's context, so the listener can read it.
+
+Per event type, command and collection it records:
+
+- ``mongo_commands_total`` and ``mongo_command_seconds``
+- ``mongo_reply_documents_total`` - documents returned (find/aggregate
+  batches) and matched/modified/upserted/inserted/deleted, as reported in the
+  command reply
+- ``mongo_commands_per_event`` - round trips per message
+
+These are not documents *examined*: command replies don't include that, so a
+collection scan that returns one document looks the same as an index lookup.
+Commands slower than ``MONGO_SLOW_COMMAND_MS`` are logged with their filter
+shape (field names and operators, values replaced by ``"?"``); look the shape
+up in the server's slow query log or run it through ``explain`` to check for
+a scan.
+
+The listener runs on pymongo's monitoring threads; its own in-flight table
+is locked, and the metrics lock their values (see ``metrics.py``).
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+import structlog
+from pymongo import monitoring
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+UNATTRIBUTED = "unattributed"
+
+mongo_commands = metrics.counter("mongo_commands_total", "MongoDB commands issued")
+mongo_command_seconds = metrics.histogram("mongo_command_seconds", "MongoDB command duration")
+mongo_reply_documents = metrics.counter(
+    "mongo_reply_documents_total",
+    "Documents returned/matched/written as reported by command replies (not documents examined)",
+)
+mongo_commands_per_event = metrics.histogram(
+    "mongo_commands_per_event",
+    "MongoDB round trips per handled message",
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 50),
+)
+
+
+@dataclass
+class EventUsage:
+    """Commands issued on behalf of one message."""
+
+    event_type: str
+    message_id: str
+    commands: int = 0
+    seconds: float = 0.0
+
+
+_current: contextvars.ContextVar[EventUsage | None] = contextvars.ContextVar(
+    "mongo_command_event", default=None
+)
+
+
+@contextmanager
+def attribute_to(event_type: str, message_id: str, observe: bool = True) -> Iterator[EventUsage]:
+    """
+    Attribute MongoDB commands issued inside the block to an event.
+
+    With ``observe`` the number of commands is recorded when the block ends;
+    pass False when the writes happen later (coalesced handlers).
+    """
+    usage = EventUsage(event_type, message_id)
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+        if observe:
+            mongo_commands_per_event.observe(usage.commands, event_type=event_type)
+
+
+def filter_shape(value: Any) -> Any:
+    """A filter with its values replaced by "?", keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [filter_shape(item) for item in value]
+        # $in lists etc. collapse to one element; clauses of $and/$or are kept
+        if shapes and all(shape == "?" for shape in shapes):
+            return ["?"]
+        return shapes
+    return "?"
+
+
+def command_filter(command_name: str, command: Any) -> Any:
+    """Extract the query filter from a command document, if it has one."""
+    if command_name in ("find", "count", "distinct"):
+        return command.get("filter", command.get("query"))
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or []
+        return statements[0].get("q") if statements else None
+    if command_name == "findAndModify":
+        return command.get("query")
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        if pipeline and "$match" in pipeline[0]:
+            return pipeline[0]["$match"]
+    return None
+
+
+def _documents(command_name: str, reply: Any) -> dict[str, int]:
+    if command_name in ("find", "aggregate", "getMore"):
+        cursor = reply.get("cursor") or {}
+        batch = cursor.get("firstBatch", cursor.get("nextBatch")) or []
+        return {"returned": len(batch)}
+    if command_name == "update":
+        return {
+            "matched": int(reply.get("n", 0)) - len(reply.get("upserted") or []),
+            "modified": int(reply.get("nModified", 0)),
+            "upserted": len(reply.get("upserted") or []),
+        }
+    if command_name in ("insert", "delete"):
+        return {"inserted" if command_name == "insert" else "deleted": int(reply.get("n", 0))}
+    if command_name == "findAndModify":
+        return {"matched": int((reply.get("lastErrorObject") or {}).get("n", 0))}
+    return {}
+
+
+@dataclass
+class _Started:
+    usage: EventUsage | None
+    command_name: str
+    collection: str
+    shape: Any
+
+
+class CommandAccounting(monitoring.CommandListener):
+    """pymongo listener attributing commands to the event being processed."""
+
+    def __init__(self, slow_command_ms: float) -> None:
+        self.slow_command_ms = slow_command_ms
+        self._started: dict[tuple[Any, int], _Started] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(
+            "collection" if event.command_name == "getMore" else event.command_name
+        )
+        shape = command_filter(event.command_name, event.command)
+        started = _Started(
+            usage=_current.get(),
+            command_name=event.command_name,
+            collection=collection if isinstance(collection, str) else "",
+            shape=filter_shape(shape) if shape is not None else None,
+        )
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = started
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        started = self._finish(event, "ok")
+        if started is None:
+            return
+        labels = self._labels(started)
+        for kind, count in _documents(event.command_name, event.reply).items():
+            if count:
+                mongo_reply_documents.inc(count, kind=kind, **labels)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, "error")
+
+    def _finish(self, event: Any, outcome: str) -> _Started | None:
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return None
+
+        seconds = event.duration_micros / 1_000_000
+        labels = self._labels(started)
+        mongo_commands.inc(outcome=outcome, **labels)
+        mongo_command_seconds.observe(seconds, **labels)
+        if started.usage is not None:
+            started.usage.commands += 1
+            started.usage.seconds += seconds
+
+        if seconds * 1000 >= self.slow_command_ms:
+            logger.warning(
+                "Slow MongoDB command",
+                event_type=labels["event_type"],
+                message_id=started.usage.message_id if started.usage else None,
+                command=started.command_name,
+                collection=started.collection,
+                filter_shape=started.shape,
+                duration_ms=round(seconds * 1000, 1),
+                outcome=outcome,
+            )
+        return started
+
+    @staticmethod
+    def _labels(started: _Started) -> dict[str, str]:
+        return {
+            "event_type": started.usage.event_type if started.usage else UNATTRIBUTED,
+            "command": started.command_name,
+            "collection": started.collection,
+        }
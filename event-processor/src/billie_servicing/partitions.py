@@ -0,0 +1,95 @@
+"""Hash-partitioned inbox streams.
+
+A single inbox stream lives on one Redis shard, and its consumer group
+serializes delivery. With ``INBOX_PARTITIONS=N``, producers write to
+``<INBOX_STREAM>:{0}`` ... ``<INBOX_STREAM>:{N-1}`` instead, and pick the
+partition from the aggregate the event belongs to (``partition_for``). Every
+event of an aggregate lands on the same partition, so per-aggregate order
+holds while the partitions are consumed independently.
+
+The partition index is the key's Redis Cluster hash tag. Each partition can
+therefore live on a different shard, and keys derived from the stream name
+(dedup keys are ``dedup:<stream>:...``) hash to the same slot as their
+stream. A worker reads only the partitions listed in
+``INBOX_OWNED_PARTITIONS`` (all of them by default), with one XREADGROUP
+per partition so no command spans two slots.
+"""
+
+import json
+import zlib
+from typing import Any
+
+# Envelope fields naming the aggregate (conversation / write-off request)
+_ENVELOPE_KEYS = ("conv", "cid", "conversation_id")
+# Payload fields naming the aggregate for account, ledger and customer events
+_PAYLOAD_KEYS = (
+    "account_id",
+    "accountId",
+    "loan_account_id",
+    "loanAccountId",
+    "customer_id",
+    "customerId",
+)
+
+
+def partition_stream(base: str, index: int) -> str:
+    """Stream name for a partition, hash-tagged with its index."""
+    return f"{base}:{{{index}}}"
+
+
+def partition_for(aggregate_id: str, partitions: int) -> int:
+    """Partition an aggregate's events are written to (CRC32, stable across languages)."""
+    return zlib.crc32(aggregate_id.encode()) % partitions
+
+
+def aggregate_key(fields: dict[str, Any]) -> str | None:
+    """
+    The aggregate a decoded stream entry belongs to, or None if it names none.
+
+    Uses the envelope's conversation ID when present, otherwise the account or
+    customer ID in the payload.
+    """
+    for key in _ENVELOPE_KEYS:
+        if fields.get(key):
+            return str(fields[key])
+
+    payload = fields.get("dat")
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except json.JSONDecodeError:
+            return None
+    if isinstance(payload, dict):
+        for key in _PAYLOAD_KEYS:
+            if payload.get(key):
+                return str(payload[key])
+    return None
+
+
+def parse_owned(spec: str, partitions: int) -> list[int]:
+    """
+    Parse a partition list such as ``"0-3,6"``; empty means all partitions.
+
+    Raises ValueError for indexes outside ``0..partitions-1``.
+    """
+    if not spec.strip():
+        return list(range(partitions))
+
+    owned: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        start, end = int(first), int(last or first)
+        if start > end or start < 0 or end >= partitions:
+            raise ValueError(f"Partition range {part!r} outside 0..{partitions - 1}")
+        owned.update(range(start, end + 1))
+    return sorted(owned)
+
+
+def inbox_streams(base: str, partitions: int, owned: str = "") -> list[str]:
+    """External inbox streams this worker reads: the base stream, or its owned partitions."""
+    if partitions <= 0:
+        return [base]
+    return [partition_stream(base, index) for index in parse_owned(owned, partitions)]
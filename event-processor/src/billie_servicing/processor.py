@@ -1,22 +1,77 @@
 """Event processor with transactional guarantees using Billie Event SDKs."""
 
 import asyncio
+import importlib
+import itertools
 import json
 import os
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Callable, Coroutine
+from typing import Any, AsyncIterator, Callable, Coroutine
 
 import redis.asyncio as redis
 import structlog
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
-from billie_accounts_events.parser import parse_account_message
-from billie_customers_events.parser import parse_customer_message
-
+from . import tracing
+from .backpressure import InFlightLimiter
+from .circuit import CircuitBreakers
+from .compaction import CatchUpMode, compact, merged_handler
 from .config import settings
+from .connections import RedisConnections
+from .dedup import DedupStore, create_dedup_store
+from .deferred import DeferredWrites, batch_scope, collect
+from .indexes import ensure_indexes, ensure_time_series
+from .lag import LagMonitor
+from .metrics import metrics
+from .mongo_commands import CommandAccounting, attribute_to
+from .partitions import aggregate_key, inbox_streams
+from .reorder import ReorderBuffer, released
+from .retention import RetentionManager
+from .retry import RetryEntry, RetryScheduler
+from .scheduling import BatchScheduler
+from .startup import StartupProfile
+from .workers import FAMILIES, WorkerPool, event_family
 
 logger = structlog.get_logger()
 
+in_flight_gauge = metrics.gauge("in_flight_messages", "Messages read but not yet finished")
+backpressure_waits = metrics.counter(
+    "reader_backpressure_waits_total", "Times the reader waited for in-flight capacity"
+)
+dlq_messages = metrics.counter("dlq_messages_total", "Messages moved to the dead letter queue")
+parked_messages = metrics.counter(
+    "circuit_parked_messages_total", "Messages parked while their circuit was open"
+)
+
+Handler = Callable[..., Coroutine[Any, Any, None]]
+
+# SDK parsers by event family, imported on the first event of that family so
+# startup doesn't pay for SDKs (and their Pydantic models) it may not need yet
+SDK_PARSERS: dict[str, tuple[str, str]] = {
+    "accounts": ("billie_accounts_events.parser", "parse_account_message"),
+    "customers": ("billie_customers_events.parser", "parse_customer_message"),
+    "ledger": ("billie_ledger_events.parser", "parse_ledger_message"),
+}
+_loaded_parsers: dict[str, Callable[[dict[str, Any]], Any]] = {}
+
+
+def sdk_parser(family: str) -> Callable[[dict[str, Any]], Any]:
+    """Return an SDK parser, importing it on first use."""
+    parser = _loaded_parsers.get(family)
+    if parser is None:
+        module_name, attribute = SDK_PARSERS[family]
+        started = time.perf_counter()
+        parser = getattr(importlib.import_module(module_name), attribute)
+        _loaded_parsers[family] = parser
+        logger.info(
+            "Loaded SDK parser",
+            family=family,
+            import_seconds=round(time.perf_counter() - started, 3),
+        )
+    return parser
+
 
 def sanitize_envelope(data: dict[str, Any]) -> dict[str, Any]:
     """
@@ -68,6 +123,30 @@ def sanitize_envelope(data: dict[str, Any]) -> dict[str, Any]:
     return result
 
 
+@dataclass
+class PreparedMessage:
+    """A decoded, deduplicated and parsed stream entry that is ready for its handler."""
+
+    message_id: bytes
+    fields: dict[bytes, bytes]
+    stream: str
+    delivery_count: int
+    event_type: str
+    parsed_event: Any
+    handler: Handler
+    log: Any
+    # Pending write for coalescing handlers (see _process_batch)
+    write: asyncio.Future[None] | None = None
+    # Root tracing span, ended once the message is acknowledged or failed
+    span: Any = None
+    # Released in order by the reorder buffer (handlers can skip fallbacks)
+    in_sequence: bool = False
+    # Set once the handler has returned but deferred a write to the end of the batch
+    handled: asyncio.Future[None] | None = None
+    # Earlier entries whose writes were merged into this one's (see compaction.py)
+    absorbed: list["PreparedMessage"] = field(default_factory=list)
+
+
 class EventProcessor:
     """
     Transactional event processor using Billie Event SDKs.
@@ -89,62 +168,350 @@ class EventProcessor:
         self.database_uri = database_uri or settings.database_uri
         self.db_name = db_name or settings.db_name
 
+        self.connections: RedisConnections | None = None
+        # Command traffic (dedup, XACK, XCLAIM, DLQ); blocking reads use redis_reader
         self.redis: redis.Redis | None = None
+        self.redis_reader: redis.Redis | None = None
+        self.dedup: DedupStore | None = None
+        self.lag: LagMonitor | None = None
         self.mongo: AsyncIOMotorClient | None = None
         self.db: AsyncIOMotorDatabase | None = None
 
+        self.startup = StartupProfile()
         self.consumer_id = f"processor-{os.getpid()}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-        self.handlers: dict[str, Callable[..., Coroutine[Any, Any, None]]] = {}
+        self.handlers: dict[str, Handler] = {}
+        # External inbox (or this worker's partitions of it), then the internal stream
+        self.streams = [
+            *inbox_streams(
+                settings.inbox_stream, settings.inbox_partitions, settings.inbox_owned_partitions
+            ),
+            settings.internal_stream,
+        ]
+        self._coalescers: list[Any] = []
         self._running = False
+        # Housekeeping tasks (metrics, dedup compaction) cancelled on stop
+        self._background_tasks: list[asyncio.Task[None]] = []
 
-    def register_handler(
-        self, event_type: str, handler: Callable[..., Coroutine[Any, Any, None]]
-    ) -> None:
-        """Register a handler for a specific event type."""
+        # Prefetch pipeline: each reader fills its stream's queue and the worker
+        # takes batches by weight, serving internal batches early once overdue
+        self._batches = BatchScheduler(maxsize=settings.prefetch_batches)
+        for stream in self.streams:
+            if stream == settings.internal_stream:
+                self._batches.add_stream(
+                    stream,
+                    weight=settings.internal_stream_weight,
+                    latency_target=settings.internal_latency_target_ms / 1000,
+                )
+            else:
+                self._batches.add_stream(stream, weight=settings.external_stream_weight)
+        # The internal stream has its own capacity so an external flood can't block its reads
+        self._in_flight = InFlightLimiter(settings.max_in_flight_messages)
+        self._internal_in_flight = InFlightLimiter(settings.internal_max_in_flight_messages)
+        # One read loop per stream: partitions may live on different cluster shards
+        self._reader_tasks: list[asyncio.Task[None]] = []
+        self._worker_task: asyncio.Task[None] | None = None
+
+        # The worker hands each message to its family's pool (see workers.py)
+        self.pools = {
+            family: WorkerPool(
+                family,
+                self._process_pooled,
+                concurrency=getattr(settings, f"{family}_pool_concurrency"),
+                queue_depth=getattr(settings, f"{family}_pool_queue_depth"),
+                batch_size=settings.batch_size,
+            )
+            for family in FAMILIES
+        }
+        # Early events are held per aggregate until their predecessors are handled
+        self.reorder: ReorderBuffer | None = None
+        if settings.reorder_window_ms > 0:
+            self.reorder = ReorderBuffer(
+                window_seconds=settings.reorder_window_ms / 1000,
+                max_held=settings.reorder_max_held,
+            )
+        # Compacts state-setting events while a stream is far behind
+        self.catch_up: CatchUpMode | None = None
+        if settings.catch_up_lag_seconds > 0:
+            self.catch_up = CatchUpMode(settings.catch_up_lag_seconds)
+
+        # Failed entries are redelivered with backoff instead of waiting for a restart;
+        # redelivered entries go through the pools with their delivery count here
+        self._redeliveries: dict[tuple[str, bytes], int] = {}
+        self.retries = RetryScheduler(
+            self._redeliver,
+            base_delay_seconds=settings.retry_base_delay_ms / 1000,
+            max_delay_seconds=settings.retry_max_delay_ms / 1000,
+            jitter=settings.retry_jitter,
+        )
+
+        # Stop handling (and reading) events whose dependencies are failing
+        self.circuits: CircuitBreakers | None = None
+        if settings.circuit_breaker_enabled:
+            self.circuits = CircuitBreakers(
+                failure_rate=settings.circuit_failure_rate,
+                window=settings.circuit_window,
+                min_calls=settings.circuit_min_calls,
+                open_base_seconds=settings.circuit_open_base_seconds,
+                open_max_seconds=settings.circuit_open_max_seconds,
+            )
+
+    def register_handler(self, event_type: str, handler: Handler) -> None:
+        """
+        Register a handler for a specific event type.
+
+        Handlers that also expose ``submit``/``flush`` (e.g. UtteranceCoalescer)
+        are treated as coalescing handlers by _process_batch.
+        """
         self.handlers[event_type] = handler
+        if hasattr(handler, "flush") and handler not in self._coalescers:
+            self._coalescers.append(handler)
         logger.info("Registered handler", event_type=event_type)
 
     async def start(self) -> None:
         """Initialize connections and start processing."""
-        print("Connecting to Redis...")
-        self.redis = redis.from_url(self.redis_url, decode_responses=False)
+        self.startup.mark("imports")
 
-        print("Connecting to MongoDB...")
-        self.mongo = AsyncIOMotorClient(self.database_uri)
+        print("Connecting to Redis and MongoDB...")
+        self.connections = RedisConnections(
+            self.redis_url, read_pool_size=max(settings.redis_read_pool_size, len(self.streams))
+        )
+        self.redis = self.connections.commands
+        self.redis_reader = self.connections.reader
+        self.dedup = create_dedup_store(
+            settings.dedup_store, self.redis, settings.consumer_group, settings.dedup_ttl_seconds
+        )
+        self.lag = LagMonitor(
+            self.redis,
+            settings.consumer_group,
+            max_lag_seconds=settings.slo_max_lag_seconds,
+            max_event_age_seconds=settings.slo_max_event_age_seconds,
+        )
+
+        # Per-command spans are only wanted (and only cost anything) when tracing
+        listeners: list[Any] = [tracing.MongoCommandTracer()] if tracing.enabled() else []
+        if settings.mongo_command_accounting:
+            listeners.append(CommandAccounting(settings.mongo_slow_command_ms))
+        self.mongo = AsyncIOMotorClient(self.database_uri, event_listeners=listeners)
         self.db = self.mongo[self.db_name]
 
-        print("Setting up consumer groups...")
-        await self._ensure_consumer_group(settings.inbox_stream)
-        await self._ensure_consumer_group(settings.internal_stream)
+        # Both clients connect lazily; ping them together so connection setup overlaps
+        async with self.startup.phase("connect"):
+            await asyncio.gather(self.redis.ping(), self.mongo.admin.command("ping"))
+
+        print("Verifying MongoDB indexes and consumer groups...")
+        async with self.startup.phase("indexes_and_groups"):
+            await asyncio.gather(
+                self._ensure_collections(),
+                *(self._ensure_consumer_group(stream) for stream in self.streams),
+            )
+
+        self._background_tasks.append(asyncio.create_task(self.retries.run()))
 
+        # Pending entries are older than anything unread, so they still go first;
+        # the streams are independent and recover concurrently
         print("Processing any pending messages...")
-        await self._process_pending_messages(settings.inbox_stream)
-        await self._process_pending_messages(settings.internal_stream)
+        async with self.startup.phase("pending_recovery"):
+            await asyncio.gather(*(self._process_pending_messages(s) for s in self.streams))
 
         self._running = True
         print(f"✅ Event processor started (consumer: {self.consumer_id})")
         print(f"👂 Listening for events on:")
-        print(f"   - {settings.inbox_stream} (external)")
-        print(f"   - {settings.internal_stream} (internal/CRM)")
+        for stream in self.streams:
+            internal = stream == settings.internal_stream
+            print(f"   - {stream} ({'internal/CRM' if internal else 'external'})")
         print()
-        logger.info(
-            "Event processor started",
-            consumer_id=self.consumer_id,
-            streams=[settings.inbox_stream, settings.internal_stream],
-        )
+        logger.info("Event processor started", consumer_id=self.consumer_id, streams=self.streams)
 
-        while self._running:
-            await self._process_new_messages()
+        if settings.metrics_log_interval_seconds > 0:
+            self._background_tasks.append(asyncio.create_task(self._log_metrics()))
+        if settings.dedup_compact_interval_seconds > 0:
+            self._background_tasks.append(asyncio.create_task(self._compact_dedup()))
+        if settings.lag_check_interval_seconds > 0:
+            self._background_tasks.append(asyncio.create_task(self._monitor_lag()))
+        if settings.retention_interval_seconds > 0:
+            self._background_tasks.append(asyncio.create_task(self._enforce_retention()))
+        if self.reorder is not None:
+            self._background_tasks.append(asyncio.create_task(self._release_reordered()))
+
+        self.startup.mark_ready()
+        for pool in self.pools.values():
+            pool.start()
+        self._reader_tasks = [asyncio.create_task(self._read_loop(s)) for s in self.streams]
+        self._worker_task = asyncio.create_task(self._work_loop())
+        await asyncio.gather(*self._reader_tasks, self._worker_task)
 
     async def stop(self) -> None:
-        """Stop processing and close connections."""
+        """
+        Drain in-flight work, then stop processing and close connections.
+
+        No new XREADGROUP is issued; batches already read are processed and
+        acknowledged (including any coalesced writes) until
+        ``shutdown_drain_timeout_seconds`` runs out. Whatever is still
+        unacknowledged stays in the PEL and is reported.
+        """
         self._running = False
-        if self.redis:
-            await self.redis.close()
+        self.startup.ready.clear()
+        print("Draining in-flight messages...")
+        drained = await self._drain(settings.shutdown_drain_timeout_seconds)
+
+        for task in (*self._reader_tasks, self._worker_task, *self._background_tasks):
+            if task:
+                task.cancel()
+        for pool in self.pools.values():
+            pool.stop()
+
+        pending = await self._count_pending()
+        print(f"🛑 Stopped: {sum(pending.values())} message(s) left pending")
+        logger.info(
+            "Event processor drained",
+            drained=drained,
+            pending=pending,
+            scheduled_retries=len(self.retries),
+        )
+
+        if self.connections:
+            await self.connections.close()
         if self.mongo:
             self.mongo.close()
         logger.info("Event processor stopped")
 
+    async def _drain(self, timeout: float) -> bool:
+        """
+        Let the readers finish their current read, the worker dispatch every
+        queued batch, the retry scheduler finish the redelivery in progress
+        and the worker pools process what they were given.
+
+        Returns False if the timeout ran out first.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        readers = {task for task in self._reader_tasks if not task.done()}
+        if readers:
+            # Readers exit after their current XREADGROUP (at most one block
+            # timeout), unless waiting out an open circuit
+            read_timeout = settings.block_timeout_ms / 1000 + 1
+            await asyncio.wait(readers, timeout=min(timeout, read_timeout))
+            for task in readers:
+                if not task.done():
+                    task.cancel()
+
+        if self._worker_task and not self._worker_task.done():
+            remaining = max(0.0, deadline - loop.time())
+            try:
+                await asyncio.wait_for(self._batches.join(), timeout=remaining)
+                # A redelivery already claimed its entry; let it reach its pool lane
+                self.retries.stop()
+                remaining = max(0.0, deadline - loop.time())
+                await asyncio.wait_for(self.retries.wait_idle(), timeout=remaining)
+                if self.reorder is not None:
+                    # Nothing else is coming: hand over whatever is still held
+                    for stream, message in self.reorder.expired(now=float("inf")):
+                        await self._dispatch(stream, message)
+                remaining = max(0.0, deadline - loop.time())
+                await asyncio.wait_for(
+                    asyncio.gather(*(pool.join() for pool in self.pools.values())),
+                    timeout=remaining,
+                )
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Drain timed out",
+                    queued_batches=self._batches.qsize(),
+                    queued_messages={name: pool.queued for name, pool in self.pools.items()},
+                )
+                return False
+        return True
+
+    async def _count_pending(self) -> dict[str, int]:
+        """Entries this consumer still holds unacknowledged, per stream."""
+        pending: dict[str, int] = {}
+        if not self.redis:
+            return pending
+        for stream in self.streams:
+            try:
+                summary = await self.redis.xpending(stream, settings.consumer_group)
+            except Exception as e:
+                logger.warning("Could not count pending messages", stream=stream, error=str(e))
+                continue
+            for consumer in summary.get("consumers") or []:
+                name = consumer.get("name")
+                if (name.decode() if isinstance(name, bytes) else name) == self.consumer_id:
+                    pending[stream] = int(consumer.get("pending", 0))
+        return pending
+
+    async def _log_metrics(self) -> None:
+        """Periodically log a snapshot of the in-process metrics."""
+        while True:
+            await asyncio.sleep(settings.metrics_log_interval_seconds)
+            logger.info("Processor metrics", metrics=metrics.snapshot())
+
+    async def _compact_dedup(self) -> None:
+        """Periodically compact dedup state and, if enabled, report its memory footprint."""
+        runs = 0
+        while True:
+            await asyncio.sleep(settings.dedup_compact_interval_seconds)
+            for stream in self.streams:
+                try:
+                    await self.dedup.compact(stream)
+                    report_every = settings.dedup_report_every
+                    if report_every > 0 and runs % report_every == 0:
+                        report = await self.dedup.memory_report(stream)
+                        logger.info(
+                            "Dedup memory",
+                            stream=stream,
+                            store=report.store,
+                            bytes=report.bytes,
+                            key_per_message_keys=report.key_per_message_keys,
+                            key_per_message_bytes=report.key_per_message_bytes,
+                            saved_bytes=report.saved_bytes,
+                        )
+                except Exception as e:
+                    logger.warning("Dedup compaction failed", stream=stream, error=str(e))
+            runs += 1
+
+    async def _monitor_lag(self) -> None:
+        """Periodically measure consumer lag per stream (see lag.py)."""
+        while True:
+            await asyncio.sleep(settings.lag_check_interval_seconds)
+            for stream in self.streams:
+                try:
+                    lag = await self.lag.measure(stream)
+                except Exception as e:
+                    logger.warning("Lag measurement failed", stream=stream, error=str(e))
+                    continue
+                if self.catch_up is not None:
+                    self.catch_up.update(stream, lag.seconds)
+
+    async def _enforce_retention(self) -> None:
+        """Periodically trim acknowledged stream history and cap the DLQ (see retention.py)."""
+        retention = RetentionManager(
+            self.redis,
+            streams=self.streams,
+            dlq_stream=settings.dlq_stream,
+            min_retention_seconds=settings.stream_min_retention_seconds,
+            dlq_retention_seconds=settings.dlq_retention_seconds,
+            dlq_max_length=settings.dlq_max_length,
+        )
+        while True:
+            await asyncio.sleep(settings.retention_interval_seconds)
+            try:
+                await retention.run_once()
+            except Exception as e:
+                logger.warning("Stream retention failed", error=str(e))
+
+    async def _release_reordered(self) -> None:
+        """Re-dispatch events the reorder buffer stopped waiting on (see reorder.py)."""
+        interval = max(0.05, settings.reorder_window_ms / 2000)
+        while True:
+            await asyncio.sleep(interval)
+            for stream, message in self.reorder.expired():
+                await self._dispatch(stream, message)
+
+    async def _ensure_collections(self) -> None:
+        """Time-series collections first, or creating their indexes would create them."""
+        await ensure_time_series(self.db, create=settings.manage_indexes)
+        await ensure_indexes(self.db, create=settings.manage_indexes)
+
     async def _ensure_consumer_group(self, stream: str) -> None:
         """Create consumer group if it doesn't exist for the given stream."""
         try:
@@ -168,12 +535,13 @@ class EventProcessor:
         """Process messages from previous runs that weren't ACKed for the given stream."""
         logger.info("Processing pending messages...", stream=stream)
         processed_count = 0
+        start = "-"
 
         while True:
             pending = await self.redis.xpending_range(
                 stream,
                 settings.consumer_group,
-                min="-",
+                min=start,
                 max="+",
                 count=settings.batch_size,
             )
@@ -181,42 +549,226 @@ class EventProcessor:
             if not pending:
                 break
 
-            for entry in pending:
-                message_id = entry["message_id"]
-                delivery_count = entry["times_delivered"]
+            # Claim the whole page in one round trip
+            delivery_counts = {entry["message_id"]: entry["times_delivered"] for entry in pending}
+            messages = await self.redis.xclaim(
+                stream,
+                settings.consumer_group,
+                self.consumer_id,
+                min_idle_time=0,
+                message_ids=list(delivery_counts),
+            )
 
-                messages = await self.redis.xclaim(
-                    stream,
-                    settings.consumer_group,
-                    self.consumer_id,
-                    min_idle_time=0,
-                    message_ids=[message_id],
-                )
+            for message in messages:
+                await self._process_message(message, stream, delivery_counts.get(message[0], 1))
+                processed_count += 1
 
-                if messages:
-                    await self._process_message(messages[0], stream, delivery_count)
-                    processed_count += 1
+            # Continue after this page; entries that failed again stay pending
+            # and are left to the retry scheduler
+            last_id = pending[-1]["message_id"]
+            start = "(" + (last_id.decode() if isinstance(last_id, bytes) else str(last_id))
 
         logger.info("Pending messages processed", stream=stream, count=processed_count)
 
-    async def _process_new_messages(self) -> None:
-        """Process new messages from both streams."""
-        messages = await self.redis.xreadgroup(
+    async def _read_loop(self, stream: str) -> None:
+        """
+        Prefetch new messages from one stream into the batch queue.
+
+        Reads only as many entries as the in-flight limit allows, so the next
+        XREADGROUP round trip overlaps with processing but a slow MongoDB
+        can't make the processor buffer an unbounded backlog. Each stream has
+        its own loop, so the limit can be exceeded by at most one batch per
+        stream.
+        """
+        while self._running:
+            pause = self.circuits.global_pause() if self.circuits else None
+            if pause is not None:
+                await asyncio.sleep(pause)
+                continue
+
+            in_flight = self._limiter(stream)
+            if in_flight.available == 0:
+                backpressure_waits.inc(stream=stream)
+            capacity = await in_flight.wait_for_capacity()
+            if not self._running:
+                # Draining: don't pull anything new
+                break
+
+            try:
+                messages = await self._read_new_messages(stream, min(settings.batch_size, capacity))
+            except Exception as e:
+                logger.error("Error reading from stream", stream=stream, error=str(e), exc_info=True)
+                await asyncio.sleep(1)
+                continue
+
+            for stream_name, stream_messages in messages or []:
+                stream_name_str = stream_name.decode() if isinstance(stream_name, bytes) else stream_name
+                in_flight.acquire(len(stream_messages))
+                self._report_in_flight()
+                await self._batches.put(stream_name_str, stream_messages)
+
+    async def _work_loop(self) -> None:
+        """Hand prefetched batches to the worker pools; each stream's in the order read."""
+        while True:
+            stream, messages = await self._batches.get()
+            try:
+                for message in messages:
+                    await self._dispatch(stream, message)
+            finally:
+                self._batches.task_done()
+
+    async def _dispatch(self, stream: str, message: tuple[bytes, dict[bytes, bytes]]) -> None:
+        """Route a message to its family's pool, on its aggregate's lane."""
+        fields = {
+            k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+            for k, v in message[1].items()
+        }
+        event_type = fields.get("msg_type") or fields.get("typ") or fields.get("event_type", "")
+        pool = self.pools[event_family(event_type)]
+        await pool.submit(stream, message, aggregate_key(fields))
+
+    async def _process_pooled(
+        self, stream: str, messages: list[tuple[bytes, dict[bytes, bytes]]]
+    ) -> None:
+        """
+        Worker pool callback: process messages, then free their in-flight capacity.
+
+        With the reorder buffer, early messages are held (and stay in flight)
+        and earlier held ones may be released along with these.
+        """
+        if self.reorder is None:
+            ready = [(stream, message, False) for message in messages]
+        else:
+            ready = [item for message in messages for item in self.reorder.offer(stream, message)]
+
+        for ready_stream, group in itertools.groupby(ready, key=lambda item: item[0]):
+            items = list(group)
+            try:
+                # A retry may follow later events for its aggregate, so it is
+                # never treated as in sequence
+                await self._process_batch(
+                    ready_stream,
+                    [message for _, message, _ in items],
+                    in_sequence={
+                        message[0]
+                        for _, message, ordered in items
+                        if ordered and (ready_stream, message[0]) not in self._redeliveries
+                    },
+                )
+            finally:
+                await self._limiter(ready_stream).release(len(items))
+                self._report_in_flight()
+
+    def _limiter(self, stream: str) -> InFlightLimiter:
+        return self._internal_in_flight if stream == settings.internal_stream else self._in_flight
+
+    def _report_in_flight(self) -> None:
+        in_flight_gauge.set(self._in_flight.in_flight, streams="external")
+        in_flight_gauge.set(self._internal_in_flight.in_flight, streams="internal")
+
+    async def _read_new_messages(
+        self, stream: str, count: int
+    ) -> list[tuple[bytes, list[tuple[bytes, dict[bytes, bytes]]]]]:
+        """Read new messages from one stream (one key per XREADGROUP, so one cluster slot)."""
+        return await self.redis_reader.xreadgroup(
             groupname=settings.consumer_group,
             consumername=self.consumer_id,
-            streams={
-                settings.inbox_stream: ">",
-                settings.internal_stream: ">",
-            },
-            count=settings.batch_size,
+            streams={stream: ">"},
+            count=count,
             block=settings.block_timeout_ms,
         )
 
-        if messages:
-            for stream_name, stream_messages in messages:
-                stream_name_str = stream_name.decode() if isinstance(stream_name, bytes) else stream_name
-                for message in stream_messages:
-                    await self._process_message(message, stream_name_str)
+    async def _process_batch(
+        self,
+        stream: str,
+        messages: list[tuple[bytes, dict[bytes, bytes]]],
+        in_sequence: set[bytes] | None = None,
+    ) -> None:
+        """
+        Process a batch of messages from one stream in order.
+
+        Events for coalescing handlers are submitted without waiting for their
+        write, so a run of them can share one MongoDB write. Any other event is
+        a barrier: buffered writes are flushed and acknowledged first, which
+        keeps the relative order of events intact.
+
+        Writes a handler defers with ``deferred.defer_write`` (derived updates
+        such as name fan-out) are applied once, after the whole batch; those
+        messages are acknowledged then.
+        """
+        deferred: list[asyncio.Task[None]] = []
+        after_batch: list[asyncio.Task[None]] = []
+        writes = DeferredWrites()
+
+        with batch_scope(writes):
+            async for prepared in self._prepare_batch(stream, messages, in_sequence):
+                submit = getattr(prepared.handler, "submit", None)
+                if submit is not None:
+                    # Flushes scheduled from here (window timer, full buffer) carry this
+                    # event type; coalesced writes aren't counted per message
+                    message_id = prepared.message_id
+                    if isinstance(message_id, bytes):
+                        message_id = message_id.decode()
+                    with attribute_to(prepared.event_type, str(message_id), observe=False):
+                        prepared.write = submit(self.db, prepared.parsed_event)
+                    deferred.append(asyncio.create_task(self._execute_message(prepared)))
+                    continue
+
+                await self._complete_deferred(deferred)
+                # Continue with the next message once the handler is done, even if
+                # its acknowledgement waits for a deferred write
+                prepared.handled = asyncio.get_running_loop().create_future()
+                task = asyncio.create_task(self._execute_message(prepared))
+                await asyncio.wait({task, prepared.handled}, return_when=asyncio.FIRST_COMPLETED)
+                if not task.done():
+                    after_batch.append(task)
+
+        await self._complete_deferred(deferred)
+        if after_batch:
+            await writes.flush()
+            await asyncio.gather(*after_batch)
+
+    async def _prepare_batch(
+        self,
+        stream: str,
+        messages: list[tuple[bytes, dict[bytes, bytes]]],
+        in_sequence: set[bytes] | None,
+    ) -> AsyncIterator[PreparedMessage]:
+        """
+        Prepare a batch's messages in order, one at a time.
+
+        In catch-up mode the whole batch is prepared first and runs of
+        state-setting events for one aggregate are merged (see compaction.py).
+        """
+        compacting = self.catch_up is not None and self.catch_up.active(stream)
+        batch: list[PreparedMessage] = []
+        for message in messages:
+            delivery_count = self._redeliveries.pop((stream, message[0]), 1)
+            prepared = await self._prepare_message(message, stream, delivery_count)
+            if prepared is None:
+                continue
+            prepared.in_sequence = in_sequence is not None and message[0] in in_sequence
+            if compacting:
+                batch.append(prepared)
+            else:
+                yield prepared
+
+        for group in compact(batch):
+            prepared = group[-1]
+            if len(group) > 1:
+                prepared.handler = merged_handler(group)
+                prepared.absorbed = group[:-1]
+                prepared.log.debug("Compacted state-setting events", merged=len(group))
+            yield prepared
+
+    async def _complete_deferred(self, deferred: list[asyncio.Task[None]]) -> None:
+        """Flush coalescing handlers and wait for the deferred messages to be acknowledged."""
+        if not deferred:
+            return
+        for coalescer in self._coalescers:
+            await coalescer.flush()
+        await asyncio.gather(*deferred)
+        deferred.clear()
 
     async def _process_message(
         self, message: tuple[bytes, dict[bytes, bytes]], stream: str, delivery_count: int = 1
@@ -226,29 +778,51 @@ class EventProcessor:
 
         XACK only happens after successful MongoDB write.
         """
+        prepared = await self._prepare_message(message, stream, delivery_count)
+        if prepared is not None:
+            await self._execute_message(prepared)
+
+    async def _prepare_message(
+        self, message: tuple[bytes, dict[bytes, bytes]], stream: str, delivery_count: int = 1
+    ) -> PreparedMessage | None:
+        """
+        Decode, deduplicate and parse a message.
+
+        Returns None when the message has already been dealt with (duplicate,
+        no handler, or failed to parse).
+        """
         message_id, fields = message
         message_id_str = message_id.decode() if isinstance(message_id, bytes) else str(message_id)
+        root = tracing.start_span(
+            "process_message", stream=stream, message_id=message_id_str, delivery_count=delivery_count
+        )
 
         try:
-            # Decode bytes to strings
-            sanitized = {
-                k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
-                for k, v in fields.items()
-            }
+            with tracing.span("decode", parent=root):
+                # Decode bytes to strings
+                sanitized = {
+                    k.decode() if isinstance(k, bytes) else k: (
+                        v.decode() if isinstance(v, bytes) else v
+                    )
+                    for k, v in fields.items()
+                }
 
-            # Get event type
-            event_type = (
-                sanitized.get("msg_type")
-                or sanitized.get("typ")
-                or sanitized.get("event_type", "")
-            )
+                # Get event type
+                event_type = (
+                    sanitized.get("msg_type")
+                    or sanitized.get("typ")
+                    or sanitized.get("event_type", "")
+                )
 
-            # Get logical event ID for logging (cause/id for tracing)
-            logical_event_id = (
-                sanitized.get("cause")
-                or sanitized.get("id")
-                or sanitized.get("event_id")
-                or message_id_str
+                # Get logical event ID for logging (cause/id for tracing)
+                logical_event_id = (
+                    sanitized.get("cause")
+                    or sanitized.get("id")
+                    or sanitized.get("event_id")
+                    or message_id_str
+                )
+            tracing.set_attributes(
+                root, event_type=event_type, event_id=logical_event_id, cause=sanitized.get("cause")
             )
 
             log = logger.bind(
@@ -264,15 +838,19 @@ class EventProcessor:
 
             # Deduplication check - use Redis entry ID (message_id) as primary key
             # Redis entry ID is guaranteed unique within a stream
-            dedup_key = f"dedup:{stream}:{message_id_str}"
-            if await self.redis.exists(dedup_key):
+            with tracing.span("dedup_check", parent=root):
+                duplicate = await self.dedup.is_processed(stream, message_id_str)
+            if duplicate:
                 print(f"   ⏭️  Skipping duplicate event")
                 log.debug("Duplicate event, skipping")
                 await self.redis.xack(stream, settings.consumer_group, message_id)
-                return
+                tracing.set_attributes(root, outcome="duplicate")
+                tracing.end_span(root)
+                return None
 
             # Parse with appropriate SDK
-            parsed_event = self._parse_event(event_type, sanitized)
+            with tracing.span("parse", parent=root):
+                parsed_event = self._parse_event(event_type, sanitized)
 
             # Get handler
             handler = self.handlers.get(event_type)
@@ -280,36 +858,188 @@ class EventProcessor:
                 print(f"   ⚠️  No handler for event type: {event_type}")
                 log.warning("No handler registered for event type")
                 await self.redis.xack(stream, settings.consumer_group, message_id)
-                return
+                tracing.set_attributes(root, outcome="no_handler")
+                tracing.end_span(root)
+                return None
 
-            # Execute handler (writes to MongoDB)
-            await handler(self.db, parsed_event)
+            if self.circuits:
+                wait = self.circuits.check(event_type)
+                if wait is not None:
+                    self._park(message_id, stream, delivery_count, wait)
+                    tracing.set_attributes(root, outcome="parked")
+                    tracing.end_span(root)
+                    return None
 
-            # Set dedup key with TTL
-            await self.redis.setex(dedup_key, settings.dedup_ttl_seconds, "1")
+            return PreparedMessage(
+                message_id=message_id,
+                fields=fields,
+                stream=stream,
+                delivery_count=delivery_count,
+                event_type=event_type,
+                parsed_event=parsed_event,
+                handler=handler,
+                log=log,
+                span=root,
+            )
 
-            # ACK after successful write
-            await self.redis.xack(stream, settings.consumer_group, message_id)
+        except Exception as e:
+            tracing.end_span(root, e)
+            await self._handle_failure(message_id, fields, stream, delivery_count, e)
+            return None
+
+    async def _execute_message(self, prepared: PreparedMessage) -> None:
+        """Run the handler for a prepared message, then mark it processed and XACK it."""
+        message_id_str = (
+            prepared.message_id.decode()
+            if isinstance(prepared.message_id, bytes)
+            else str(prepared.message_id)
+        )
+
+        handler_name = getattr(prepared.handler, "__name__", type(prepared.handler).__name__)
+
+        try:
+            # Execute handler (writes to MongoDB)
+            with tracing.span("handler", parent=prepared.span, handler=handler_name):
+                if prepared.write is not None:
+                    await prepared.write
+                else:
+                    with attribute_to(prepared.event_type, message_id_str), released(
+                        prepared.in_sequence
+                    ), collect() as pending:
+                        await prepared.handler(self.db, prepared.parsed_event)
+                    if pending:
+                        # Applied at the end of the batch (see _process_batch)
+                        if prepared.handled is not None and not prepared.handled.done():
+                            prepared.handled.set_result(None)
+                        await asyncio.gather(*pending)
+
+            # Mark processed and ACK after successful write, in one round trip
+            # (together with any entries compacted into this write)
+            acked = [*prepared.absorbed, prepared]
+            with tracing.span("ack", parent=prepared.span):
+                pipe = self.redis.pipeline(transaction=False)
+                for entry in acked:
+                    entry_id = entry.message_id
+                    self.dedup.mark_processed(
+                        pipe,
+                        entry.stream,
+                        entry_id.decode() if isinstance(entry_id, bytes) else str(entry_id),
+                    )
+                pipe.xack(
+                    prepared.stream,
+                    settings.consumer_group,
+                    *(entry.message_id for entry in acked),
+                )
+                await pipe.execute()
 
+            for entry in acked:
+                self.startup.acked()
+                age = self.lag.observe_ack(entry.stream, entry.message_id, entry.fields)
+            for entry in prepared.absorbed:
+                tracing.set_attributes(entry.span, outcome="compacted")
+                tracing.end_span(entry.span)
             print(f"   ✅ Processed successfully")
-            log.info("Event processed successfully")
+            prepared.log.info("Event processed successfully", age_seconds=round(age, 3))
+            if self.circuits:
+                # Every entry took its circuits' probe slots in _prepare_message
+                for entry in acked:
+                    self.circuits.record(entry.event_type)
+            tracing.end_span(prepared.span)
 
         except Exception as e:
-            print(f"   ❌ Error: {e}")
-            logger.error(
-                "Error processing message",
-                message_id=message_id_str,
-                stream=stream,
-                error=str(e),
-                delivery_count=delivery_count,
-                exc_info=True,
-            )
+            tracing.end_span(prepared.span, e)
+            if self.circuits:
+                for entry in [*prepared.absorbed, prepared]:
+                    self.circuits.record(entry.event_type, e)
+            # Compacted entries failed with the write; each is retried on its own
+            for entry in [*prepared.absorbed, prepared]:
+                if entry is not prepared:
+                    tracing.end_span(entry.span, e)
+                await self._handle_failure(
+                    entry.message_id, entry.fields, entry.stream, entry.delivery_count, e
+                )
 
-            if delivery_count >= settings.max_retries:
-                print(f"   🗑️  Moving to DLQ after {delivery_count} attempts")
-                await self._move_to_dlq(message_id, fields, str(e))
-                await self.redis.xack(stream, settings.consumer_group, message_id)
-                logger.error("Message moved to DLQ", message_id=message_id_str)
+    async def _handle_failure(
+        self,
+        message_id: bytes,
+        fields: dict[bytes, bytes],
+        stream: str,
+        delivery_count: int,
+        error: Exception,
+    ) -> None:
+        """Log a processing failure and move the message to the DLQ once out of retries."""
+        message_id_str = message_id.decode() if isinstance(message_id, bytes) else str(message_id)
+
+        print(f"   ❌ Error: {error}")
+        logger.error(
+            "Error processing message",
+            message_id=message_id_str,
+            stream=stream,
+            error=str(error),
+            delivery_count=delivery_count,
+            exc_info=True,
+        )
+
+        if delivery_count >= settings.max_retries:
+            print(f"   🗑️  Moving to DLQ after {delivery_count} attempts")
+            await self._move_to_dlq(message_id, fields, str(error), stream)
+            await self.redis.xack(stream, settings.consumer_group, message_id)
+            dlq_messages.inc(stream=stream)
+            logger.error("Message moved to DLQ", message_id=message_id_str)
+        else:
+            delay = self.retries.schedule(stream, message_id, delivery_count)
+            if delay is not None:
+                logger.info(
+                    "Retry scheduled",
+                    message_id=message_id_str,
+                    stream=stream,
+                    attempt=delivery_count + 1,
+                    delay_seconds=round(delay, 3),
+                )
+
+    def _park(self, message_id: bytes, stream: str, delivery_count: int, wait: float) -> None:
+        """
+        Leave a message in the PEL until its circuit probes again.
+
+        The delivery doesn't count as an attempt: the redelivery is processed
+        with the same delivery count.
+        """
+        self.retries.schedule(stream, message_id, delivery_count - 1, delay=wait)
+        parked_messages.inc(stream=stream)
+        logger.debug(
+            "Circuit open, message parked",
+            message_id=message_id,
+            stream=stream,
+            open_circuits=self.circuits.open_circuits() if self.circuits else [],
+            retry_in_seconds=round(wait, 3),
+        )
+
+    async def _redeliver(self, entry: RetryEntry) -> None:
+        """
+        Claim a failed entry back from the PEL and dispatch it again.
+
+        It takes the same path as a newly read entry (in-flight limit, its
+        aggregate's pool lane, reorder buffer, batch), so it can't run
+        alongside or after later events for its aggregate on another task.
+        """
+        messages = await self.redis.xclaim(
+            entry.stream,
+            settings.consumer_group,
+            self.consumer_id,
+            min_idle_time=0,
+            message_ids=[entry.message_id],
+        )
+        if not messages:
+            # Acked elsewhere or trimmed from the stream in the meantime
+            return
+
+        message = messages[0]
+        in_flight = self._limiter(entry.stream)
+        await in_flight.wait_for_capacity()
+        in_flight.acquire(1)
+        self._report_in_flight()
+        self._redeliveries[(entry.stream, message[0])] = entry.attempt + 1
+        await self._dispatch(entry.stream, message)
 
     def _parse_event(self, event_type: str, sanitized: dict[str, Any]) -> Any:
         """Parse event using appropriate SDK."""
@@ -318,11 +1048,11 @@ class EventProcessor:
         
         if event_type.startswith("account.") or event_type.startswith("payment."):
             # Use accounts SDK
-            return parse_account_message(sdk_data)
+            return sdk_parser("accounts")(sdk_data)
 
         elif event_type.startswith("customer.") or event_type.startswith("application."):
             # Use customers SDK
-            payload = parse_customer_message(sdk_data)
+            payload = sdk_parser("customers")(sdk_data)
             # Wrap in mock ParsedEvent for consistency
             return type(
                 "ParsedEvent",
@@ -335,12 +1065,16 @@ class EventProcessor:
                 },
             )()
 
+        elif event_type.startswith("ledger."):
+            # Use ledger SDK
+            return sdk_parser("ledger")(sdk_data)
+
         else:
             # Chat events - return raw dict
             return sanitized
 
     async def _move_to_dlq(
-        self, message_id: bytes, fields: dict[bytes, bytes], error: str
+        self, message_id: bytes, fields: dict[bytes, bytes], error: str, stream: str
     ) -> None:
         """Move failed message to dead letter queue."""
         message_id_str = message_id.decode() if isinstance(message_id, bytes) else str(message_id)
@@ -351,6 +1085,7 @@ class EventProcessor:
                 for k, v in fields.items()
             },
             "original_message_id": message_id_str,
+            "original_stream": stream,
             "error": error,
             "moved_at": datetime.utcnow().isoformat(),
         }
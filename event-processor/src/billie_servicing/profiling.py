@@ -0,0 +1,186 @@
+"""On-demand CPU profiling of a live processor.
+
+``SIGUSR1`` (or ``POST /profile/start`` on the admin endpoint) starts a
+cProfile session on the event loop thread; ``SIGUSR2`` (or
+``POST /profile/stop``) stops it and writes two files to ``PROFILE_DIR``:
+
+- ``profile-<timestamp>.prof`` - raw stats for ``python -m pstats``, snakeviz
+  or similar tools
+- ``profile-<timestamp>.txt`` - a per-handler table followed by the top
+  ``PROFILE_TOP_N`` functions by cumulative time
+
+cProfile counts each resumption of a coroutine as a call and only times it
+while it is running, so a handler's cumulative time is the CPU spent in it
+(and its callees) rather than time spent waiting on MongoDB. Profiling adds
+overhead while it is on, so capture for tens of seconds rather than hours.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import signal
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+import structlog
+
+logger = structlog.get_logger()
+
+# pstats key: (filename, first line, function name)
+FunctionKey = tuple[str, int, str]
+
+
+@dataclass
+class HandlerProfile:
+    """CPU time attributed to one handler over a profiling session."""
+
+    name: str
+    calls: int
+    own_seconds: float
+    cumulative_seconds: float
+
+
+@dataclass
+class ProfileResult:
+    started_at: datetime
+    duration_seconds: float
+    stats_path: str
+    summary_path: str
+    handlers: list[HandlerProfile]
+
+
+def handler_key(handler: Any) -> FunctionKey | None:
+    """pstats key of a handler function, or of ``__call__`` for callable objects."""
+    func = handler if hasattr(handler, "__code__") else getattr(type(handler), "__call__", None)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return None
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class Profiler:
+    """Starts and stops cProfile sessions and writes their results to disk."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        top_n: int = 30,
+        handlers: Callable[[], Iterable[Any]] | None = None,
+    ) -> None:
+        self.output_dir = output_dir
+        self.top_n = top_n
+        # Called at stop time so handlers registered later are included
+        self._handlers = handlers or (lambda: [])
+        self._profile: cProfile.Profile | None = None
+        self._started_at: datetime | None = None
+        self._started_monotonic = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+
+    def start(self) -> bool:
+        """Start profiling; returns False if a session is already running."""
+        if self._profile is not None:
+            return False
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiler (e.g. a debugger) already owns the thread
+            logger.warning("Could not start profiler", error=str(e))
+            return False
+        self._profile = profile
+        self._started_at = datetime.utcnow()
+        self._started_monotonic = time.monotonic()
+        print("🔬 Profiling started")
+        logger.info("Profiling started")
+        return True
+
+    def stop(self) -> ProfileResult | None:
+        """Stop profiling and write the results; None if no session was running."""
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return None
+        profile.disable()
+        duration = time.monotonic() - self._started_monotonic
+        started_at = self._started_at or datetime.utcnow()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{started_at.strftime('%Y%m%d-%H%M%S')}")
+        stats_path, summary_path = f"{base}.prof", f"{base}.txt"
+        profile.dump_stats(stats_path)
+
+        stats = pstats.Stats(profile)
+        handlers = self._handler_profiles(stats)
+        with open(summary_path, "w") as out:
+            out.write(self._summary(stats, started_at, duration, handlers))
+
+        print(f"🔬 Profiling stopped after {duration:.1f}s: {summary_path}")
+        logger.info(
+            "Profiling stopped",
+            duration_seconds=round(duration, 1),
+            stats_path=stats_path,
+            summary_path=summary_path,
+        )
+        return ProfileResult(started_at, duration, stats_path, summary_path, handlers)
+
+    def _handler_profiles(self, stats: pstats.Stats) -> list[HandlerProfile]:
+        entries = stats.stats  # type: ignore[attr-defined]
+        results: dict[FunctionKey, HandlerProfile] = {}
+        for handler in self._handlers():
+            key = handler_key(handler)
+            if key is None or key in results or key not in entries:
+                continue
+            _, calls, own, cumulative, _ = entries[key]
+            name = getattr(handler, "__name__", type(handler).__name__)
+            results[key] = HandlerProfile(name, calls, own, cumulative)
+        return sorted(results.values(), key=lambda h: h.cumulative_seconds, reverse=True)
+
+    def _summary(
+        self,
+        stats: pstats.Stats,
+        started_at: datetime,
+        duration: float,
+        handlers: list[HandlerProfile],
+    ) -> str:
+        out = io.StringIO()
+        out.write(f"Profile started {started_at.isoformat()}Z, {duration:.1f}s\n\n")
+        out.write("Handlers (CPU while running, excluding time awaiting I/O)\n")
+        out.write(f"{'handler':<40} {'calls':>8} {'own s':>10} {'cumulative s':>14}\n")
+        for h in handlers:
+            out.write(
+                f"{h.name:<40} {h.calls:>8} {h.own_seconds:>10.4f} {h.cumulative_seconds:>14.4f}\n"
+            )
+        if not handlers:
+            out.write("(no handler calls recorded)\n")
+
+        out.write(f"\nTop {self.top_n} functions by cumulative time\n")
+        stats.stream = out  # type: ignore[attr-defined]
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        return out.getvalue()
+
+    def install_signal_handlers(self, loop: Any) -> None:
+        """SIGUSR1 starts a session, SIGUSR2 stops it and writes the results."""
+        loop.add_signal_handler(signal.SIGUSR1, self.start)
+        loop.add_signal_handler(signal.SIGUSR2, self.stop)
+
+    def add_admin_routes(self, admin: Any) -> None:
+        """Register ``POST /profile/start`` and ``POST /profile/stop``."""
+
+        async def start() -> tuple[int, str, str]:
+            started = self.start()
+            return 200, "text/plain", "started\n" if started else "already running\n"
+
+        async def stop() -> tuple[int, str, str]:
+            result = self.stop()
+            if result is None:
+                return 200, "text/plain", "not running\n"
+            with open(result.summary_path) as summary:
+                return 200, "text/plain", summary.read()
+
+        admin.add_route("POST", "/profile/start", start)
+        admin.add_route("POST", "/profile/stop", stop)
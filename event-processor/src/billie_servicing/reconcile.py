@@ -0,0 +1,238 @@
+"""Reconciliation of the projections the handlers maintain with ``$inc``.
+
+``dashboard-counters`` (``handlers/counters.py``) and ``customer-summaries``
+(``handlers/summary.py``) are kept current with deltas, so anything that
+skips a delta (a failure between a handler's write and its counter update,
+a manual edit, data that pre-dates the projection) leaves them off until
+corrected. This command recounts both from their source collections with
+aggregations and applies the difference to each stored value with ``$inc``,
+in bulk writes. Only values that drifted are written.
+
+Increments the processor applies while the recount runs can be counted
+twice or missed; run it when the processor has caught up, and a second run
+settles anything left over.
+
+Usage:
+    billie-servicing-reconcile --dry-run
+    billie-servicing-reconcile --only counters
+"""
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any
+
+import structlog
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from .config import settings
+from .handlers import counters, summary
+
+logger = structlog.get_logger()
+
+TARGETS = ("counters", "summaries")
+
+
+@dataclass
+class Drift:
+    """A stored value that differs from its recount, and the correction."""
+
+    target: str  # counter name, or the summaries collection
+    key: str  # counter key, or customer ID
+    changes: dict[str, float]
+
+
+@dataclass
+class ReconcileResult:
+    checked: int = 0
+    drift: list[Drift] = field(default_factory=list)
+    written: int = 0
+
+
+async def _bulk(
+    db: AsyncIOMotorDatabase, collection: str, updates: list[UpdateOne], batch_size: int
+) -> int:
+    written = 0
+    for start in range(0, len(updates), batch_size):
+        result = await db[collection].bulk_write(updates[start : start + batch_size], ordered=False)
+        written += result.modified_count + result.upserted_count
+    return written
+
+
+async def reconcile_counters(
+    db: AsyncIOMotorDatabase, dry_run: bool = False, batch_size: int = 500
+) -> ReconcileResult:
+    """Recount every counter in ``counters.COUNTERS`` and correct the stored values."""
+    result = ReconcileResult()
+    updates: list[UpdateOne] = []
+
+    if not dry_run:
+        # The recount includes pending requests whose delivery hasn't counted them
+        # yet; mark them counted so a later redelivery doesn't add them again
+        await db["write-off-requests"].update_many(
+            {"status": "pending", "pendingCounted": False}, {"$set": {"pendingCounted": True}}
+        )
+
+    for name, spec in counters.COUNTERS.items():
+        pipeline = [
+            {"$match": {**spec.match, spec.key_field: {"$nin": [None, ""]}}},
+            {"$group": {"_id": f"${spec.key_field}", "value": {"$sum": 1}}},
+        ]
+        actual = {
+            str(row["_id"]): row["value"]
+            async for row in db[spec.collection].aggregate(pipeline)
+        }
+        stored = {
+            doc["key"]: doc.get("value", 0)
+            async for doc in db[counters.COLLECTION].find({"counter": name})
+        }
+
+        for key in sorted(actual.keys() | stored.keys()):
+            result.checked += 1
+            delta = actual.get(key, 0) - stored.get(key, 0)
+            if delta:
+                result.drift.append(Drift(name, key, {"value": delta}))
+                updates.append(counters.counter_update(name, key, delta))
+
+    if updates and not dry_run:
+        result.written = await _bulk(db, counters.COLLECTION, updates, batch_size)
+    return result
+
+
+async def _expected_summaries(db: AsyncIOMotorDatabase) -> dict[str, dict[str, float]]:
+    """Summary counts and totals per customer, recounted from loan-accounts."""
+    pipeline = [
+        {"$match": {"customerIdString": {"$nin": [None, ""]}}},
+        {
+            "$group": {
+                "_id": {"customer": "$customerIdString", "status": "$accountStatus"},
+                "count": {"$sum": 1},
+                "outstanding": {"$sum": {"$ifNull": ["$balances.totalOutstanding", 0]}},
+            }
+        },
+    ]
+    expected: dict[str, dict[str, float]] = {}
+    async for row in db["loan-accounts"].aggregate(pipeline):
+        values = expected.setdefault(row["_id"]["customer"], {})
+        values["accountCount"] = values.get("accountCount", 0) + row["count"]
+        values["totalOutstanding"] = values.get("totalOutstanding", 0.0) + row["outstanding"]
+        if row["_id"].get("status"):
+            values[f"accountsByStatus.{row['_id']['status']}"] = row["count"]
+    return expected
+
+
+def _stored_values(doc: dict[str, Any]) -> dict[str, float]:
+    values = {
+        "accountCount": doc.get("accountCount", 0),
+        "totalOutstanding": doc.get("totalOutstanding", 0.0),
+    }
+    for status, count in (doc.get("accountsByStatus") or {}).items():
+        values[f"accountsByStatus.{status}"] = count
+    return values
+
+
+async def reconcile_summaries(
+    db: AsyncIOMotorDatabase, dry_run: bool = False, batch_size: int = 500
+) -> ReconcileResult:
+    """
+    Recount customer summaries from their loan accounts and correct them.
+
+    Also carries each account's ``lastPayment`` over to its customer's summary
+    where it is later than the one recorded, which backfills customers whose
+    accounts pre-date the projection.
+    """
+    result = ReconcileResult()
+    expected = await _expected_summaries(db)
+    updates: list[UpdateOne] = []
+
+    stored: dict[str, dict[str, float]] = {}
+    projection = {"customerId": 1, "accountCount": 1, "totalOutstanding": 1, "accountsByStatus": 1}
+    async for doc in db[summary.COLLECTION].find({}, projection):
+        stored[doc["customerId"]] = _stored_values(doc)
+
+    for customer_id in sorted(expected.keys() | stored.keys()):
+        result.checked += 1
+        want, have = expected.get(customer_id, {}), stored.get(customer_id, {})
+        inc: dict[str, float] = {}
+        for field_name in want.keys() | have.keys():
+            delta = want.get(field_name, 0) - have.get(field_name, 0)
+            if field_name == "totalOutstanding":
+                delta = round(delta, 2)
+            if delta:
+                inc[field_name] = delta
+        if inc:
+            result.drift.append(Drift(summary.COLLECTION, customer_id, inc))
+            updates.append(UpdateOne(*summary.summary_change(customer_id, inc), upsert=True))
+
+    if updates and not dry_run:
+        result.written = await _bulk(db, summary.COLLECTION, updates, batch_size)
+
+    # After the summaries exist; these only match summaries whose lastPayment is older
+    payment_updates: list[UpdateOne] = []
+    payments = db["loan-accounts"].find(
+        {"customerIdString": {"$nin": [None, ""]}, "lastPayment.date": {"$exists": True}},
+        {"loanAccountId": 1, "customerIdString": 1, "lastPayment": 1},
+    )
+    async for account in payments:
+        last_payment = account["lastPayment"]
+        payment_updates.append(
+            UpdateOne(
+                *summary.payment_change(
+                    account["customerIdString"],
+                    account["loanAccountId"],
+                    last_payment["date"],
+                    last_payment.get("amount"),
+                )
+            )
+        )
+
+    if payment_updates and not dry_run:
+        result.written += await _bulk(db, summary.COLLECTION, payment_updates, batch_size)
+    return result
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Recount dashboard counters and customer summaries and fix any drift"
+    )
+    parser.add_argument("--database-uri", default=settings.database_uri)
+    parser.add_argument("--db-name", default=settings.db_name)
+    parser.add_argument("--only", choices=TARGETS, help="Reconcile just one projection")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without fixing it")
+    return parser.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace) -> dict[str, ReconcileResult]:
+    client: AsyncIOMotorClient = AsyncIOMotorClient(args.database_uri)
+    db = client[args.db_name]
+    reconcilers = {"counters": reconcile_counters, "summaries": reconcile_summaries}
+    try:
+        return {
+            target: await reconcilers[target](db, args.dry_run, args.batch_size)
+            for target in TARGETS
+            if args.only in (None, target)
+        }
+    finally:
+        client.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line entry point."""
+    args = _parse_args(argv)
+    results = asyncio.run(_run(args))
+
+    for target, result in results.items():
+        print(f"{target}: checked {result.checked}, {len(result.drift)} drifted")
+        for drift in result.drift:
+            changes = ", ".join(
+                f"{name} {delta:+g}" for name, delta in sorted(drift.changes.items())
+            )
+            print(f"   - {drift.target}:{drift.key}: {changes}")
+        if not args.dry_run:
+            print(f"   Wrote {result.written} corrections")
+
+
+if __name__ == "__main__":
+    main()
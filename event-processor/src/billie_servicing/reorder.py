@@ -0,0 +1,249 @@
+"""Per-aggregate reorder buffer.
+
+Events for one aggregate can arrive out of order, for example
+``account.schedule.updated`` before ``account.schedule.created``, or
+``writeoff.approved`` before ``writeoff.requested``. Handlers used to cover
+for this with reads before writes and placeholder upserts on every event.
+
+``ReorderBuffer`` sits in front of the handlers (in the worker pool lanes)
+and holds an event back when it is early:
+
+- its envelope ``seq`` skips ahead of the last ``seq`` released for the
+  aggregate, or
+- it depends on an event type (``PREREQUISITES``) not yet seen for the
+  aggregate. CRM events all carry ``seq`` 1, so this is what orders them.
+
+A held event is released as soon as the gap is filled. If the gap isn't
+filled within ``REORDER_WINDOW_MS`` (or more than ``REORDER_MAX_HELD`` events
+are held), it is released anyway and flagged as out of sequence.
+
+Handlers call ``in_sequence()`` to find out whether the event was released
+in order. Only out-of-sequence events take the old fallback paths. Events
+handled outside the buffer (pending recovery) and retries are never in
+sequence, so those fallbacks still cover restarts.
+
+State is per process and in memory. After a restart, or when the
+prerequisite was handled by another consumer, an aggregate's first dependent
+event waits up to the window and then takes the fallback path. Its release
+counts as the prerequisite, so later dependent events for the aggregate are
+not held for it again. Because of this the buffer is off by default
+(``REORDER_WINDOW_MS=0``).
+"""
+
+import collections
+import contextvars
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from .metrics import metrics
+from .partitions import aggregate_key
+
+reorder_held = metrics.gauge("reorder_held_events", "Events held back waiting for earlier ones")
+reorder_outcomes = metrics.counter("reorder_events_total", "Events passed through the reorder buffer")
+reorder_hold_seconds = metrics.histogram(
+    "reorder_hold_seconds", "Time events were held before release"
+)
+
+# Event type -> the event type that must be handled first for the same aggregate
+PREREQUISITES: dict[str, str] = {
+    "account.schedule.updated.v1": "account.schedule.created.v1",
+    "writeoff.approved.v1": "writeoff.requested.v1",
+    "writeoff.rejected.v1": "writeoff.requested.v1",
+    "writeoff.cancelled.v1": "writeoff.requested.v1",
+}
+
+Message = tuple[bytes, dict[bytes, bytes]]
+
+_in_sequence: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "reorder_in_sequence", default=False
+)
+
+
+def in_sequence() -> bool:
+    """Whether the event being handled was released in order by the reorder buffer."""
+    return _in_sequence.get()
+
+
+@contextmanager
+def released(ordered: bool) -> Iterator[None]:
+    """Mark the handler call inside the block as in (or out of) sequence."""
+    token = _in_sequence.set(ordered)
+    try:
+        yield
+    finally:
+        _in_sequence.reset(token)
+
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def envelope(fields: dict[Any, Any]) -> tuple[str, str | None, int]:
+    """Event type, aggregate and ``seq`` (0 when missing) of a raw stream entry."""
+    decoded = {_decode(k): _decode(v) for k, v in fields.items()}
+    event_type = decoded.get("msg_type") or decoded.get("typ") or decoded.get("event_type", "")
+    try:
+        seq = int(decoded.get("seq") or 0)
+    except (TypeError, ValueError):
+        seq = 0
+    return event_type, aggregate_key(decoded), seq
+
+
+@dataclass
+class _Held:
+    stream: str
+    message: Message
+    event_type: str
+    seq: int
+    held_at: float
+
+
+@dataclass
+class _Aggregate:
+    last_seq: int | None = None
+    seen_types: set[str] = field(default_factory=set)
+    held: list[_Held] = field(default_factory=list)
+    # An event was released out of sequence, so later ones can't assume order
+    forced: bool = False
+
+
+class ReorderBuffer:
+    """Holds early events per aggregate and releases them in sequence."""
+
+    def __init__(
+        self, window_seconds: float, max_held: int, max_aggregates: int = 100_000
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.max_held = max(1, max_held)
+        self.max_aggregates = max_aggregates
+        self._aggregates: collections.OrderedDict[str, _Aggregate] = collections.OrderedDict()
+        self._held = 0
+        # Released by timeout/overflow and re-dispatched; passed straight through
+        self._forced: set[bytes] = set()
+        self._overflow: list[tuple[str, Message]] = []
+
+    @property
+    def held(self) -> int:
+        return self._held
+
+    def offer(self, stream: str, message: Message) -> list[tuple[str, Message, bool]]:
+        """
+        Offer a message; returns the messages to handle now, in order, as
+        ``(stream, message, in_sequence)``. The offered one may be held.
+        """
+        message_id = message[0]
+        if message_id in self._forced:
+            self._forced.discard(message_id)
+            reorder_outcomes.inc(outcome="forced")
+            return [(stream, message, False)]
+
+        event_type, aggregate, seq = envelope(message[1])
+        if aggregate is None:
+            reorder_outcomes.inc(outcome="unsequenced")
+            return [(stream, message, False)]
+
+        state = self._state(aggregate)
+        if not self._ready(state, event_type, seq):
+            state.held.append(_Held(stream, message, event_type, seq, time.monotonic()))
+            self._held += 1
+            reorder_held.set(self._held)
+            reorder_outcomes.inc(outcome="held")
+            if self._held > self.max_held:
+                self._overflow.extend(self._force_oldest())
+            return []
+
+        self._note(state, event_type, seq)
+        reorder_outcomes.inc(outcome="in_order")
+        return [(stream, message, not state.forced), *self._drain(state)]
+
+    def expired(self, now: float | None = None) -> list[tuple[str, Message]]:
+        """
+        Messages held past the window (or evicted for space), to be dispatched
+        again; they are released out of sequence when offered back.
+        """
+        now = time.monotonic() if now is None else now
+        released, self._overflow = self._overflow, []
+        for state in self._aggregates.values():
+            if state.held and now - min(h.held_at for h in state.held) >= self.window_seconds:
+                released.extend(self._force(state))
+        return released
+
+    def _state(self, aggregate: str) -> _Aggregate:
+        state = self._aggregates.get(aggregate)
+        if state is None:
+            state = self._aggregates[aggregate] = _Aggregate()
+            self._evict()
+        else:
+            self._aggregates.move_to_end(aggregate)
+        return state
+
+    def _evict(self) -> None:
+        """Forget the least recently used aggregates that have nothing held."""
+        # The most recent one is the aggregate being offered
+        for aggregate in list(self._aggregates)[:-1]:
+            if len(self._aggregates) <= self.max_aggregates:
+                return
+            if not self._aggregates[aggregate].held:
+                del self._aggregates[aggregate]
+
+    @staticmethod
+    def _ready(state: _Aggregate, event_type: str, seq: int) -> bool:
+        prerequisite = PREREQUISITES.get(event_type)
+        if prerequisite is not None and prerequisite not in state.seen_types:
+            return False
+        if state.last_seq is None or seq <= 0:
+            return True
+        return seq <= state.last_seq + 1
+
+    @staticmethod
+    def _note(state: _Aggregate, event_type: str, seq: int) -> None:
+        state.seen_types.add(event_type)
+        if seq > 0:
+            state.last_seq = seq if state.last_seq is None else max(state.last_seq, seq)
+
+    def _drain(self, state: _Aggregate) -> list[tuple[str, Message, bool]]:
+        """Release held events that are now in sequence, lowest ``seq`` first."""
+        released: list[tuple[str, Message, bool]] = []
+        progress = True
+        while progress:
+            progress = False
+            for held in sorted(state.held, key=lambda h: h.seq):
+                if self._ready(state, held.event_type, held.seq):
+                    state.held.remove(held)
+                    self._release(state, held)
+                    released.append((held.stream, held.message, not state.forced))
+                    progress = True
+                    break
+        return released
+
+    def _force(self, state: _Aggregate) -> list[tuple[str, Message]]:
+        """Release everything held for an aggregate, out of sequence."""
+        state.forced = True
+        forced = []
+        for held in sorted(state.held, key=lambda h: h.seq):
+            self._release(state, held)
+            # Whatever the event waited for was handled elsewhere or is lost;
+            # don't make every later dependent event wait for it too
+            prerequisite = PREREQUISITES.get(held.event_type)
+            if prerequisite is not None:
+                state.seen_types.add(prerequisite)
+            self._forced.add(held.message[0])
+            forced.append((held.stream, held.message))
+        state.held.clear()
+        reorder_outcomes.inc(len(forced), outcome="expired")
+        return forced
+
+    def _force_oldest(self) -> list[tuple[str, Message]]:
+        oldest = min(
+            (state for state in self._aggregates.values() if state.held),
+            key=lambda state: min(h.held_at for h in state.held),
+        )
+        return self._force(oldest)
+
+    def _release(self, state: _Aggregate, held: _Held) -> None:
+        self._note(state, held.event_type, held.seq)
+        self._held -= 1
+        reorder_held.set(self._held)
+        reorder_hold_seconds.observe(time.monotonic() - held.held_at)
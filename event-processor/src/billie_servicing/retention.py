@@ -0,0 +1,163 @@
+"""Retention for the inbox streams and the DLQ.
+
+Nothing else trims the streams, so without this Redis memory grows with
+every event ever received. ``RetentionManager`` periodically trims each
+inbox stream with ``XTRIM MINID`` up to a safe point:
+
+- never past the oldest entry still pending for *any* consumer group, or
+  past the last entry a group has been delivered (older entries have been
+  acknowledged by everyone and can never be redelivered);
+- never past ``now - STREAM_MIN_RETENTION_SECONDS``, so recent history is
+  always available for inspection or replay.
+
+The DLQ is capped by age (``DLQ_RETENTION_SECONDS``) and length
+(``DLQ_MAX_LENGTH``). Trimming is approximate (``~``) so Redis only drops
+whole macro nodes, which keeps XTRIM cheap. The stream's ``MEMORY USAGE``
+before and after is reported as bytes reclaimed.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import redis.asyncio as redis
+import structlog
+
+from .dedup import parse_stream_id
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+trimmed_entries = metrics.counter("stream_trimmed_entries_total", "Entries removed by retention")
+reclaimed_bytes = metrics.counter("stream_reclaimed_bytes_total", "Memory reclaimed by retention")
+stream_length = metrics.gauge("stream_length", "Entries in the stream")
+stream_memory = metrics.gauge("stream_memory_bytes", "MEMORY USAGE of the stream")
+
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _min_id(a: str | None, b: str) -> str:
+    if a is None or parse_stream_id(b) < parse_stream_id(a):
+        return b
+    return a
+
+
+@dataclass
+class TrimReport:
+    """Outcome of trimming one stream."""
+
+    stream: str
+    # Entries below this ID were eligible for trimming (None = nothing was)
+    min_id: str | None
+    trimmed: int
+    length: int
+    bytes_before: int | None
+    bytes_after: int | None
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        if self.bytes_before is None or self.bytes_after is None:
+            return 0
+        return max(0, self.bytes_before - self.bytes_after)
+
+
+class RetentionManager:
+    """Trims acknowledged history from the inbox streams and caps the DLQ."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        streams: list[str],
+        dlq_stream: str,
+        min_retention_seconds: int,
+        dlq_retention_seconds: int,
+        dlq_max_length: int,
+    ) -> None:
+        self.redis = redis_client
+        self.streams = streams
+        self.dlq_stream = dlq_stream
+        self.min_retention_seconds = min_retention_seconds
+        self.dlq_retention_seconds = dlq_retention_seconds
+        self.dlq_max_length = dlq_max_length
+
+    async def run_once(self) -> list[TrimReport]:
+        """Trim every inbox stream and the DLQ once."""
+        reports = [await self.trim_stream(stream) for stream in self.streams]
+        reports.append(await self.trim_dlq())
+        for report in reports:
+            if report.trimmed:
+                logger.info(
+                    "Stream trimmed",
+                    stream=report.stream,
+                    min_id=report.min_id,
+                    trimmed=report.trimmed,
+                    length=report.length,
+                    reclaimed_bytes=report.reclaimed_bytes,
+                )
+        return reports
+
+    async def safe_trim_id(self, stream: str) -> str | None:
+        """
+        Lowest ID any consumer group may still need, or None if the stream
+        has no groups (nothing is known to be consumed, so nothing is trimmed).
+        """
+        groups = await self.redis.xinfo_groups(stream)
+        if not groups:
+            return None
+
+        safe: str | None = None
+        for group in groups:
+            name = _decode(group.get("name"))
+            if int(group.get("pending") or 0):
+                summary = await self.redis.xpending(stream, name)
+                safe = _min_id(safe, _decode(summary["min"]))
+            else:
+                last = _decode(group.get("last-delivered-id")) or "0-0"
+                ms, seq = parse_stream_id(last)
+                safe = _min_id(safe, f"{ms}-{seq + 1}" if last != "0-0" else "0-0")
+        return safe
+
+    async def trim_stream(self, stream: str) -> TrimReport:
+        safe = await self.safe_trim_id(stream)
+        min_id = None
+        if safe is not None:
+            retention_floor = int(time.time() * 1000) - self.min_retention_seconds * 1000
+            min_id = _min_id(safe, f"{retention_floor}-0")
+        return await self._trim(stream, min_id=min_id)
+
+    async def trim_dlq(self) -> TrimReport:
+        oldest_kept = int(time.time() * 1000) - self.dlq_retention_seconds * 1000
+        return await self._trim(
+            self.dlq_stream, min_id=f"{oldest_kept}-0", max_length=self.dlq_max_length
+        )
+
+    async def _trim(
+        self, stream: str, min_id: str | None, max_length: int | None = None
+    ) -> TrimReport:
+        before = await self._memory_usage(stream)
+        trimmed = 0
+        if min_id is not None and min_id != "0-0":
+            trimmed += await self.redis.xtrim(stream, minid=min_id, approximate=True)
+        if max_length:
+            trimmed += await self.redis.xtrim(stream, maxlen=max_length, approximate=True)
+        after = await self._memory_usage(stream) if trimmed else before
+        length = await self.redis.xlen(stream)
+
+        report = TrimReport(stream, min_id, trimmed, length, before, after)
+        stream_length.set(length, stream=stream)
+        if after is not None:
+            stream_memory.set(after, stream=stream)
+        if trimmed:
+            trimmed_entries.inc(trimmed, stream=stream)
+            reclaimed_bytes.inc(report.reclaimed_bytes, stream=stream)
+        return report
+
+    async def _memory_usage(self, stream: str) -> int | None:
+        try:
+            usage = await self.redis.memory_usage(stream)
+        except redis.ResponseError:
+            # MEMORY USAGE can be disabled (e.g. renamed on managed Redis)
+            return None
+        return int(usage) if usage is not None else None
@@ -0,0 +1,163 @@
+"""In-process retry scheduling for failed stream entries.
+
+A failed entry stays in the consumer group's PEL. Without a retry it would
+only be picked up again by pending recovery at the next restart, so a short
+MongoDB blip could leave events unprocessed for hours. ``RetryScheduler``
+keeps a timer heap of failed entries and redelivers each one after an
+exponential backoff with jitter, in its own task so the read loop is never
+blocked. Entries are not persisted: if the process restarts they are still in
+the PEL and pending recovery handles them. On shutdown the scheduler stops
+starting redeliveries and the one in progress is allowed to finish.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import structlog
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+retries_scheduled = metrics.counter("retries_scheduled_total", "Failed entries scheduled for retry")
+retry_queue_depth = metrics.gauge("retry_queue_depth", "Entries waiting for a retry")
+
+
+@dataclass(order=True)
+class RetryEntry:
+    """A failed stream entry waiting to be redelivered."""
+
+    due_at: float
+    sequence: int
+    stream: str = field(compare=False)
+    message_id: bytes = field(compare=False)
+    # Deliveries so far; the redelivery will be attempt + 1
+    attempt: int = field(compare=False)
+
+
+Redeliver = Callable[[RetryEntry], Awaitable[None]]
+
+
+def backoff_delay(attempt: int, base: float, maximum: float, jitter: float) -> float:
+    """
+    Exponential backoff for the given attempt (1-based), with jitter.
+
+    ``jitter`` is the fraction of the delay that is randomised, e.g. 0.5
+    gives a delay between 50% and 100% of the exponential value.
+    """
+    delay = min(maximum, base * (2 ** max(0, attempt - 1)))
+    return delay * (1 - jitter * random.random())
+
+
+class RetryScheduler:
+    """Timer heap that redelivers failed entries after a backoff."""
+
+    def __init__(
+        self,
+        redeliver: Redeliver,
+        base_delay_seconds: float,
+        max_delay_seconds: float,
+        jitter: float,
+    ) -> None:
+        self._redeliver = redeliver
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.jitter = jitter
+        self._heap: list[RetryEntry] = []
+        self._scheduled: set[tuple[str, bytes]] = set()
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        # Set while no redelivery is in progress
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(
+        self, stream: str, message_id: bytes, attempt: int, delay: float | None = None
+    ) -> float | None:
+        """
+        Schedule a retry after the given failed attempt.
+
+        ``delay`` overrides the backoff (e.g. to park an entry until a circuit
+        breaker probes again). Returns the delay in seconds, or None if the
+        entry is already scheduled.
+        """
+        key = (stream, message_id)
+        if key in self._scheduled:
+            return None
+
+        if delay is None:
+            delay = backoff_delay(
+                attempt, self.base_delay_seconds, self.max_delay_seconds, self.jitter
+            )
+        entry = RetryEntry(
+            due_at=time.monotonic() + delay,
+            sequence=next(self._sequence),
+            stream=stream,
+            message_id=message_id,
+            attempt=attempt,
+        )
+        heapq.heappush(self._heap, entry)
+        self._scheduled.add(key)
+        retries_scheduled.inc(stream=stream)
+        retry_queue_depth.set(len(self._heap))
+        self._wakeup.set()
+        return delay
+
+    def take_due(self, limit: int | None = None) -> list[RetryEntry]:
+        """Remove and return every entry (up to ``limit``) whose backoff has elapsed."""
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0].due_at <= now and len(due) != limit:
+            entry = heapq.heappop(self._heap)
+            self._scheduled.discard((entry.stream, entry.message_id))
+            due.append(entry)
+        retry_queue_depth.set(len(self._heap))
+        return due
+
+    def stop(self) -> None:
+        """Start no more redeliveries; entries still waiting are left in the PEL."""
+        self._stopping = True
+        self._wakeup.set()
+
+    async def wait_idle(self) -> None:
+        """Wait for the redelivery in progress, if any, to finish."""
+        await self._idle.wait()
+
+    async def run(self) -> None:
+        """Redeliver entries as they become due. Runs until cancelled."""
+        while True:
+            # One at a time, so stop() takes effect between redeliveries
+            while not self._stopping and (due := self.take_due(limit=1)):
+                [entry] = due
+                self._idle.clear()
+                try:
+                    await self._redeliver(entry)
+                except Exception as e:
+                    # Couldn't even claim the entry (e.g. Redis unavailable); try again later
+                    logger.error(
+                        "Retry redelivery failed",
+                        stream=entry.stream,
+                        message_id=entry.message_id,
+                        error=str(e),
+                    )
+                    self.schedule(entry.stream, entry.message_id, entry.attempt)
+                finally:
+                    self._idle.set()
+
+            self._wakeup.clear()
+            timeout = None
+            if self._heap and not self._stopping:
+                timeout = self._heap[0].due_at - time.monotonic()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,118 @@
+"""Weighted scheduling of prefetched batches between streams.
+
+Each stream's read loop puts batches on its own bounded queue in
+``BatchScheduler``. The worker takes them with smooth weighted round robin,
+so a stream with weight 4 gets four batches for every one from a stream with
+weight 1 while both have work. An idle stream gives up its share.
+
+A stream can also have a latency target. When the oldest batch queued for it
+has waited longer than the target, that batch is served next, whatever the
+weights say. This keeps CRM-originated events on the internal stream, which
+an operator is waiting on, moving while the external stream is saturated.
+
+Batches from one stream are always served in the order they were read.
+"""
+
+import asyncio
+import collections
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from .metrics import metrics
+
+schedule_wait = metrics.histogram(
+    "batch_schedule_wait_seconds", "Time a prefetched batch waited for the worker"
+)
+queue_depth = metrics.gauge("prefetch_queue_depth", "Batches waiting to be processed")
+latency_target_misses = metrics.counter(
+    "batch_latency_target_misses_total", "Batches served after their stream's latency target"
+)
+
+
+@dataclass
+class _StreamQueue:
+    weight: int
+    latency_target: float | None
+    maxsize: int
+    batches: collections.deque[tuple[float, Any]] = field(default_factory=collections.deque)
+    # Smooth weighted round robin state
+    current: int = 0
+
+
+class BatchScheduler:
+    """Per-stream batch queues served by weight, with optional latency targets."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = max(1, maxsize)
+        self._streams: dict[str, _StreamQueue] = {}
+        self._changed = asyncio.Condition()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def add_stream(self, stream: str, weight: int = 1, latency_target: float | None = None) -> None:
+        """Register a stream; ``latency_target`` is in seconds (None = weights only)."""
+        self._streams[stream] = _StreamQueue(max(1, weight), latency_target or None, self.maxsize)
+
+    def qsize(self, stream: str | None = None) -> int:
+        if stream is not None:
+            return len(self._streams[stream].batches)
+        return sum(len(queue.batches) for queue in self._streams.values())
+
+    async def put(self, stream: str, batch: Any) -> None:
+        """Queue a batch, waiting while the stream's queue is full."""
+        queue = self._streams[stream]
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(queue.batches) < queue.maxsize)
+            queue.batches.append((time.monotonic(), batch))
+            self._unfinished += 1
+            self._finished.clear()
+            queue_depth.set(len(queue.batches), stream=stream)
+            self._changed.notify_all()
+
+    async def get(self) -> tuple[str, Any]:
+        """Wait for a batch and return ``(stream, batch)`` for the stream due next."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.qsize() > 0)
+            stream = self._next_stream()
+            enqueued_at, batch = self._streams[stream].batches.popleft()
+            waited = time.monotonic() - enqueued_at
+            schedule_wait.observe(waited, stream=stream)
+            queue_depth.set(len(self._streams[stream].batches), stream=stream)
+            self._changed.notify_all()
+        return stream, batch
+
+    def task_done(self) -> None:
+        """Mark a batch returned by ``get`` as finished."""
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._unfinished = 0
+            self._finished.set()
+
+    async def join(self) -> None:
+        """Wait until every queued batch has been taken and finished."""
+        await self._finished.wait()
+
+    def _next_stream(self) -> str:
+        now = time.monotonic()
+        ready = {name: queue for name, queue in self._streams.items() if queue.batches}
+
+        # Overdue batches first, the longest-waiting one before others
+        overdue = [
+            (queue.batches[0][0], name)
+            for name, queue in ready.items()
+            if queue.latency_target is not None
+            and now - queue.batches[0][0] >= queue.latency_target
+        ]
+        if overdue:
+            _, name = min(overdue)
+            latency_target_misses.inc(stream=name)
+            return name
+
+        total = sum(queue.weight for queue in ready.values())
+        for queue in ready.values():
+            queue.current += queue.weight
+        name = max(ready, key=lambda n: ready[n].current)
+        ready[name].current -= total
+        return name
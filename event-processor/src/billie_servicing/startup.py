@@ -0,0 +1,65 @@
+"""Startup timing and readiness.
+
+``StartupProfile`` times each startup phase (imports, connecting, index
+verification, consumer groups, pending recovery) plus the time to the first
+acknowledged message, which is what matters when pods are being added
+during autoscaling. Phases are recorded as ``startup_seconds{phase}`` and
+logged once the processor is live. ``ready`` is set when the processor
+starts reading new entries; the admin endpoint serves it as ``GET /ready``.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import structlog
+
+from . import IMPORTED_AT
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+startup_seconds = metrics.gauge("startup_seconds", "Duration of each startup phase")
+
+
+class StartupProfile:
+    """Durations of the startup phases, measured from package import."""
+
+    def __init__(self, started_at: float = IMPORTED_AT) -> None:
+        self.started_at = started_at
+        self.phases: dict[str, float] = {}
+        self.ready = asyncio.Event()
+        self.first_ack_seconds: float | None = None
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = seconds
+        startup_seconds.set(round(seconds, 4), phase=phase)
+
+    def mark(self, phase: str) -> float:
+        """Record the time elapsed since package import under a phase name."""
+        elapsed = time.monotonic() - self.started_at
+        self.record(phase, elapsed)
+        return elapsed
+
+    @asynccontextmanager
+    async def phase(self, name: str) -> AsyncIterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def mark_ready(self) -> None:
+        """Live reads are starting; report the profile so far."""
+        self.mark("ready")
+        self.ready.set()
+        logger.info("Startup profile", **{k: round(v, 3) for k, v in self.phases.items()})
+
+    def acked(self) -> None:
+        """Called on every ack; records the first one."""
+        if self.first_ack_seconds is not None:
+            return
+        self.first_ack_seconds = self.mark("first_ack")
+        print(f"⏱️  First message acknowledged {self.first_ack_seconds:.2f}s after start")
+        logger.info("Time to first ack", seconds=round(self.first_ack_seconds, 3))
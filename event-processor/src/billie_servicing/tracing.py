@@ -0,0 +1,176 @@
+"""Optional OpenTelemetry tracing for message processing.
+
+Each stream entry gets a ``process_message`` span with child spans for
+decode, dedup check, SDK parse, handler and ack. Every MongoDB command a
+handler issues gets its own span under the handler span. Motor runs pymongo
+on an executor with a copy of the caller's context, so a command listener
+can see the handler span as current.
+
+Tracing is off unless ``TRACING_EXPORTER`` is set, and it needs the
+``opentelemetry-sdk`` package (``pip install billie-servicing-processor[tracing]``).
+Without either, every helper here is a no-op. Exporters:
+
+- ``console`` - spans printed to stdout as they finish
+- ``file`` - one JSON span per line appended to ``TRACING_FILE_PATH``, for
+  finding slow stages in a local reproduction
+- ``memory`` - kept in memory (tests; see ``configure_tracing``'s return value)
+- ``otlp`` - OTLP/gRPC to a collector (needs ``opentelemetry-exporter-otlp``)
+"""
+
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import structlog
+from pymongo import monitoring
+
+logger = structlog.get_logger()
+
+# Set by configure_tracing; None means tracing is off
+_tracer: Any = None
+
+
+def configure_tracing(
+    exporter: str, file_path: str = "traces.jsonl", service_name: str = "billie-servicing"
+) -> Any:
+    """
+    Enable tracing with the given exporter.
+
+    Returns the span exporter, or None if tracing is off or OpenTelemetry
+    isn't installed.
+    """
+    global _tracer
+    if not exporter:
+        return None
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import (
+            BatchSpanProcessor,
+            ConsoleSpanExporter,
+            SimpleSpanProcessor,
+        )
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    except ImportError:
+        logger.warning("Tracing requested but opentelemetry-sdk is not installed", exporter=exporter)
+        return None
+
+    if exporter == "console":
+        span_exporter: Any = ConsoleSpanExporter()
+        processor: Any = SimpleSpanProcessor(span_exporter)
+    elif exporter == "file":
+        span_exporter = ConsoleSpanExporter(
+            out=open(file_path, "a"),  # noqa: SIM115 - kept open for the process lifetime
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+        processor = BatchSpanProcessor(span_exporter)
+    elif exporter == "memory":
+        span_exporter = InMemorySpanExporter()
+        processor = SimpleSpanProcessor(span_exporter)
+    elif exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+        span_exporter = OTLPSpanExporter()
+        processor = BatchSpanProcessor(span_exporter)
+    else:
+        raise ValueError(
+            f"Unknown tracing exporter: {exporter!r} (expected console, file, memory or otlp)"
+        )
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(processor)
+    _tracer = provider.get_tracer("billie_servicing")
+    logger.info("Tracing enabled", exporter=exporter)
+    return span_exporter
+
+
+def disable_tracing() -> None:
+    global _tracer
+    _tracer = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def _attributes(attributes: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in attributes.items() if v is not None and v != ""}
+
+
+def start_span(name: str, **attributes: Any) -> Any:
+    """Start a span that is not made current (end it with ``end_span``)."""
+    if _tracer is None:
+        return None
+    return _tracer.start_span(name, attributes=_attributes(attributes))
+
+
+def end_span(span: Any, error: BaseException | None = None) -> None:
+    if span is None:
+        return
+    if error is not None:
+        from opentelemetry.trace import Status, StatusCode
+
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+    span.end()
+
+
+def set_attributes(span: Any, **attributes: Any) -> None:
+    if span is not None:
+        span.set_attributes(_attributes(attributes))
+
+
+@contextmanager
+def span(name: str, parent: Any = None, **attributes: Any) -> Iterator[Any]:
+    """
+    Run a block in a span made current for its duration.
+
+    The span is a child of ``parent`` if given, otherwise of the current span.
+    """
+    if _tracer is None:
+        yield None
+        return
+
+    context = None
+    if parent is not None:
+        from opentelemetry import trace
+
+        context = trace.set_span_in_context(parent)
+    with _tracer.start_as_current_span(
+        name, context=context, attributes=_attributes(attributes)
+    ) as current:
+        yield current
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Opens a span per MongoDB command under the span current when it was issued."""
+
+    def __init__(self) -> None:
+        self._spans: dict[tuple[Any, int], Any] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if _tracer is None:
+            return
+        collection = event.command.get(event.command_name)
+        self._spans[(event.connection_id, event.request_id)] = _tracer.start_span(
+            f"mongo.{event.command_name}",
+            attributes=_attributes(
+                {
+                    "db.system": "mongodb",
+                    "db.name": event.database_name,
+                    "db.operation": event.command_name,
+                    "db.mongodb.collection": collection if isinstance(collection, str) else None,
+                }
+            ),
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        end_span(self._spans.pop((event.connection_id, event.request_id), None))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            from opentelemetry.trace import Status, StatusCode
+
+            span.set_status(Status(StatusCode.ERROR, str(event.failure.get("errmsg", ""))))
+            span.end()
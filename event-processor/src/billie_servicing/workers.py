@@ -0,0 +1,146 @@
+"""Worker pools per event family.
+
+Conversation traffic (utterances, assessments, noticeboard) is most of the
+volume, but account and customer projections are what servicing staff need
+to be current. Messages are therefore routed by family (``event_family``)
+to a ``WorkerPool`` per family, each with its own concurrency and queue
+depth, so a burst of one family is processed alongside the others instead of
+ahead of them.
+
+A pool runs ``concurrency`` lanes. Messages for one aggregate always go to
+the same lane (CRC32 of the aggregate key), which keeps their order; messages
+without an aggregate go to their stream's lane (CRC32 of the stream name), so
+they stay in stream order. The dispatcher waits when a
+lane's queue is full, so the queue depth bounds how far one family can get
+ahead of the others.
+"""
+
+import asyncio
+import itertools
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import structlog
+
+from .metrics import metrics
+
+logger = structlog.get_logger()
+
+FAMILIES = ("account", "customer", "chat", "writeoff")
+
+pool_queue_depth = metrics.gauge("worker_pool_queue_depth", "Messages queued per worker pool")
+pool_busy_lanes = metrics.gauge("worker_pool_busy_lanes", "Lanes processing messages per pool")
+pool_wait_seconds = metrics.histogram(
+    "worker_pool_wait_seconds", "Time a message waited in its worker pool queue"
+)
+pool_messages = metrics.counter("worker_pool_messages_total", "Messages processed per worker pool")
+pool_full_waits = metrics.counter(
+    "worker_pool_full_waits_total", "Times the dispatcher waited for a full pool queue"
+)
+
+Message = tuple[bytes, dict[bytes, bytes]]
+# Processes messages from one stream, in order
+ProcessFn = Callable[[str, list[Message]], Awaitable[None]]
+
+
+def event_family(event_type: str) -> str:
+    """Worker pool for an event type."""
+    if event_type.startswith("writeoff."):
+        return "writeoff"
+    if event_type.startswith(("account.", "payment.", "ledger.")):
+        return "account"
+    if event_type.startswith(("customer.", "application.")):
+        return "customer"
+    return "chat"
+
+
+@dataclass
+class _Job:
+    stream: str
+    message: Message
+    enqueued_at: float
+
+
+class WorkerPool:
+    """Lanes processing one event family; an aggregate always maps to the same lane."""
+
+    def __init__(
+        self,
+        name: str,
+        process: ProcessFn,
+        concurrency: int,
+        queue_depth: int,
+        batch_size: int = 10,
+    ) -> None:
+        self.name = name
+        self.process = process
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        lane_depth = max(1, queue_depth // self.concurrency)
+        self._lanes: list[asyncio.Queue[_Job]] = [
+            asyncio.Queue(maxsize=lane_depth) for _ in range(self.concurrency)
+        ]
+        self._tasks: list[asyncio.Task[None]] = []
+        self._busy = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(lane.qsize() for lane in self._lanes)
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run(lane)) for lane in self._lanes]
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def lane_for(self, aggregate: str | None, stream: str) -> int:
+        """Lane for an aggregate's messages, or for a stream's messages without one."""
+        key = aggregate if aggregate is not None else stream
+        return zlib.crc32(key.encode()) % self.concurrency
+
+    async def submit(self, stream: str, message: Message, aggregate: str | None) -> None:
+        """Queue a message on its aggregate's lane, waiting while that lane is full."""
+        lane = self._lanes[self.lane_for(aggregate, stream)]
+        if lane.full():
+            pool_full_waits.inc(pool=self.name)
+        await lane.put(_Job(stream, message, time.monotonic()))
+        pool_queue_depth.set(self.queued, pool=self.name)
+
+    async def join(self) -> None:
+        """Wait until every queued message has been processed."""
+        await asyncio.gather(*(lane.join() for lane in self._lanes))
+
+    async def _run(self, lane: asyncio.Queue[_Job]) -> None:
+        """Process a lane's messages, taking whatever is queued (up to a batch) at once."""
+        while True:
+            jobs = [await lane.get()]
+            while len(jobs) < self.batch_size and not lane.empty():
+                jobs.append(lane.get_nowait())
+
+            now = time.monotonic()
+            for job in jobs:
+                pool_wait_seconds.observe(now - job.enqueued_at, pool=self.name)
+            pool_queue_depth.set(self.queued, pool=self.name)
+
+            self._busy += 1
+            pool_busy_lanes.set(self._busy, pool=self.name)
+            try:
+                # Consecutive messages from one stream are processed as one batch
+                for stream, group in itertools.groupby(jobs, key=lambda job: job.stream):
+                    messages = [job.message for job in group]
+                    try:
+                        await self.process(stream, messages)
+                    except Exception as e:
+                        logger.error(
+                            "Worker pool batch failed", pool=self.name, error=str(e), exc_info=True
+                        )
+                    pool_messages.inc(len(messages), pool=self.name)
+            finally:
+                self._busy -= 1
+                pool_busy_lanes.set(self._busy, pool=self.name)
+                for _ in jobs:
+                    lane.task_done()
+
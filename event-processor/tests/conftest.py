@@ -22,6 +22,10 @@ class MockCollection:
             return_value=MagicMock(matched_count=0, modified_count=0, upserted_id="test-id")
         )
         self.insert_one = AsyncMock(return_value=MagicMock(inserted_id="test-id"))
+        self.update_many = AsyncMock(return_value=MagicMock(matched_count=0, modified_count=0))
+        self.find_one_and_update = AsyncMock(return_value=None)
+        self.bulk_write = AsyncMock(return_value=MagicMock(modified_count=0, upserted_count=0))
+        self.insert_many = AsyncMock(return_value=MagicMock(inserted_ids=[]))
 
 
 class MockDatabase:
@@ -0,0 +1,40 @@
+"""
+Unit Tests for the in-flight message limiter.
+"""
+
+import asyncio
+import pytest
+
+from billie_servicing.backpressure import InFlightLimiter
+
+
+class TestInFlightLimiter:
+    """Tests for reader backpressure."""
+
+    @pytest.mark.asyncio
+    async def test_reports_free_capacity(self):
+        limiter = InFlightLimiter(10)
+        limiter.acquire(4)
+
+        assert await limiter.wait_for_capacity() == 6
+
+    @pytest.mark.asyncio
+    async def test_waits_until_messages_are_released(self):
+        """The reader should block while the limit is reached."""
+        limiter = InFlightLimiter(2)
+        limiter.acquire(2)
+
+        waiter = asyncio.create_task(limiter.wait_for_capacity())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        await limiter.release(1)
+        assert await asyncio.wait_for(waiter, timeout=1) == 1
+
+    @pytest.mark.asyncio
+    async def test_release_never_goes_negative(self):
+        limiter = InFlightLimiter(5)
+        await limiter.release(3)
+
+        assert limiter.in_flight == 0
+        assert limiter.available == 5
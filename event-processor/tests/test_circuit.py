@@ -0,0 +1,149 @@
+"""
+Unit Tests for the handler circuit breakers.
+"""
+
+import time
+
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+
+from billie_servicing.circuit import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    collection_for_event,
+    is_dependency_failure,
+)
+
+
+def _breaker(**overrides):
+    options = dict(
+        failure_rate=0.5, window=10, min_calls=4, open_base_seconds=5.0, open_max_seconds=60.0
+    )
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+class TestCircuitBreaker:
+    """Tests for a single breaker's state machine."""
+
+    def test_opens_when_failure_rate_reached(self):
+        breaker = _breaker()
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+        breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert 4.9 < breaker.blocked_for() <= 5.0
+
+    def test_needs_minimum_calls(self):
+        breaker = _breaker()
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_single_probe_after_open_period(self):
+        breaker = _breaker(min_calls=1)
+        breaker.record_failure()
+        breaker.open_until = time.monotonic() - 1
+
+        assert breaker.blocked_for() is None
+        breaker.begin()
+
+        assert breaker.state == HALF_OPEN
+        assert breaker.blocked_for() == 5.0
+
+    def test_successful_probe_closes(self):
+        breaker = _breaker(min_calls=1)
+        breaker.record_failure()
+        breaker.open_until = time.monotonic() - 1
+        breaker.begin()
+
+        breaker.record_success()
+
+        assert breaker.state == CLOSED
+        assert breaker.trips == 0
+        assert breaker.blocked_for() is None
+
+    def test_failed_probe_doubles_open_period(self):
+        breaker = _breaker(min_calls=1)
+        breaker.record_failure()
+        breaker.open_until = time.monotonic() - 1
+        breaker.begin()
+
+        breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert breaker.trips == 2
+        assert 9.9 < breaker.blocked_for() <= 10.0
+
+    def test_released_probe_can_be_retaken(self):
+        breaker = _breaker(min_calls=1)
+        breaker.record_failure()
+        breaker.open_until = time.monotonic() - 1
+        breaker.begin()
+
+        breaker.release()
+
+        assert breaker.state == HALF_OPEN
+        assert breaker.blocked_for() is None
+
+
+class TestCircuitBreakers:
+    """Tests for the global/collection/event-type registry."""
+
+    def _breakers(self):
+        return CircuitBreakers(
+            failure_rate=0.5, window=10, min_calls=2, open_base_seconds=5.0, open_max_seconds=60.0
+        )
+
+    def test_dependency_failures_open_all_levels(self):
+        circuits = self._breakers()
+        for _ in range(2):
+            circuits.record("account.updated.v1", AutoReconnect("connection refused"))
+
+        assert circuits.check("account.updated.v1") is not None
+        assert circuits.global_pause() is not None
+        assert circuits.open_circuits() == [
+            "collection:loan-accounts",
+            "event:account.updated.v1",
+            "global",
+        ]
+
+    def test_bad_events_do_not_open_circuits(self):
+        circuits = self._breakers()
+        for _ in range(5):
+            circuits.record("account.updated.v1", KeyError("loanAccountId"))
+
+        assert circuits.check("account.updated.v1") is None
+        assert circuits.open_circuits() == []
+
+    def test_failing_type_does_not_block_others(self):
+        circuits = self._breakers()
+        for _ in range(5):
+            circuits.record("user_input")
+        for _ in range(3):
+            circuits.record("account.updated.v1", AutoReconnect("timed out"))
+
+        assert circuits.check("account.updated.v1") is not None
+        assert circuits.check("user_input") is None
+        assert circuits.global_pause() is None
+
+
+class TestClassification:
+    def test_dependency_failures(self):
+        assert is_dependency_failure(AutoReconnect("down"))
+        assert is_dependency_failure(TimeoutError())
+        assert not is_dependency_failure(DuplicateKeyError("dup"))
+        assert not is_dependency_failure(ValueError("bad payload"))
+
+    def test_collection_for_event(self):
+        assert collection_for_event("account.schedule.updated.v1") == "loan-accounts"
+        assert collection_for_event("customer.verified.v1") == "customers"
+        assert collection_for_event("writeoff.approved.v1") == "write-off-requests"
+        assert collection_for_event("ledger.transaction.posted.v1") == "ledger-transactions"
+        assert collection_for_event("final_decision") == "conversations"
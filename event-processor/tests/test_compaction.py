@@ -0,0 +1,255 @@
+"""
+Unit Tests for last-writer-wins compaction during catch-up.
+"""
+
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from billie_servicing import processor as processor_module
+from billie_servicing.circuit import HALF_OPEN, CircuitBreakers
+from billie_servicing.compaction import CatchUpMode, compact, merged_handler
+from billie_servicing.handlers.account import (
+    handle_account_status_changed,
+    handle_account_updated,
+    handle_schedule_updated,
+)
+from billie_servicing.handlers.customer import handle_customer_changed
+from billie_servicing.processor import EventProcessor
+
+
+def _account_updated(account_id="ACC-1", balance=None, status=None):
+    payload = MagicMock(
+        account_id=account_id,
+        current_balance=balance,
+        status=status,
+        last_payment_date=None,
+        last_payment_amount=None,
+    )
+    return SimpleNamespace(payload=payload)
+
+
+def _status_changed(account_id="ACC-1", new_status="SUSPENDED"):
+    return SimpleNamespace(payload=MagicMock(account_id=account_id, new_status=new_status))
+
+
+def _customer_changed(customer_id="CUS-1", **fields):
+    payload = MagicMock(customer_id=customer_id)
+    for name in (
+        "first_name",
+        "last_name",
+        "email_address",
+        "mobile_phone_number",
+        "date_of_birth",
+        "ekyc_status",
+        "residential_address",
+    ):
+        setattr(payload, name, fields.get(name))
+    return SimpleNamespace(payload=payload)
+
+
+def _item(name, handler, parsed_event):
+    return SimpleNamespace(name=name, handler=handler, parsed_event=parsed_event)
+
+
+def _names(groups):
+    return [[item.name for item in group] for group in groups]
+
+
+class TestCompact:
+    def test_run_for_one_aggregate_merges(self):
+        groups = compact(
+            [
+                _item("u1", handle_account_updated, _account_updated()),
+                _item("s1", handle_account_status_changed, _status_changed()),
+                _item("u2", handle_account_updated, _account_updated()),
+            ]
+        )
+
+        assert _names(groups) == [["u1", "s1", "u2"]]
+
+    def test_aggregates_merge_separately_in_order_of_last_event(self):
+        groups = compact(
+            [
+                _item("a1", handle_account_updated, _account_updated("ACC-1")),
+                _item("b1", handle_account_updated, _account_updated("ACC-2")),
+                _item("a2", handle_account_updated, _account_updated("ACC-1")),
+            ]
+        )
+
+        assert _names(groups) == [["b1"], ["a1", "a2"]]
+
+    def test_other_events_end_open_runs(self):
+        groups = compact(
+            [
+                _item("u1", handle_account_updated, _account_updated()),
+                _item("sched", handle_schedule_updated, _account_updated()),
+                _item("u2", handle_account_updated, _account_updated()),
+            ]
+        )
+
+        assert _names(groups) == [["u1"], ["sched"], ["u2"]]
+
+    def test_families_do_not_merge(self):
+        groups = compact(
+            [
+                _item("acc", handle_account_updated, _account_updated("X")),
+                _item("cus", handle_customer_changed, _customer_changed("X")),
+            ]
+        )
+
+        assert _names(groups) == [["acc"], ["cus"]]
+
+
+class TestMergedHandler:
+    @pytest.mark.asyncio
+    async def test_account_fields_merged_last_writer_wins(self, mock_db):
+        group = [
+            _item("u1", handle_account_updated, _account_updated(balance=Decimal("500"))),
+            _item("s1", handle_account_status_changed, _status_changed(new_status="SUSPENDED")),
+            _item("u2", handle_account_updated, _account_updated(balance=Decimal("435"))),
+        ]
+
+        await merged_handler(group)(mock_db, group[-1].parsed_event)
+
+        accounts = mock_db["loan-accounts"]
+        accounts.find_one_and_update.assert_awaited_once()
+        query, update = accounts.find_one_and_update.call_args[0]
+        assert query == {"loanAccountId": "ACC-1"}
+        assert update["$set"]["balances.totalOutstanding"] == 435.0
+        assert update["$set"]["accountStatus"] == "in_arrears"
+
+    @pytest.mark.asyncio
+    async def test_customer_changes_merged_into_one_upsert(self, mock_db):
+        group = [
+            _item("c1", handle_customer_changed, _customer_changed(first_name="Jane")),
+            _item("c2", handle_customer_changed, _customer_changed(email_address="j@x.io")),
+            _item("c3", handle_customer_changed, _customer_changed(last_name="Citizen")),
+        ]
+
+        await merged_handler(group)(mock_db, group[-1].parsed_event)
+
+        mock_db.customers.update_one.assert_awaited_once()
+        update = mock_db.customers.update_one.call_args[0][1]["$set"]
+        assert update["fullName"] == "Jane Citizen"
+        assert update["emailAddress"] == "j@x.io"
+
+
+class TestCatchUpMode:
+    def test_enters_above_threshold_and_leaves_below_half(self):
+        mode = CatchUpMode(lag_threshold_seconds=300)
+
+        mode.update("inbox", 301)
+        assert mode.active("inbox")
+        mode.update("inbox", 200)
+        assert mode.active("inbox")
+        mode.update("inbox", 100)
+        assert not mode.active("inbox")
+
+    def test_streams_tracked_independently(self):
+        mode = CatchUpMode(lag_threshold_seconds=60)
+
+        mode.update("inbox", 120)
+
+        assert not mode.active("internal")
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def xack(self, stream, group, *ids):
+        self.redis.acked.extend(ids)
+
+    def set(self, *args, **kwargs):
+        pass
+
+    async def execute(self):
+        pass
+
+
+class _Redis:
+    def __init__(self):
+        self.acked = []
+
+    def pipeline(self, transaction=False):
+        return _Pipeline(self)
+
+
+class _Dedup:
+    def __init__(self):
+        self.marked = []
+
+    async def is_processed(self, stream, message_id):
+        return False
+
+    def mark_processed(self, pipe, stream, message_id):
+        self.marked.append(message_id)
+
+
+class TestProcessorCompaction:
+    @pytest.mark.asyncio
+    async def test_catch_up_batch_is_one_write_and_acks_every_entry(self, mock_db, monkeypatch):
+        monkeypatch.setattr(processor_module.settings, "catch_up_lag_seconds", 60.0)
+        processor = EventProcessor()
+        processor.redis = _Redis()
+        processor.dedup = _Dedup()
+        processor.lag = MagicMock(observe_ack=MagicMock(return_value=0.0))
+        processor.circuits = None
+        processor.db = mock_db
+        processor.register_handler("account.updated.v1", handle_account_updated)
+        processor.catch_up.update("inbox", 120.0)
+
+        balances = iter([Decimal("500"), Decimal("470"), Decimal("435")])
+
+        def parse(event_type, fields):
+            return _account_updated(balance=next(balances))
+
+        monkeypatch.setattr(processor, "_parse_event", parse)
+        messages = [(f"{n}-0".encode(), {b"typ": b"account.updated.v1"}) for n in (1, 2, 3)]
+
+        await processor._process_batch("inbox", messages)
+
+        accounts = mock_db["loan-accounts"]
+        accounts.find_one_and_update.assert_awaited_once()
+        update = accounts.find_one_and_update.call_args[0][1]
+        assert update["$set"]["balances.totalOutstanding"] == 435.0
+        assert processor.redis.acked == [b"1-0", b"2-0", b"3-0"]
+        assert processor.dedup.marked == ["1-0", "2-0", "3-0"]
+
+    @pytest.mark.asyncio
+    async def test_compacted_entry_frees_its_half_open_probe(self, mock_db, monkeypatch):
+        monkeypatch.setattr(processor_module.settings, "catch_up_lag_seconds", 60.0)
+        processor = EventProcessor()
+        processor.redis = _Redis()
+        processor.dedup = _Dedup()
+        processor.lag = MagicMock(observe_ack=MagicMock(return_value=0.0))
+        processor.circuits = CircuitBreakers(
+            failure_rate=0.5, window=10, min_calls=4, open_base_seconds=5.0, open_max_seconds=60.0
+        )
+        probing = processor.circuits.breakers_for("account.updated.v1")[-1]
+        probing.state = HALF_OPEN
+        processor.db = mock_db
+        processor.register_handler("account.updated.v1", handle_account_updated)
+        processor.register_handler("account.status_changed.v1", handle_account_status_changed)
+        processor.catch_up.update("inbox", 120.0)
+
+        def parse(event_type, fields):
+            if event_type == "account.updated.v1":
+                return _account_updated(balance=Decimal("435"))
+            return _status_changed()
+
+        monkeypatch.setattr(processor, "_parse_event", parse)
+        messages = [
+            (b"1-0", {b"typ": b"account.updated.v1"}),
+            (b"2-0", {b"typ": b"account.status_changed.v1"}),
+        ]
+
+        await processor._process_batch("inbox", messages)
+
+        # The absorbed account.updated entry was the probe; its success closes the circuit
+        assert processor.redis.acked == [b"1-0", b"2-0"]
+        assert probing.blocked_for() is None
+        assert processor.circuits.check("account.updated.v1") is None
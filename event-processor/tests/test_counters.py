@@ -0,0 +1,270 @@
+"""
+Unit Tests for dashboard counters and their reconciliation.
+"""
+
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+
+from billie_servicing.handlers.account import handle_account_status_changed
+from billie_servicing.handlers.conversation import handle_final_decision
+from billie_servicing.handlers.counters import (
+    ACCOUNTS_BY_STATUS,
+    CONVERSATIONS_BY_STATUS,
+    PENDING_WRITEOFFS_BY_PRIORITY,
+    transition,
+)
+from billie_servicing.handlers.writeoff import handle_writeoff_approved, handle_writeoff_requested
+from billie_servicing.reconcile import reconcile_counters, reconcile_summaries
+
+
+def _moves(mock_db):
+    """(counter id, delta) for every counter update written."""
+    moves = []
+    for call in mock_db["dashboard-counters"].bulk_write.call_args_list:
+        for op in call[0][0]:
+            moves.append((op._filter["_id"], op._doc["$inc"]["value"]))
+    return moves
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+
+class TestTransition:
+    @pytest.mark.asyncio
+    async def test_moves_one_item_between_keys(self, mock_db):
+        await transition(mock_db, ACCOUNTS_BY_STATUS, "active", "in_arrears")
+
+        assert _moves(mock_db) == [
+            ("accounts_by_status:active", -1),
+            ("accounts_by_status:in_arrears", 1),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_same_key_writes_nothing(self, mock_db):
+        await transition(mock_db, ACCOUNTS_BY_STATUS, "active", "active")
+
+        mock_db["dashboard-counters"].bulk_write.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_new_item_only_increments(self, mock_db):
+        await transition(mock_db, CONVERSATIONS_BY_STATUS, None, "active")
+
+        assert _moves(mock_db) == [("conversations_by_status:active", 1)]
+
+
+class TestHandlerTransitions:
+    @pytest.mark.asyncio
+    async def test_writeoff_request_counts_as_pending(self, mock_db):
+        requests = mock_db["write-off-requests"]
+        requests.find_one_and_update = AsyncMock(
+            return_value={"status": "pending", "priority": "high", "pendingCounted": False}
+        )
+        event = {"conv": "wo-1", "payload": json.dumps({"priority": "high"})}
+
+        await handle_writeoff_requested(mock_db, event)
+
+        assert requests.insert_one.call_args[0][0]["pendingCounted"] is False
+        assert requests.find_one_and_update.call_args[0][0] == {
+            "requestId": "wo-1",
+            "status": "pending",
+            "pendingCounted": False,
+        }
+        assert _moves(mock_db) == [(f"{PENDING_WRITEOFFS_BY_PRIORITY}:high", 1)]
+
+    @pytest.mark.asyncio
+    async def test_redelivered_request_counts_what_the_first_attempt_missed(self, mock_db):
+        requests = mock_db["write-off-requests"]
+        requests.insert_one = AsyncMock(side_effect=DuplicateKeyError("E11000"))
+        # Stored priority wins over the redelivered payload's
+        requests.find_one_and_update = AsyncMock(
+            return_value={"status": "pending", "priority": "high", "pendingCounted": False}
+        )
+
+        await handle_writeoff_requested(mock_db, {"conv": "wo-1", "payload": {"priority": "low"}})
+
+        assert _moves(mock_db) == [(f"{PENDING_WRITEOFFS_BY_PRIORITY}:high", 1)]
+
+    @pytest.mark.asyncio
+    async def test_redelivered_counted_request_changes_nothing(self, mock_db):
+        mock_db["write-off-requests"].insert_one = AsyncMock(
+            side_effect=DuplicateKeyError("E11000")
+        )
+
+        await handle_writeoff_requested(mock_db, {"conv": "wo-1", "payload": {}})
+
+        assert _moves(mock_db) == []
+
+    @pytest.mark.asyncio
+    async def test_failed_count_clears_the_flag_for_the_retry(self, mock_db):
+        requests = mock_db["write-off-requests"]
+        requests.find_one_and_update = AsyncMock(
+            return_value={"status": "pending", "priority": "high", "pendingCounted": False}
+        )
+        mock_db["dashboard-counters"].bulk_write = AsyncMock(side_effect=AutoReconnect("down"))
+
+        with pytest.raises(AutoReconnect):
+            await handle_writeoff_requested(mock_db, {"conv": "wo-1", "payload": {}})
+
+        assert requests.update_one.call_args[0] == (
+            {"requestId": "wo-1"},
+            {"$set": {"pendingCounted": False}},
+        )
+
+    @pytest.mark.asyncio
+    async def test_approving_an_uncounted_request_leaves_the_counter(self, mock_db):
+        mock_db["write-off-requests"].find_one_and_update = AsyncMock(
+            return_value={"status": "pending", "priority": "high", "pendingCounted": False}
+        )
+
+        await handle_writeoff_approved(mock_db, {"conv": "wo-1", "payload": {}})
+
+        assert _moves(mock_db) == []
+
+    @pytest.mark.asyncio
+    async def test_approval_leaves_pending(self, mock_db):
+        mock_db["write-off-requests"].find_one_and_update = AsyncMock(
+            return_value={"status": "pending", "priority": "high"}
+        )
+
+        await handle_writeoff_approved(mock_db, {"conv": "wo-1", "payload": {}})
+
+        assert _moves(mock_db) == [(f"{PENDING_WRITEOFFS_BY_PRIORITY}:high", -1)]
+
+    @pytest.mark.asyncio
+    async def test_redelivered_approval_changes_nothing(self, mock_db):
+        mock_db["write-off-requests"].find_one_and_update = AsyncMock(
+            return_value={"status": "approved", "priority": "high"}
+        )
+
+        await handle_writeoff_approved(mock_db, {"conv": "wo-1", "payload": {}})
+
+        assert _moves(mock_db) == []
+
+    @pytest.mark.asyncio
+    async def test_account_status_change_moves_count(self, mock_db):
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-1", "accountStatus": "active"}
+        )
+        event = MagicMock()
+        event.payload = MagicMock(account_id="ACC-1", new_status="CLOSED")
+
+        await handle_account_status_changed(mock_db, event)
+
+        assert _moves(mock_db) == [
+            ("accounts_by_status:active", -1),
+            ("accounts_by_status:paid_off", 1),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_final_decision_moves_conversation_status(self, mock_db):
+        mock_db.conversations.find_one_and_update = AsyncMock(return_value={"status": "active"})
+
+        await handle_final_decision(mock_db, {"cid": "CONV-1", "decision": "DECLINED"})
+
+        assert _moves(mock_db) == [
+            ("conversations_by_status:active", -1),
+            ("conversations_by_status:declined", 1),
+        ]
+
+
+class TestReconcile:
+    @pytest.mark.asyncio
+    async def test_counters_corrected_by_difference(self, mock_db):
+        actual = {
+            "write-off-requests": [{"_id": "high", "value": 2}],
+            "loan-accounts": [{"_id": "active", "value": 5}],
+            "conversations": [],
+        }
+        for collection, rows in actual.items():
+            mock_db[collection].aggregate = MagicMock(return_value=_Cursor(rows))
+        stored = {
+            ACCOUNTS_BY_STATUS: [{"key": "active", "value": 5}, {"key": "in_arrears", "value": 1}],
+            PENDING_WRITEOFFS_BY_PRIORITY: [{"key": "high", "value": 3}],
+        }
+        mock_db["dashboard-counters"].find = MagicMock(
+            side_effect=lambda query: _Cursor(stored.get(query["counter"], []))
+        )
+
+        result = await reconcile_counters(mock_db)
+
+        assert {(d.target, d.key, d.changes["value"]) for d in result.drift} == {
+            (PENDING_WRITEOFFS_BY_PRIORITY, "high", -1),
+            (ACCOUNTS_BY_STATUS, "in_arrears", -1),
+        }
+        assert sorted(_moves(mock_db)) == [
+            ("accounts_by_status:in_arrears", -1),
+            (f"{PENDING_WRITEOFFS_BY_PRIORITY}:high", -1),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_dry_run_writes_nothing(self, mock_db):
+        for collection in ("write-off-requests", "loan-accounts", "conversations"):
+            mock_db[collection].aggregate = MagicMock(
+                return_value=_Cursor([{"_id": "x", "value": 1}])
+            )
+        mock_db["dashboard-counters"].find = MagicMock(return_value=_Cursor([]))
+
+        result = await reconcile_counters(mock_db, dry_run=True)
+
+        assert len(result.drift) == 3
+        mock_db["dashboard-counters"].bulk_write.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_summaries_backfilled_and_corrected(self, mock_db):
+        accounts = mock_db["loan-accounts"]
+        rows = [
+            ({"customer": "CUS-1", "status": "active"}, 2, 300.0),
+            ({"customer": "CUS-2", "status": "paid_off"}, 1, 0.0),
+        ]
+        accounts.aggregate = MagicMock(
+            return_value=_Cursor(
+                {"_id": key, "count": count, "outstanding": outstanding}
+                for key, count, outstanding in rows
+            )
+        )
+        accounts.find = MagicMock(
+            return_value=_Cursor(
+                [
+                    {
+                        "loanAccountId": "ACC-1",
+                        "customerIdString": "CUS-1",
+                        "lastPayment": {"date": "2024-02-05", "amount": 145.0},
+                    }
+                ]
+            )
+        )
+        summaries = mock_db["customer-summaries"]
+        summaries.find = MagicMock(
+            return_value=_Cursor(
+                [
+                    {
+                        "customerId": "CUS-1",
+                        "accountCount": 2,
+                        "totalOutstanding": 450.0,
+                        "accountsByStatus": {"active": 2},
+                    }
+                ]
+            )
+        )
+
+        result = await reconcile_summaries(mock_db)
+
+        assert {d.key: d.changes for d in result.drift} == {
+            "CUS-1": {"totalOutstanding": -150.0},
+            "CUS-2": {"accountCount": 1, "accountsByStatus.paid_off": 1},
+        }
+        corrections, payments = [call[0][0] for call in summaries.bulk_write.call_args_list]
+        assert len(corrections) == 2
+        assert payments[0]._doc["$set"]["lastPayment"]["loanAccountId"] == "ACC-1"
@@ -0,0 +1,176 @@
+"""
+Unit Tests for the dedup stores.
+"""
+
+import time
+import pytest
+
+from billie_servicing.dedup import (
+    KeyPerMessageDedupStore,
+    WatermarkDedupStore,
+    create_dedup_store,
+    parse_stream_id,
+)
+
+
+class FakePipeline:
+    """Queues calls against FakeRedis and runs them on execute()."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        results = [await getattr(self._redis, n)(*a, **k) for n, a, k in self._calls]
+        self._calls = []
+        return results
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio.Redis for the dedup stores."""
+
+    def __init__(self, pending=None, last_delivered="0-0"):
+        self.strings = {}
+        self.zsets = {}
+        self.pending = pending or []
+        self.last_delivered = last_delivered
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def exists(self, key):
+        return int(key in self.strings)
+
+    async def setex(self, key, ttl, value):
+        self.strings[key] = value
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def set(self, key, value):
+        self.strings[key] = value
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    async def zremrangebyscore(self, key, low, high):
+        bound = float(high.lstrip("("))
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score < bound]:
+            del zset[member]
+
+    async def xpending(self, stream, group):
+        if not self.pending:
+            return {"pending": 0, "min": None, "max": None, "consumers": []}
+        return {"pending": len(self.pending), "min": min(self.pending, key=parse_stream_id).encode()}
+
+    async def xinfo_groups(self, stream):
+        return [{"name": b"group", "last-delivered-id": self.last_delivered.encode()}]
+
+
+async def _mark(store, redis, stream, message_id):
+    pipe = redis.pipeline(transaction=False)
+    store.mark_processed(pipe, stream, message_id)
+    await pipe.execute()
+
+
+class TestKeyPerMessageStore:
+    """Tests for the original one-key-per-message scheme."""
+
+    @pytest.mark.asyncio
+    async def test_marks_and_detects_processed(self):
+        redis = FakeRedis()
+        store = KeyPerMessageDedupStore(redis, ttl_seconds=60)
+
+        assert not await store.is_processed("inbox", "100-0")
+        await _mark(store, redis, "inbox", "100-0")
+
+        assert await store.is_processed("inbox", "100-0")
+        assert "dedup:inbox:100-0" in redis.strings
+
+
+class TestWatermarkStore:
+    """Tests for the floor + sorted-set window scheme."""
+
+    @pytest.mark.asyncio
+    async def test_redelivered_entry_in_window_is_skipped(self):
+        """An entry processed but not acked (still pending) must be detected."""
+        now_ms = int(time.time() * 1000)
+        redis = FakeRedis(pending=[f"{now_ms}-0"])
+        store = WatermarkDedupStore(redis, "group", ttl_seconds=3600)
+
+        await _mark(store, redis, "inbox", f"{now_ms}-0")
+        await store.compact("inbox")
+
+        assert await store.is_processed("inbox", f"{now_ms}-0")
+        assert not await store.is_processed("inbox", f"{now_ms}-1")
+
+    @pytest.mark.asyncio
+    async def test_compact_advances_floor_and_trims_window(self):
+        """IDs below the oldest pending entry move from the window to the floor."""
+        now_ms = int(time.time() * 1000)
+        redis = FakeRedis(pending=[f"{now_ms + 5}-0"])
+        store = WatermarkDedupStore(redis, "group", ttl_seconds=3600)
+
+        for offset in range(5):
+            await _mark(store, redis, "inbox", f"{now_ms + offset}-0")
+        await _mark(store, redis, "inbox", f"{now_ms + 7}-0")  # acked out of order
+
+        await store.compact("inbox")
+
+        assert await redis.zcard("dedup:inbox:window") == 1
+        assert redis.strings["dedup:inbox:floor"] == f"{now_ms + 5}-0"
+        assert await store.is_processed("inbox", f"{now_ms + 2}-0")
+        assert await store.is_processed("inbox", f"{now_ms + 7}-0")
+        assert not await store.is_processed("inbox", f"{now_ms + 5}-0")
+
+    @pytest.mark.asyncio
+    async def test_floor_uses_last_delivered_when_nothing_pending(self):
+        redis = FakeRedis(last_delivered="2000-3")
+        store = WatermarkDedupStore(redis, "group", ttl_seconds=3600)
+
+        await store.compact("inbox")
+
+        assert redis.strings["dedup:inbox:floor"] == "2000-4"
+        assert await store.is_processed("inbox", "2000-3")
+        assert not await store.is_processed("inbox", "2000-4")
+
+    @pytest.mark.asyncio
+    async def test_floor_never_moves_backwards(self):
+        redis = FakeRedis(pending=["1000-0"])
+        redis.strings["dedup:inbox:floor"] = "5000-0"
+        store = WatermarkDedupStore(redis, "group", ttl_seconds=3600)
+
+        await store.compact("inbox")
+
+        assert redis.strings["dedup:inbox:floor"] == "5000-0"
+
+    @pytest.mark.asyncio
+    async def test_window_bounded_by_ttl_when_entry_stuck_pending(self):
+        """A long-pending entry must not let the window grow forever."""
+        old_ms = int(time.time() * 1000) - 7200 * 1000
+        redis = FakeRedis(pending=["1-0"])
+        store = WatermarkDedupStore(redis, "group", ttl_seconds=3600)
+
+        await _mark(store, redis, "inbox", f"{old_ms}-0")
+        await store.compact("inbox")
+
+        assert await redis.zcard("dedup:inbox:window") == 0
+
+
+class TestCreateDedupStore:
+    def test_unknown_store_rejected(self):
+        with pytest.raises(ValueError):
+            create_dedup_store("bloom", FakeRedis(), "group", 60)
@@ -0,0 +1,116 @@
+"""
+Unit Tests for batch-deferred writes and the customer name fan-out.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from billie_servicing.deferred import DeferredWrites, batch_scope, collect, defer_write
+from billie_servicing.handlers.customer import handle_customer_changed
+
+
+def _customer_event(customer_id="CUS-1", first="Jane", last="Citizen"):
+    event = MagicMock()
+    event.payload = MagicMock(
+        customer_id=customer_id,
+        first_name=first,
+        last_name=last,
+        email_address=None,
+        mobile_phone_number=None,
+        date_of_birth=None,
+        ekyc_status=None,
+        residential_address=None,
+    )
+    return event
+
+
+class TestDeferredWrites:
+    @pytest.mark.asyncio
+    async def test_last_write_per_key_wins(self):
+        writes = DeferredWrites()
+        first, second = AsyncMock(), AsyncMock()
+
+        future_a = writes.defer("k", first)
+        future_b = writes.defer("k", second)
+        assert future_a is future_b
+        assert len(writes) == 1
+
+        await writes.flush()
+
+        first.assert_not_called()
+        second.assert_awaited_once()
+        assert future_a.done() and future_a.exception() is None
+
+    @pytest.mark.asyncio
+    async def test_failed_write_fails_its_future(self):
+        writes = DeferredWrites()
+        future = writes.defer("k", AsyncMock(side_effect=RuntimeError("mongo down")))
+
+        await writes.flush()
+
+        with pytest.raises(RuntimeError):
+            future.result()
+        assert len(writes) == 0
+
+    @pytest.mark.asyncio
+    async def test_defer_write_outside_batch_returns_none(self):
+        assert defer_write("k", AsyncMock()) is None
+
+    @pytest.mark.asyncio
+    async def test_collect_gathers_futures_of_the_handler_call(self):
+        writes = DeferredWrites()
+        with batch_scope(writes):
+            with collect() as pending:
+                defer_write("a", AsyncMock())
+                defer_write("a", AsyncMock())
+                defer_write("b", AsyncMock())
+
+        assert len(pending) == 2
+
+
+class TestCustomerNameFanOut:
+    @pytest.mark.asyncio
+    async def test_name_change_updates_loan_accounts(self, mock_db):
+        mock_db.customers.find_one = AsyncMock(return_value={"fullName": "Jane Doe"})
+
+        await handle_customer_changed(mock_db, _customer_event())
+
+        accounts = mock_db["loan-accounts"]
+        accounts.update_many.assert_awaited_once()
+        query, update = accounts.update_many.call_args[0]
+        assert query == {"customerIdString": "CUS-1", "customerName": {"$ne": "Jane Citizen"}}
+        assert update["$set"]["customerName"] == "Jane Citizen"
+
+    @pytest.mark.asyncio
+    async def test_retry_after_failed_fan_out_repairs_accounts(self, mock_db):
+        """The first attempt renamed the customer but its fan-out failed."""
+        accounts = mock_db["loan-accounts"]
+        accounts.update_many = AsyncMock(
+            side_effect=[Exception("primary stepped down"), MagicMock(modified_count=2)]
+        )
+
+        with pytest.raises(Exception):
+            await handle_customer_changed(mock_db, _customer_event())
+
+        # The redelivery reads the name the first attempt already wrote
+        mock_db.customers.find_one = AsyncMock(return_value={"fullName": "Jane Citizen"})
+        await handle_customer_changed(mock_db, _customer_event())
+
+        assert accounts.update_many.await_count == 2
+        assert accounts.update_many.call_args[0][1]["$set"]["customerName"] == "Jane Citizen"
+
+    @pytest.mark.asyncio
+    async def test_changes_in_one_batch_write_once_with_latest_name(self, mock_db):
+        writes = DeferredWrites()
+        with batch_scope(writes):
+            await handle_customer_changed(mock_db, _customer_event(last="Doe"))
+            await handle_customer_changed(mock_db, _customer_event(last="Citizen"))
+
+        accounts = mock_db["loan-accounts"]
+        accounts.update_many.assert_not_called()
+
+        await writes.flush()
+
+        accounts.update_many.assert_awaited_once()
+        assert accounts.update_many.call_args[0][1]["$set"]["customerName"] == "Jane Citizen"
@@ -0,0 +1,114 @@
+"""
+Unit Tests for the DLQ replay tool.
+"""
+
+import pytest
+
+from billie_servicing.config import settings
+from billie_servicing.dlq_replay import ReplayOptions, matches, replay_dlq, target_stream
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._adds = []
+
+    def xadd(self, stream, fields):
+        self._adds.append((stream, fields))
+
+    async def execute(self):
+        for stream, fields in self._adds:
+            self._redis.added.setdefault(stream, []).append(fields)
+        return [None] * len(self._adds)
+
+
+class FakeRedis:
+    """Stream reads (XRANGE with exclusive start), XADD pipelines and XDEL."""
+
+    def __init__(self, dlq_entries):
+        self.dlq = list(dlq_entries)
+        self.added = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def xrange(self, stream, min="-", max="+", count=None):
+        entries = self.dlq
+        if min.startswith("("):
+            entries = [e for e in entries if e[0] > min[1:].encode()]
+        return entries[:count]
+
+    async def xdel(self, stream, *ids):
+        before = len(self.dlq)
+        self.dlq = [e for e in self.dlq if e[0] not in ids]
+        return before - len(self.dlq)
+
+
+def _dlq_entry(n, typ, error, stream=None):
+    fields = {
+        b"typ": typ.encode(),
+        b"dat": b"{}",
+        b"original_message_id": f"{n}-0".encode(),
+        b"error": error.encode(),
+        b"moved_at": b"2025-01-10T02:00:00",
+    }
+    if stream:
+        fields[b"original_stream"] = stream.encode()
+    return (f"{1000 + n}-0".encode(), fields)
+
+
+class TestFilters:
+    def test_event_type_glob_and_error_text(self):
+        options = ReplayOptions(event_types=["account.*"], error_contains="timed out")
+
+        assert matches({"typ": "account.updated.v1", "error": "operation timed out"}, options)
+        assert not matches({"typ": "customer.changed.v1", "error": "operation timed out"}, options)
+        assert not matches({"typ": "account.updated.v1", "error": "validation failed"}, options)
+
+    def test_target_stream_prefers_recorded_stream(self):
+        assert target_stream({"typ": "account.created.v1", "original_stream": "inbox:x"}) == "inbox:x"
+        assert target_stream({"typ": "writeoff.approved.v1"}) == settings.internal_stream
+        assert target_stream({"typ": "user_input"}) == settings.inbox_stream
+
+
+class TestReplay:
+    @pytest.mark.asyncio
+    async def test_replays_matching_entries_and_deletes_them(self):
+        redis = FakeRedis([
+            _dlq_entry(1, "account.updated.v1", "timed out"),
+            _dlq_entry(2, "user_input", "timed out"),
+            _dlq_entry(3, "writeoff.approved.v1", "timed out", stream=settings.internal_stream),
+            _dlq_entry(4, "account.updated.v1", "bad payload"),
+        ])
+
+        result = await replay_dlq(
+            redis, ReplayOptions(error_contains="timed out", batch_size=2, rate_per_second=0)
+        )
+
+        assert result.scanned == 4
+        assert result.replayed == 3
+        assert result.deleted == 3
+        assert [e[0] for e in redis.dlq] == [b"1004-0"]
+        replayed = redis.added[settings.inbox_stream][0]
+        assert replayed == {"typ": "account.updated.v1", "dat": "{}"}
+        assert len(redis.added[settings.internal_stream]) == 1
+
+    @pytest.mark.asyncio
+    async def test_dry_run_changes_nothing(self):
+        redis = FakeRedis([_dlq_entry(1, "account.updated.v1", "timed out")])
+
+        result = await replay_dlq(redis, ReplayOptions(dry_run=True))
+
+        assert result.matched == 1
+        assert result.replayed == 0
+        assert redis.added == {}
+        assert len(redis.dlq) == 1
+
+    @pytest.mark.asyncio
+    async def test_limit_stops_early(self):
+        redis = FakeRedis([_dlq_entry(n, "account.updated.v1", "x") for n in range(5)])
+
+        result = await replay_dlq(redis, ReplayOptions(limit=2, rate_per_second=0))
+
+        assert result.replayed == 2
+        assert len(redis.dlq) == 3
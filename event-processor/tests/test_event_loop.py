@@ -0,0 +1,50 @@
+"""
+Unit Tests for event loop selection and loop-lag monitoring.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from billie_servicing.event_loop import LoopLagMonitor, loop_factory
+from billie_servicing.metrics import metrics
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+class TestLoopFactory:
+    def test_default_loop(self):
+        assert loop_factory("asyncio") is None
+
+    def test_unknown_loop(self):
+        with pytest.raises(ValueError):
+            loop_factory("trio")
+
+    def test_uvloop(self):
+        uvloop = pytest.importorskip("uvloop")
+        assert loop_factory("uvloop") is uvloop.new_event_loop
+
+
+class TestLoopLagMonitor:
+    def setup_method(self):
+        metrics.reset()
+
+    @pytest.mark.asyncio
+    async def test_measures_lag_and_finds_blocking_call(self):
+        monitor = LoopLagMonitor(interval_seconds=0.01, block_threshold_seconds=0.02)
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+
+        block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert metrics.histogram("event_loop_lag_seconds").quantile(1.0) >= 0.25
+        [(site, seconds)] = monitor.top_blocking(1)
+        assert "block_the_loop" in site
+        assert seconds > 0.1
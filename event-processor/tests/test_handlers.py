@@ -9,6 +9,7 @@ Tests cover event handling for:
 Based on Requirements/v2-servicing-app specifications.
 """
 
+import asyncio
 import pytest
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -30,6 +31,7 @@ from billie_servicing.handlers.conversation import (
     handle_conversation_summary,
     handle_assessment,
     handle_noticeboard_updated,
+    UtteranceCoalescer,
 )
 
 
@@ -143,8 +145,8 @@ class TestAccountHandlers:
 
         await handle_account_created(mock_db, mock_event)
 
-        mock_db["loan-accounts"].update_one.assert_called_once()
-        call_args = mock_db["loan-accounts"].update_one.call_args
+        mock_db["loan-accounts"].find_one_and_update.assert_called_once()
+        call_args = mock_db["loan-accounts"].find_one_and_update.call_args
         
         # Verify query filter
         assert call_args[0][0] == {"loanAccountId": "ACC-TEST-001"}
@@ -170,7 +172,7 @@ class TestAccountHandlers:
         ]
 
         for sdk_status, expected_status in test_cases:
-            mock_db["loan-accounts"].update_one.reset_mock()
+            mock_db["loan-accounts"].find_one_and_update.reset_mock()
             
             mock_event = MagicMock()
             mock_event.payload = MagicMock()
@@ -186,7 +188,7 @@ class TestAccountHandlers:
 
             await handle_account_created(mock_db, mock_event)
 
-            call_args = mock_db["loan-accounts"].update_one.call_args
+            call_args = mock_db["loan-accounts"].find_one_and_update.call_args
             update_doc = call_args[0][1]["$set"]
             
             assert update_doc["accountStatus"] == expected_status, \
@@ -239,8 +241,8 @@ class TestScheduleUpdatedHandler:
     async def test_handle_schedule_updated_single_payment_paid(self, mock_db):
         """AC1, AC2: Should update single payment status from scheduled to paid."""
         # Mock successful update (payment found)
-        mock_db["loan-accounts"].update_one = AsyncMock(
-            return_value=MagicMock(matched_count=1, modified_count=1)
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-001"}
         )
         
         mock_event = MagicMock()
@@ -262,8 +264,8 @@ class TestScheduleUpdatedHandler:
         await handle_schedule_updated(mock_db, mock_event)
 
         # Verify update was called once (no fallback needed)
-        mock_db["loan-accounts"].update_one.assert_called_once()
-        call_args = mock_db["loan-accounts"].update_one.call_args
+        mock_db["loan-accounts"].find_one_and_update.assert_called_once()
+        call_args = mock_db["loan-accounts"].find_one_and_update.call_args
         
         # Verify query filter uses positional operator
         query = call_args[0][0]
@@ -283,8 +285,8 @@ class TestScheduleUpdatedHandler:
     async def test_handle_schedule_updated_multiple_payments(self, mock_db):
         """AC2: Should update multiple payments in a single event."""
         # Mock successful updates (payments found)
-        mock_db["loan-accounts"].update_one = AsyncMock(
-            return_value=MagicMock(matched_count=1, modified_count=1)
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-001"}
         )
         
         mock_event = MagicMock()
@@ -314,22 +316,22 @@ class TestScheduleUpdatedHandler:
         await handle_schedule_updated(mock_db, mock_event)
 
         # Verify update was called twice (once per payment)
-        assert mock_db["loan-accounts"].update_one.call_count == 2
+        assert mock_db["loan-accounts"].find_one_and_update.call_count == 2
         
         # Verify first payment update
-        call_args_1 = mock_db["loan-accounts"].update_one.call_args_list[0]
+        call_args_1 = mock_db["loan-accounts"].find_one_and_update.call_args_list[0]
         assert call_args_1[0][0]["repaymentSchedule.payments.paymentNumber"] == 1
         
         # Verify second payment update
-        call_args_2 = mock_db["loan-accounts"].update_one.call_args_list[1]
+        call_args_2 = mock_db["loan-accounts"].find_one_and_update.call_args_list[1]
         assert call_args_2[0][0]["repaymentSchedule.payments.paymentNumber"] == 2
 
     @pytest.mark.asyncio
     async def test_handle_schedule_updated_partial_payment(self, mock_db):
         """AC3: Should handle partial payment status."""
         # Mock successful update (payment found)
-        mock_db["loan-accounts"].update_one = AsyncMock(
-            return_value=MagicMock(matched_count=1, modified_count=1)
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-001"}
         )
         
         mock_event = MagicMock()
@@ -348,7 +350,7 @@ class TestScheduleUpdatedHandler:
 
         await handle_schedule_updated(mock_db, mock_event)
 
-        call_args = mock_db["loan-accounts"].update_one.call_args
+        call_args = mock_db["loan-accounts"].find_one_and_update.call_args
         update_doc = call_args[0][1]["$set"]
         
         assert update_doc["repaymentSchedule.payments.$.status"] == "partial"
@@ -360,8 +362,8 @@ class TestScheduleUpdatedHandler:
     async def test_handle_schedule_updated_missed_payment(self, mock_db):
         """AC4: Should handle missed payment status."""
         # Mock successful update (payment found)
-        mock_db["loan-accounts"].update_one = AsyncMock(
-            return_value=MagicMock(matched_count=1, modified_count=1)
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-001"}
         )
         
         mock_event = MagicMock()
@@ -381,7 +383,7 @@ class TestScheduleUpdatedHandler:
 
         await handle_schedule_updated(mock_db, mock_event)
 
-        call_args = mock_db["loan-accounts"].update_one.call_args
+        call_args = mock_db["loan-accounts"].find_one_and_update.call_args
         update_doc = call_args[0][1]["$set"]
         
         assert update_doc["repaymentSchedule.payments.$.status"] == "missed"
@@ -393,8 +395,8 @@ class TestScheduleUpdatedHandler:
     async def test_handle_schedule_updated_status_case_insensitive(self, mock_db):
         """Should handle uppercase status values from SDK."""
         # Mock successful update (payment found)
-        mock_db["loan-accounts"].update_one = AsyncMock(
-            return_value=MagicMock(matched_count=1, modified_count=1)
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-001"}
         )
         
         mock_event = MagicMock()
@@ -413,7 +415,7 @@ class TestScheduleUpdatedHandler:
 
         await handle_schedule_updated(mock_db, mock_event)
 
-        call_args = mock_db["loan-accounts"].update_one.call_args
+        call_args = mock_db["loan-accounts"].find_one_and_update.call_args
         update_doc = call_args[0][1]["$set"]
         
         # Should be normalized to lowercase
@@ -430,7 +432,8 @@ class TestScheduleUpdatedHandler:
 
         await handle_schedule_updated(mock_db, mock_event)
 
-        # Should not call update_one when there are no payments
+        # Should not update anything when there are no payments
+        mock_db["loan-accounts"].find_one_and_update.assert_not_called()
         mock_db["loan-accounts"].update_one.assert_not_called()
 
     @pytest.mark.asyncio
@@ -444,15 +447,16 @@ class TestScheduleUpdatedHandler:
 
         await handle_schedule_updated(mock_db, mock_event)
 
-        # Should not call update_one when payments is None
+        # Should not update anything when payments is None
+        mock_db["loan-accounts"].find_one_and_update.assert_not_called()
         mock_db["loan-accounts"].update_one.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_handle_schedule_updated_preserves_other_payments(self, mock_db):
         """AC2: Updating one payment should not affect other payments."""
         # Mock successful update (payment found)
-        mock_db["loan-accounts"].update_one = AsyncMock(
-            return_value=MagicMock(matched_count=1, modified_count=1)
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-001"}
         )
         
         mock_event = MagicMock()
@@ -473,19 +477,17 @@ class TestScheduleUpdatedHandler:
         await handle_schedule_updated(mock_db, mock_event)
 
         # Verify query only targets payment 3
-        call_args = mock_db["loan-accounts"].update_one.call_args_list[0]
+        call_args = mock_db["loan-accounts"].find_one_and_update.call_args_list[0]
         query = call_args[0][0]
         assert query["repaymentSchedule.payments.paymentNumber"] == 3
 
     @pytest.mark.asyncio
     async def test_handle_schedule_updated_creates_placeholder_when_not_found(self, mock_db):
         """Out-of-order: Should create placeholder when payment doesn't exist."""
-        # First update returns no match (payment not found)
+        # The payment update matches nothing (payment not found)
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(return_value=None)
         mock_db["loan-accounts"].update_one = AsyncMock(
-            side_effect=[
-                MagicMock(matched_count=0, modified_count=0),  # First call - not found
-                MagicMock(matched_count=0, modified_count=0, upserted_id="new-id"),  # Upsert
-            ]
+            return_value=MagicMock(matched_count=0, modified_count=0, upserted_id="new-id")
         )
         
         mock_event = MagicMock()
@@ -505,11 +507,10 @@ class TestScheduleUpdatedHandler:
 
         await handle_schedule_updated(mock_db, mock_event)
 
-        # Should have called update_one twice
-        assert mock_db["loan-accounts"].update_one.call_count == 2
-        
-        # Second call should be the upsert with $push
-        upsert_call = mock_db["loan-accounts"].update_one.call_args_list[1]
+        mock_db["loan-accounts"].find_one_and_update.assert_called_once()
+
+        # The placeholder is an upsert with $push
+        upsert_call = mock_db["loan-accounts"].update_one.call_args_list[0]
         assert upsert_call[1].get("upsert") is True
         
         update_doc = upsert_call[0][1]
@@ -701,8 +702,8 @@ class TestConversationHandlers:
 
         await handle_conversation_started(mock_db, event)
 
-        mock_db.conversations.update_one.assert_called_once()
-        call_args = mock_db.conversations.update_one.call_args
+        mock_db.conversations.find_one_and_update.assert_called_once()
+        call_args = mock_db.conversations.find_one_and_update.call_args
         
         # Verify query filter
         assert call_args[0][0] == {"conversationId": "CONV-TEST-001"}
@@ -780,7 +781,7 @@ class TestConversationHandlers:
 
         await handle_final_decision(mock_db, event)
 
-        call_args = mock_db.conversations.update_one.call_args
+        call_args = mock_db.conversations.find_one_and_update.call_args
         update_doc = call_args[0][1]["$set"]
         
         assert update_doc["status"] == "approved"
@@ -796,7 +797,7 @@ class TestConversationHandlers:
 
         await handle_final_decision(mock_db, event)
 
-        call_args = mock_db.conversations.update_one.call_args
+        call_args = mock_db.conversations.find_one_and_update.call_args
         update_doc = call_args[0][1]["$set"]
         
         assert update_doc["status"] == "declined"
@@ -879,6 +880,90 @@ class TestConversationHandlers:
         assert "income verified" in push_doc["content"]
 
 
+class TestUtteranceCoalescer:
+    """Tests for coalesced utterance appends."""
+
+    @pytest.mark.asyncio
+    async def test_coalesces_utterances_into_single_push(self, mock_db):
+        """Utterances for one conversation should share one $push/$each write, in order."""
+        mock_db.conversations.find_one = AsyncMock(
+            return_value={"conversationId": "CONV-TEST-001"}
+        )
+        coalescer = UtteranceCoalescer(window_ms=1000, max_events=10)
+
+        first = coalescer.submit(
+            mock_db, {"typ": "user_input", "cid": "CONV-TEST-001", "payload": {"utterance": "Hi"}}
+        )
+        second = coalescer.submit(
+            mock_db,
+            {"typ": "assistant_response", "cid": "CONV-TEST-001", "payload": {"utterance": "Hello"}},
+        )
+        assert not first.done()
+
+        await coalescer.flush()
+        await first
+        await second
+
+        mock_db.conversations.update_one.assert_called_once()
+        update = mock_db.conversations.update_one.call_args[0][1]
+        pushed = update["$push"]["utterances"]["$each"]
+        assert [u["utterance"] for u in pushed] == ["Hi", "Hello"]
+        assert [u["username"] for u in pushed] == ["customer", "assistant"]
+        assert update["$inc"] == {"version": 2}
+
+    @pytest.mark.asyncio
+    async def test_flushes_when_max_events_reached(self, mock_db):
+        """A full buffer should be written without waiting for the window."""
+        mock_db.conversations.find_one = AsyncMock(
+            return_value={"conversationId": "CONV-TEST-001"}
+        )
+        coalescer = UtteranceCoalescer(window_ms=60_000, max_events=2)
+
+        futures = [
+            coalescer.submit(
+                mock_db, {"typ": "user_input", "cid": "CONV-TEST-001", "payload": {"utterance": t}}
+            )
+            for t in ("one", "two")
+        ]
+        await asyncio.gather(*futures)
+
+        mock_db.conversations.update_one.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_separate_conversations_are_written_separately(self, mock_db):
+        """Each conversation gets its own write."""
+        mock_db.conversations.find_one = AsyncMock(return_value={"conversationId": "x"})
+        coalescer = UtteranceCoalescer(window_ms=1000, max_events=10)
+
+        futures = [
+            coalescer.submit(mock_db, {"typ": "user_input", "cid": cid, "payload": {}})
+            for cid in ("CONV-A", "CONV-B", "CONV-A")
+        ]
+        await coalescer.flush()
+        await asyncio.gather(*futures)
+
+        filters = [c[0][0] for c in mock_db.conversations.update_one.call_args_list]
+        assert filters == [{"conversationId": "CONV-A"}, {"conversationId": "CONV-B"}]
+
+    @pytest.mark.asyncio
+    async def test_write_failure_fails_every_buffered_utterance(self, mock_db):
+        """No utterance in a failed write may be treated as processed."""
+        mock_db.conversations.find_one = AsyncMock(
+            return_value={"conversationId": "CONV-TEST-001"}
+        )
+        mock_db.conversations.update_one = AsyncMock(side_effect=RuntimeError("mongo down"))
+        coalescer = UtteranceCoalescer(window_ms=1000, max_events=10)
+
+        futures = [
+            coalescer.submit(mock_db, {"typ": "user_input", "cid": "CONV-TEST-001", "payload": {}})
+            for _ in range(3)
+        ]
+        await coalescer.flush()
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+
 class TestEventProcessorIntegration:
     """Integration tests for the full event processing flow."""
 
@@ -918,7 +1003,7 @@ class TestEventProcessorIntegration:
         account_event.payload.opened_date = "2024-01-15"
 
         await handle_account_created(mock_db, account_event)
-        assert mock_db["loan-accounts"].update_one.called
+        assert mock_db["loan-accounts"].find_one_and_update.called
 
         # 3. Add schedule
         schedule_event = MagicMock()
@@ -934,7 +1019,8 @@ class TestEventProcessorIntegration:
         
         # Verify all three handlers were called
         assert mock_db.customers.update_one.call_count >= 1
-        assert mock_db["loan-accounts"].update_one.call_count >= 2
+        assert mock_db["loan-accounts"].find_one_and_update.call_count >= 1
+        assert mock_db["loan-accounts"].update_one.call_count >= 1
 
     @pytest.mark.asyncio
     async def test_conversation_lifecycle(self, mock_db):
@@ -975,5 +1061,6 @@ class TestEventProcessorIntegration:
         await handle_final_decision(mock_db, decision_event)
         
         # Verify conversation updates
-        assert mock_db.conversations.update_one.call_count >= 4
+        assert mock_db.conversations.find_one_and_update.call_count == 2
+        assert mock_db.conversations.update_one.call_count >= 2
 
@@ -0,0 +1,165 @@
+"""
+Unit Tests for the MongoDB index bootstrapper.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from billie_servicing.indexes import IndexSpec, TimeSeriesSpec, ensure_indexes, ensure_time_series
+
+
+def _cursor(items):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=items)
+    return cursor
+
+
+class IndexCollection:
+    """Mock collection exposing the index management API."""
+
+    def __init__(self, indexes=None, stats=None):
+        self.list_indexes = MagicMock(return_value=_cursor(indexes or [{"name": "_id_", "key": {"_id": 1}}]))
+        self.aggregate = MagicMock(return_value=_cursor(stats or []))
+        self.create_index = AsyncMock(return_value="created")
+
+
+class IndexDatabase:
+    def __init__(self, collections):
+        self._collections = collections
+
+    def __getitem__(self, name):
+        return self._collections.setdefault(name, IndexCollection())
+
+
+SPECS = (
+    IndexSpec("loan-accounts", (("loanAccountId", 1),), unique=True),
+    IndexSpec("customers", (("customerId", 1),), unique=True),
+)
+
+
+class TestEnsureIndexes:
+    """Tests for ensure_indexes."""
+
+    @pytest.mark.asyncio
+    async def test_creates_missing_indexes(self):
+        """Should create declared indexes that don't exist yet."""
+        db = IndexDatabase({})
+
+        report = await ensure_indexes(db, specs=SPECS)
+
+        db["loan-accounts"].create_index.assert_called_once_with(
+            [("loanAccountId", 1)], unique=True, name="loanAccountId_1"
+        )
+        assert report.created == ["loan-accounts.loanAccountId_1", "customers.customerId_1"]
+        assert report.healthy
+
+    @pytest.mark.asyncio
+    async def test_existing_index_is_not_recreated(self):
+        """An index already created by Payload should be left alone."""
+        db = IndexDatabase({
+            "loan-accounts": IndexCollection(indexes=[
+                {"name": "loanAccountId_1", "key": {"loanAccountId": 1}, "unique": True},
+            ]),
+        })
+
+        report = await ensure_indexes(db, specs=SPECS)
+
+        db["loan-accounts"].create_index.assert_not_called()
+        assert "loan-accounts.loanAccountId_1" in report.existing
+
+    @pytest.mark.asyncio
+    async def test_opt_out_only_reports_missing(self):
+        """With creation disabled, missing indexes are reported, not created."""
+        db = IndexDatabase({})
+
+        report = await ensure_indexes(db, create=False, specs=SPECS)
+
+        db["customers"].create_index.assert_not_called()
+        assert report.missing == ["loan-accounts.loanAccountId_1", "customers.customerId_1"]
+        assert not report.healthy
+
+    @pytest.mark.asyncio
+    async def test_non_unique_existing_index_is_a_conflict(self):
+        """A non-unique index on a key that must be unique is reported."""
+        db = IndexDatabase({
+            "customers": IndexCollection(indexes=[
+                {"name": "customerId_1", "key": {"customerId": 1}},
+            ]),
+        })
+
+        report = await ensure_indexes(db, specs=SPECS)
+
+        assert report.conflicts == ["customers.customerId_1"]
+
+    @pytest.mark.asyncio
+    async def test_creation_errors_do_not_abort(self):
+        """Duplicate data or option conflicts are reported instead of raised."""
+        db = IndexDatabase({})
+        db["loan-accounts"].create_index = AsyncMock(side_effect=DuplicateKeyError("dup"))
+        db["customers"].create_index = AsyncMock(side_effect=OperationFailure("conflict", code=85))
+
+        report = await ensure_indexes(db, specs=SPECS)
+
+        assert report.missing == ["loan-accounts.loanAccountId_1"]
+        assert report.conflicts == ["customers.customerId_1"]
+
+    @pytest.mark.asyncio
+    async def test_reports_unused_indexes(self):
+        """Indexes with no recorded accesses that we don't need are reported."""
+        db = IndexDatabase({
+            "customers": IndexCollection(stats=[
+                {"name": "_id_", "accesses": {"ops": 0}},
+                {"name": "customerId_1", "accesses": {"ops": 0}},
+                {"name": "emailAddress_1", "accesses": {"ops": 0}},
+                {"name": "fullName_1", "accesses": {"ops": 12}},
+            ]),
+        })
+
+        report = await ensure_indexes(db, specs=SPECS)
+
+        assert report.unused == ["customers.emailAddress_1"]
+
+
+class TimeSeriesDatabase:
+    """Mock database exposing the collection management API."""
+
+    def __init__(self, collections=None):
+        self.list_collections = MagicMock(return_value=_cursor(collections or []))
+        self.create_collection = AsyncMock()
+
+
+TIME_SERIES = (TimeSeriesSpec("ledger-transactions", "transactionDate", "loanAccountId"),)
+
+
+class TestEnsureTimeSeries:
+    """Tests for ensure_time_series."""
+
+    @pytest.mark.asyncio
+    async def test_creates_missing_collection(self):
+        """A missing time-series collection is created with its options."""
+        db = TimeSeriesDatabase()
+
+        report = await ensure_time_series(db, specs=TIME_SERIES)
+
+        db.create_collection.assert_called_once_with(
+            "ledger-transactions",
+            timeseries={
+                "timeField": "transactionDate",
+                "metaField": "loanAccountId",
+                "granularity": "hours",
+            },
+        )
+        assert report.created == ["ledger-transactions (time-series)"]
+
+    @pytest.mark.asyncio
+    async def test_plain_collection_is_a_conflict(self):
+        """An ordinary collection with the same name is reported, not replaced."""
+        db = TimeSeriesDatabase([{"name": "ledger-transactions", "options": {}}])
+
+        report = await ensure_time_series(db, specs=TIME_SERIES)
+
+        db.create_collection.assert_not_called()
+        assert report.conflicts == ["ledger-transactions (time-series)"]
+        assert not report.healthy
@@ -0,0 +1,128 @@
+"""
+Unit Tests for consumer-lag and event-age monitoring.
+"""
+
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from billie_servicing.lag import LagMonitor, event_time, stream_id_seconds
+from billie_servicing.metrics import metrics
+
+
+def _id(seconds_ago: float, seq: int = 0) -> str:
+    return f"{int((time.time() - seconds_ago) * 1000)}-{seq}"
+
+
+class FakeRedis:
+    """XINFO GROUPS / XPENDING / XRANGE for one consumer group."""
+
+    def __init__(self, entries, last_delivered="0-0", pending_ids=(), lag=None):
+        self.entries = entries
+        self.last_delivered = last_delivered
+        self.pending_ids = list(pending_ids)
+        self.lag = lag
+
+    async def xinfo_groups(self, stream):
+        return [
+            {"name": b"other", "pending": 0, "last-delivered-id": b"0-0", "lag": 0},
+            {
+                "name": b"group",
+                "pending": len(self.pending_ids),
+                "last-delivered-id": self.last_delivered.encode(),
+                "lag": self.lag,
+            },
+        ]
+
+    async def xpending(self, stream, group):
+        if not self.pending_ids:
+            return {"pending": 0, "min": None, "max": None, "consumers": []}
+        return {"pending": len(self.pending_ids), "min": self.pending_ids[0].encode()}
+
+    async def xrange(self, stream, min="-", max="+", count=None):
+        after = min[1:] if min.startswith("(") else None
+        entries = [
+            (e.encode(), {}) for e in self.entries
+            if after is None or stream_id_seconds(e) > stream_id_seconds(after)
+        ]
+        return entries[:count]
+
+
+def _monitor(redis, max_lag=60.0, max_age=120.0):
+    return LagMonitor(redis, "group", max_lag_seconds=max_lag, max_event_age_seconds=max_age)
+
+
+class TestEventTime:
+    def test_iso_timestamp_without_zone_is_utc(self):
+        moment = datetime(2025, 1, 10, 2, 0, tzinfo=timezone.utc)
+        assert event_time({"timestamp": "2025-01-10T02:00:00"}) == moment.timestamp()
+        assert event_time({b"ts": b"2025-01-10T02:00:00Z"}) == moment.timestamp()
+
+    def test_epoch_seconds_and_milliseconds(self):
+        assert event_time({"ts": "1736474400"}) == 1736474400
+        assert event_time({"ts": "1736474400000"}) == 1736474400
+
+    def test_missing_or_unparseable(self):
+        assert event_time({"dat": "{}"}) is None
+        assert event_time({"timestamp": "yesterday"}) is None
+
+
+class TestLagMonitor:
+    def setup_method(self):
+        metrics.reset()
+
+    def test_event_age_falls_back_to_stream_id(self):
+        monitor = _monitor(FakeRedis([]))
+
+        age = monitor.observe_ack("inbox", _id(5).encode(), {b"typ": b"user_input"})
+
+        assert 4.9 < age < 5.5
+        assert metrics.histogram("event_age_seconds").count(stream="inbox", source="stream_id") == 1
+
+    def test_event_age_prefers_envelope_time(self):
+        monitor = _monitor(FakeRedis([]))
+        fields = {b"timestamp": str(time.time() - 30).encode()}
+
+        age = monitor.observe_ack("inbox", _id(1).encode(), fields)
+
+        assert 29.9 < age < 30.5
+
+    @pytest.mark.asyncio
+    async def test_caught_up_stream(self):
+        delivered = _id(10)
+        monitor = _monitor(FakeRedis([delivered], last_delivered=delivered, lag=0))
+
+        lag = await monitor.measure("inbox")
+
+        assert lag.entries == 0
+        assert lag.pending == 0
+        assert lag.seconds == 0.0
+        assert not lag.stale
+
+    @pytest.mark.asyncio
+    async def test_lag_is_age_of_oldest_unprocessed_entry(self):
+        pending, delivered, undelivered = _id(90), _id(80), _id(70)
+        redis = FakeRedis(
+            [pending, delivered, undelivered], last_delivered=delivered,
+            pending_ids=[pending], lag=1,
+        )
+
+        lag = await _monitor(redis).measure("inbox")
+
+        assert lag.entries == 1
+        assert lag.pending == 1
+        assert 89 < lag.seconds < 91
+        assert lag.stale
+        assert metrics.gauge("projections_stale").value(stream="inbox") == 1
+
+    @pytest.mark.asyncio
+    async def test_old_acked_events_flag_staleness_once(self):
+        monitor = _monitor(FakeRedis([]), max_age=60)
+        monitor.observe_ack("inbox", _id(300).encode(), {})
+
+        first = await monitor.measure("inbox")
+        second = await monitor.measure("inbox")
+
+        assert first.stale and first.max_event_age_seconds > 299
+        assert not second.stale
@@ -0,0 +1,224 @@
+"""
+Unit Tests for ledger transaction ingestion.
+"""
+
+import re
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from billie_servicing.handlers.ledger import (
+    LedgerIngest,
+    insert_transactions,
+    transaction_document,
+)
+
+PROTO = Path(__file__).resolve().parents[2] / "proto" / "accounting_ledger.proto"
+
+
+def _proto_fields(message):
+    """Field names of a message in the ledger service's proto."""
+    body = re.search(rf"message {message} {{(.*?)\n}}", PROTO.read_text(), re.S).group(1)
+    return re.findall(r"^\s*(?:optional |repeated )?(?:map<[^>]+>|[\w.]+) (\w+) =", body, re.M)
+
+
+def _transaction(transaction_id="TXN-1", account_id="ACC-1", event_type=None, **fields):
+    # Only the ledger Transaction's fields, so reading anything else fails
+    payload = SimpleNamespace(
+        transaction_id=transaction_id,
+        loan_account_id=account_id,
+        type="TransactionType.REPAYMENT",
+        transaction_date="2024-02-05T10:30:00Z",
+        effective_date="2024-02-05",
+        principal_delta="-120.00",
+        fee_delta="-25.00",
+        principal_after="1000.00",
+        fee_after="95.50",
+        total_delta="-145.00",
+        total_after="1095.50",
+        description="Scheduled repayment",
+        reference_type="DIRECT_DEBIT",
+        reference_id="DD-0001",
+        metadata={},
+        created_by="system",
+        created_at="2024-02-05T10:30:01+10:00",
+        portfolio_entry_id="PE-1",
+        notes=None,
+    )
+    for name, value in fields.items():
+        setattr(payload, name, value)
+    return SimpleNamespace(
+        event_type=event_type or "ledger.transaction.posted.v1", payload=payload
+    )
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+
+class TestTransactionDocument:
+    @pytest.mark.skipif(not PROTO.exists(), reason="ledger proto not available")
+    def test_payload_matches_ledger_proto(self):
+        assert sorted(vars(_transaction().payload)) == sorted(_proto_fields("Transaction"))
+
+    def test_maps_ledger_fields(self):
+        document = transaction_document(_transaction())
+
+        assert document["transactionDate"] == datetime(2024, 2, 5, 10, 30)
+        assert document["createdAt"] == datetime(2024, 2, 5, 0, 30, 1)
+        assert document["loanAccountId"] == "ACC-1"
+        assert document["type"] == "REPAYMENT"
+        assert document["effectiveDate"] == "2024-02-05"
+        assert document["principalDelta"] == -120.0
+        assert document["feeDelta"] == -25.0
+        assert document["totalDelta"] == -145.0
+        assert document["totalAfter"] == 1095.5
+        assert document["referenceId"] == "DD-0001"
+        assert document["createdBy"] == "system"
+
+    def test_unset_fields_are_stored_as_null(self):
+        event = _transaction(fee_delta="", fee_after="", reference_type="", reference_id="")
+
+        document = transaction_document(event)
+
+        assert document["feeDelta"] is None
+        assert document["referenceType"] is None
+        assert document["referenceId"] is None
+
+    def test_reversal_is_stored_as_its_own_transaction(self):
+        event = _transaction(
+            "TXN-2",
+            event_type="ledger.transaction.reversed.v1",
+            total_delta="145.00",
+            reference_type="REVERSAL",
+            reference_id="TXN-1",
+        )
+
+        document = transaction_document(event)
+
+        assert document["totalDelta"] == 145.0
+        assert document["referenceId"] == "TXN-1"
+
+
+def _duplicate_claims(*transaction_ids):
+    errors = [
+        {"index": n, "code": 11000, "op": {"_id": transaction_id}}
+        for n, transaction_id in enumerate(transaction_ids)
+    ]
+    return BulkWriteError({"writeErrors": errors})
+
+
+class TestInsertTransactions:
+    @pytest.mark.asyncio
+    async def test_claims_every_transaction_before_inserting(self, mock_db):
+        documents = [transaction_document(_transaction(f"TXN-{n}")) for n in (1, 2)]
+
+        await insert_transactions(mock_db, "ledger", documents)
+
+        claims = mock_db["ledger-transaction-claims"].insert_many.call_args[0][0]
+        assert [claim["_id"] for claim in claims] == ["TXN-1", "TXN-2"]
+        assert len(mock_db["ledger-transactions"].insert_many.call_args[0][0]) == 2
+
+    @pytest.mark.asyncio
+    async def test_stored_transactions_are_skipped(self, mock_db):
+        mock_db["ledger-transaction-claims"].insert_many = AsyncMock(
+            side_effect=_duplicate_claims("TXN-1")
+        )
+        collection = mock_db["ledger-transactions"]
+        collection.find = MagicMock(return_value=_Cursor([{"transactionId": "TXN-1"}]))
+        documents = [
+            transaction_document(_transaction("TXN-1")),
+            transaction_document(_transaction("TXN-2", account_id="ACC-2")),
+        ]
+
+        await insert_transactions(mock_db, "ledger", documents)
+
+        query = collection.find.call_args[0][0]
+        assert query == {"loanAccountId": {"$in": ["ACC-1"]}, "transactionId": {"$in": ["TXN-1"]}}
+        inserted = collection.insert_many.call_args[0][0]
+        assert [doc["transactionId"] for doc in inserted] == ["TXN-2"]
+
+    @pytest.mark.asyncio
+    async def test_abandoned_claim_is_taken_over(self, mock_db):
+        claims = mock_db["ledger-transaction-claims"]
+        claims.insert_many = AsyncMock(side_effect=_duplicate_claims("TXN-1"))
+        claims.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+        collection = mock_db["ledger-transactions"]
+        collection.find = MagicMock(return_value=_Cursor([]))
+
+        await insert_transactions(mock_db, "ledger", [transaction_document(_transaction())])
+
+        assert "$lt" in claims.update_one.call_args[0][0]["claimedAt"]
+        collection.insert_many.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_unfinished_claim_fails_the_flush(self, mock_db):
+        claims = mock_db["ledger-transaction-claims"]
+        claims.insert_many = AsyncMock(side_effect=_duplicate_claims("TXN-1"))
+        claims.update_one = AsyncMock(return_value=MagicMock(modified_count=0))
+        collection = mock_db["ledger-transactions"]
+        collection.find = MagicMock(return_value=_Cursor([]))
+        documents = [transaction_document(_transaction(f"TXN-{n}")) for n in (1, 2)]
+
+        with pytest.raises(RuntimeError, match="TXN-1"):
+            await insert_transactions(mock_db, "ledger", documents)
+
+        inserted = collection.insert_many.call_args[0][0]
+        assert [doc["transactionId"] for doc in inserted] == ["TXN-2"]
+
+    @pytest.mark.asyncio
+    async def test_failed_rows_release_their_claims(self, mock_db):
+        claims = mock_db["ledger-transaction-claims"]
+        claims.delete_many = AsyncMock()
+        mock_db["ledger-transactions"].insert_many = AsyncMock(
+            side_effect=BulkWriteError({"writeErrors": [{"index": 1, "code": 2}]})
+        )
+        documents = [transaction_document(_transaction(f"TXN-{n}")) for n in (1, 2)]
+
+        with pytest.raises(BulkWriteError):
+            await insert_transactions(mock_db, "ledger", documents)
+
+        assert claims.delete_many.call_args[0][0]["_id"] == {"$in": ["TXN-2"]}
+
+
+class TestLedgerIngest:
+    @pytest.mark.asyncio
+    async def test_buffered_transactions_share_one_insert(self, mock_db):
+        collection = mock_db["ledger-transactions"]
+        collection.find = MagicMock(return_value=_Cursor([]))
+        ingest = LedgerIngest(window_ms=10_000, max_events=100)
+
+        futures = [
+            ingest.submit(mock_db, _transaction(f"TXN-{n}", account_id=f"ACC-{n % 2}"))
+            for n in range(5)
+        ]
+        await ingest.flush()
+
+        assert all(future.done() and future.exception() is None for future in futures)
+        collection.insert_many.assert_awaited_once()
+        assert len(collection.insert_many.call_args[0][0]) == 5
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_is_inserted_without_waiting(self, mock_db):
+        collection = mock_db["ledger-transactions"]
+        collection.find = MagicMock(return_value=_Cursor([]))
+        ingest = LedgerIngest(window_ms=10_000, max_events=2)
+
+        first = ingest.submit(mock_db, _transaction("TXN-1"))
+        second = ingest.submit(mock_db, _transaction("TXN-2"))
+        await first
+        await second
+
+        collection.insert_many.assert_awaited_once()
@@ -0,0 +1,116 @@
+"""
+Unit Tests for in-process metrics and the timed Redis connection pool.
+"""
+
+import threading
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+import redis.asyncio as redis
+
+from billie_servicing.connections import TimedBlockingConnectionPool
+from billie_servicing.metrics import MetricsRegistry, metrics
+
+
+class TestMetricsRegistry:
+    """Tests for counters, gauges and histograms."""
+
+    def test_counter_with_labels(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+
+        counter.inc(event_type="a")
+        counter.inc(2, event_type="a")
+        counter.inc(event_type="b")
+
+        assert counter.value(event_type="a") == 3
+        assert counter.value(event_type="b") == 1
+
+    def test_updates_from_threads_are_not_lost(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("commands_total")
+        histogram = registry.histogram("command_seconds")
+
+        def record():
+            for n in range(2000):
+                counter.inc(collection=f"c{n % 7}")
+                histogram.observe(0.01, collection=f"c{n % 7}")
+                registry.snapshot()
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(counter.values.values()) == 8000
+        assert sum(series.count for series in histogram.series.values()) == 8000
+
+    def test_same_name_returns_same_metric(self):
+        registry = MetricsRegistry()
+        assert registry.gauge("depth") is registry.gauge("depth")
+
+    def test_histogram_quantiles(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency", buckets=(0.01, 0.1, 1.0))
+
+        for value in (0.005, 0.005, 0.05, 0.5):
+            histogram.observe(value, stage="x")
+
+        assert histogram.count(stage="x") == 4
+        assert histogram.quantile(0.5, stage="x") == 0.01
+        assert histogram.quantile(0.95, stage="x") == 1.0
+
+    def test_render_prometheus(self):
+        registry = MetricsRegistry()
+        registry.counter("acks_total", "Acked messages").inc(stream="inbox")
+        registry.histogram("wait_seconds", buckets=(0.1,)).observe(0.05)
+
+        text = registry.render_prometheus()
+
+        assert "# TYPE acks_total counter" in text
+        assert 'acks_total{stream="inbox"} 1' in text
+        assert 'wait_seconds_bucket{le="0.1"} 1' in text
+        assert 'wait_seconds_bucket{le="+Inf"} 1' in text
+
+    def test_reset_keeps_registered_metrics(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("c")
+        counter.inc()
+
+        registry.reset()
+
+        assert counter.value() == 0
+        assert registry.counter("c") is counter
+
+
+class TestTimedConnectionPool:
+    """Tests for the connection pool wait-time metric."""
+
+    @pytest.mark.asyncio
+    async def test_records_wait_time_per_pool(self):
+        metrics.reset()
+        pool = TimedBlockingConnectionPool(max_connections=1, pool_name="read")
+
+        with patch.object(
+            redis.BlockingConnectionPool, "get_connection", AsyncMock(return_value="conn")
+        ):
+            assert await pool.get_connection() == "conn"
+
+        assert metrics.histogram("redis_pool_wait_seconds").count(pool="read") == 1
+
+    @pytest.mark.asyncio
+    async def test_counts_pool_timeouts(self):
+        metrics.reset()
+        pool = TimedBlockingConnectionPool(max_connections=1, pool_name="command")
+
+        with patch.object(
+            redis.BlockingConnectionPool,
+            "get_connection",
+            AsyncMock(side_effect=redis.ConnectionError("No connection available.")),
+        ):
+            with pytest.raises(redis.ConnectionError):
+                await pool.get_connection()
+
+        assert metrics.counter("redis_pool_timeouts_total").value(pool="command") == 1
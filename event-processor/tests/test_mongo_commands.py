@@ -0,0 +1,115 @@
+"""
+Unit Tests for MongoDB command accounting.
+"""
+
+import asyncio
+import contextvars
+from types import SimpleNamespace
+
+import pytest
+
+from billie_servicing.metrics import metrics
+from billie_servicing.mongo_commands import (
+    UNATTRIBUTED,
+    CommandAccounting,
+    attribute_to,
+    command_filter,
+    filter_shape,
+)
+
+
+def _started(request_id, command_name, command):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        command_name=command_name,
+        command=command,
+    )
+
+
+def _succeeded(request_id, command_name, reply, micros=1500):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        command_name=command_name,
+        reply=reply,
+        duration_micros=micros,
+    )
+
+
+class TestFilterShape:
+    def test_values_replaced_keys_and_operators_kept(self):
+        shape = filter_shape(
+            {
+                "loanAccountId": "LA-1",
+                "repaymentSchedule.payments.paymentNumber": {"$in": [1, 2, 3]},
+                "$or": [{"status": "active"}, {"status": {"$exists": False}}],
+            }
+        )
+        assert shape == {
+            "loanAccountId": "?",
+            "repaymentSchedule.payments.paymentNumber": {"$in": ["?"]},
+            "$or": [{"status": "?"}, {"status": {"$exists": "?"}}],
+        }
+
+    def test_command_filter(self):
+        assert command_filter("find", {"find": "customers", "filter": {"a": 1}}) == {"a": 1}
+        update = {"update": "loan-accounts", "updates": [{"q": {"b": 2}, "u": {}}]}
+        assert command_filter("update", update) == {"b": 2}
+        assert command_filter("insert", {"insert": "x", "documents": []}) is None
+
+
+class TestCommandAccounting:
+    def setup_method(self):
+        metrics.reset()
+
+    @pytest.mark.asyncio
+    async def test_commands_attributed_to_event_across_executor(self):
+        listener = CommandAccounting(slow_command_ms=1000)
+        loop = asyncio.get_running_loop()
+
+        with attribute_to("account.schedule.updated.v1", "1-0") as usage:
+            for request_id in (1, 2):
+                # Motor calls pymongo (and the listener) on an executor with a copy of the context
+                context = contextvars.copy_context()
+                start = _started(request_id, "update", {"update": "loan-accounts", "updates": []})
+                await loop.run_in_executor(None, context.run, listener.started, start)
+                listener.succeeded(_succeeded(request_id, "update", {"n": 1, "nModified": 1}))
+
+        labels = dict(
+            event_type="account.schedule.updated.v1", command="update", collection="loan-accounts"
+        )
+        assert usage.commands == 2
+        assert metrics.counter("mongo_commands_total").value(outcome="ok", **labels) == 2
+        assert metrics.counter("mongo_reply_documents_total").value(kind="modified", **labels) == 2
+        per_event = metrics.histogram("mongo_commands_per_event")
+        assert per_event.count(event_type="account.schedule.updated.v1") == 1
+
+    def test_unattributed_and_failed_commands(self):
+        listener = CommandAccounting(slow_command_ms=1000)
+        listener.started(_started(3, "find", {"find": "customers", "filter": {}}))
+        listener.failed(_succeeded(3, "find", {}))
+
+        assert metrics.counter("mongo_commands_total").value(
+            outcome="error", event_type=UNATTRIBUTED, command="find", collection="customers"
+        ) == 1
+
+    def test_slow_commands_logged_with_shape(self, monkeypatch):
+        logged = []
+        monkeypatch.setattr(
+            "billie_servicing.mongo_commands.logger",
+            SimpleNamespace(warning=lambda msg, **kw: logged.append((msg, kw))),
+        )
+        listener = CommandAccounting(slow_command_ms=100)
+
+        with attribute_to("customer.changed.v1", "5-0"):
+            listener.started(
+                _started(4, "find", {"find": "customers", "filter": {"customerId": "C1"}})
+            )
+        listener.succeeded(_succeeded(4, "find", {"cursor": {"firstBatch": [{}]}}, micros=250_000))
+
+        [(message, fields)] = logged
+        assert message == "Slow MongoDB command"
+        assert fields["filter_shape"] == {"customerId": "?"}
+        assert fields["message_id"] == "5-0"
+        assert fields["duration_ms"] == 250.0
@@ -0,0 +1,70 @@
+"""
+Unit Tests for hash-partitioned inbox streams.
+"""
+
+import zlib
+
+import pytest
+
+from billie_servicing import dlq_replay
+from billie_servicing.config import settings
+from billie_servicing.partitions import (
+    aggregate_key,
+    inbox_streams,
+    parse_owned,
+    partition_for,
+    partition_stream,
+)
+from billie_servicing.processor import EventProcessor
+
+
+class TestPartitioning:
+    def test_stream_name_is_hash_tagged_by_index(self):
+        assert partition_stream("inbox:billie-servicing", 3) == "inbox:billie-servicing:{3}"
+
+    def test_partition_is_crc32_of_the_aggregate(self):
+        assert partition_for("ACC-1", 8) == zlib.crc32(b"ACC-1") % 8
+        assert partition_for("ACC-1", 8) == partition_for("ACC-1", 8)
+
+    def test_aggregate_from_envelope_or_payload(self):
+        assert aggregate_key({"conv": "c1", "dat": '{"account_id": "A1"}'}) == "c1"
+        assert aggregate_key({"conv": "", "dat": '{"account_id": "A1"}'}) == "A1"
+        assert aggregate_key({"dat": {"customerId": "C1"}}) == "C1"
+        assert aggregate_key({"dat": {"loan_account_id": "A2"}}) == "A2"
+        assert aggregate_key({"dat": "not json"}) is None
+
+
+class TestOwnedPartitions:
+    def test_empty_means_all(self):
+        assert parse_owned("", 4) == [0, 1, 2, 3]
+
+    def test_ranges_and_single_indexes(self):
+        assert parse_owned("0-1, 3,1", 4) == [0, 1, 3]
+
+    def test_out_of_range_rejected(self):
+        with pytest.raises(ValueError):
+            parse_owned("2-4", 4)
+
+    def test_unpartitioned_inbox(self):
+        assert inbox_streams("inbox", 0, "0-3") == ["inbox"]
+
+
+class TestPartitionedProcessor:
+    def test_reads_owned_partitions_and_internal_stream(self, monkeypatch):
+        monkeypatch.setattr(settings, "inbox_partitions", 4)
+        monkeypatch.setattr(settings, "inbox_owned_partitions", "2-3")
+
+        processor = EventProcessor()
+
+        assert processor.streams == [
+            "inbox:billie-servicing:{2}",
+            "inbox:billie-servicing:{3}",
+            "inbox:billie-servicing:internal",
+        ]
+
+    def test_dlq_entries_without_source_replay_to_their_partition(self, monkeypatch):
+        monkeypatch.setattr(settings, "inbox_partitions", 4)
+        fields = {"typ": "account.created.v1", "conv": "c1"}
+
+        expected = partition_stream("inbox:billie-servicing", partition_for("c1", 4))
+        assert dlq_replay.target_stream(fields) == expected
@@ -0,0 +1,136 @@
+"""
+Unit Tests for EventProcessor startup and parsing.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from billie_servicing import processor as processor_module
+from billie_servicing.processor import EventProcessor, sdk_parser
+from billie_servicing.retry import RetryEntry
+from billie_servicing.startup import StartupProfile
+
+
+class FakePendingRedis:
+    """XPENDING (range) / XCLAIM over a fixed set of pending entries."""
+
+    def __init__(self, ids):
+        self.pending = [{"message_id": i, "times_delivered": 2} for i in ids]
+        self.claims = []
+
+    async def xpending_range(self, stream, group, min, max, count):
+        entries = self.pending
+        if min.startswith("("):
+            entries = [e for e in entries if e["message_id"] > min[1:].encode()]
+        return entries[:count]
+
+    async def xclaim(self, stream, group, consumer, min_idle_time, message_ids):
+        self.claims.append(list(message_ids))
+        return [(message_id, {b"typ": b"user_input"}) for message_id in message_ids]
+
+
+class TestLazySdkParsers:
+    def test_parser_imported_once_on_first_use(self, monkeypatch):
+        monkeypatch.setitem(processor_module.SDK_PARSERS, "test", ("json", "loads"))
+        monkeypatch.setattr(processor_module, "_loaded_parsers", {})
+
+        parser = sdk_parser("test")
+
+        assert parser('{"a": 1}') == {"a": 1}
+        assert sdk_parser("test") is parser
+
+    def test_chat_events_need_no_sdk(self, monkeypatch):
+        monkeypatch.setattr(processor_module, "_loaded_parsers", {})
+
+        parsed = EventProcessor()._parse_event("user_input", {"typ": "user_input", "conv": "c1"})
+
+        assert parsed["conv"] == "c1"
+        assert processor_module._loaded_parsers == {}
+
+
+class TestPendingRecovery:
+    @pytest.mark.asyncio
+    async def test_claims_each_page_once_and_moves_on(self, monkeypatch):
+        monkeypatch.setattr(processor_module.settings, "batch_size", 2)
+        processor = EventProcessor()
+        processor.redis = FakePendingRedis([b"1-0", b"2-0", b"3-0"])
+        processed = []
+
+        async def record(message, stream, delivery_count=1):
+            # Leave the entry pending, as a failed message would be
+            processed.append((message[0], delivery_count))
+
+        monkeypatch.setattr(processor, "_process_message", record)
+
+        await processor._process_pending_messages("inbox")
+
+        assert processor.redis.claims == [[b"1-0", b"2-0"], [b"3-0"]]
+        assert processed == [(b"1-0", 2), (b"2-0", 2), (b"3-0", 2)]
+
+
+class TestStartupProfile:
+    def test_first_ack_recorded_once(self):
+        profile = StartupProfile(started_at=0.0)
+
+        profile.acked()
+        first = profile.first_ack_seconds
+        profile.acked()
+
+        assert first is not None
+        assert profile.first_ack_seconds == first
+        assert profile.phases["first_ack"] == first
+
+    @pytest.mark.asyncio
+    async def test_phases_and_readiness(self):
+        profile = StartupProfile()
+
+        async with profile.phase("connect"):
+            pass
+        profile.mark_ready()
+
+        assert profile.ready.is_set()
+        assert set(profile.phases) == {"connect", "ready"}
+
+
+class TestRedelivery:
+    @pytest.mark.asyncio
+    async def test_retry_goes_through_its_pool_lane(self, monkeypatch):
+        processor = EventProcessor()
+        processor.redis = FakePendingRedis([])
+        prepared = []
+
+        async def prepare(message, stream, delivery_count=1):
+            prepared.append((message[0], delivery_count))
+            return None
+
+        monkeypatch.setattr(processor, "_prepare_message", prepare)
+        monkeypatch.setattr(processor, "_process_message", pytest.fail)
+        for pool in processor.pools.values():
+            pool.start()
+
+        entry = RetryEntry(due_at=0, sequence=0, stream="inbox", message_id=b"5-0", attempt=2)
+        await processor._redeliver(entry)
+        await processor.pools["chat"].join()
+        for pool in processor.pools.values():
+            pool.stop()
+
+        assert prepared == [(b"5-0", 3)]
+        assert processor._redeliveries == {}
+        assert processor._in_flight.in_flight == 0
+
+
+class TestDedupCompaction:
+    @pytest.mark.asyncio
+    async def test_memory_report_is_off_by_default(self, monkeypatch):
+        monkeypatch.setattr(processor_module.settings, "dedup_compact_interval_seconds", 0)
+        processor = EventProcessor()
+        processor.dedup = MagicMock(compact=AsyncMock(), memory_report=AsyncMock())
+
+        task = asyncio.create_task(processor._compact_dedup())
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        processor.dedup.compact.assert_awaited()
+        processor.dedup.memory_report.assert_not_awaited()
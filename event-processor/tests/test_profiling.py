@@ -0,0 +1,64 @@
+"""
+Unit Tests for the on-demand profiler.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from billie_servicing.admin import AdminServer
+from billie_servicing.profiling import Profiler, handler_key
+
+
+async def busy_handler(db, event):
+    total = 0
+    for _ in range(2):
+        total += sum(i * i for i in range(20000))
+        await asyncio.sleep(0)
+    return total
+
+
+class CallableHandler:
+    async def __call__(self, db, event):
+        await asyncio.sleep(0)
+
+
+class TestProfiler:
+    @pytest.mark.asyncio
+    async def test_writes_stats_and_per_handler_summary(self, tmp_path):
+        profiler = Profiler(str(tmp_path), top_n=5, handlers=lambda: [busy_handler])
+
+        assert profiler.start()
+        assert not profiler.start()
+        for _ in range(3):
+            await busy_handler(None, None)
+        result = profiler.stop()
+
+        assert not profiler.active
+        assert os.path.exists(result.stats_path)
+        [handler] = result.handlers
+        assert handler.name == "busy_handler"
+        assert handler.cumulative_seconds > 0
+        summary = open(result.summary_path).read()
+        assert "busy_handler" in summary
+        assert "Top 5 functions" in summary
+
+    def test_stop_without_session(self, tmp_path):
+        assert Profiler(str(tmp_path)).stop() is None
+
+    def test_handler_key_for_callable_objects(self):
+        assert handler_key(busy_handler)[2] == "busy_handler"
+        assert handler_key(CallableHandler())[2] == "__call__"
+
+    @pytest.mark.asyncio
+    async def test_admin_routes(self, tmp_path):
+        profiler = Profiler(str(tmp_path))
+        admin = AdminServer("127.0.0.1", 0)
+        profiler.add_admin_routes(admin)
+
+        status, _, body = await admin.routes[("POST", "/profile/start")]()
+        assert (status, body) == (200, "started\n")
+        status, _, body = await admin.routes[("POST", "/profile/stop")]()
+        assert status == 200
+        assert "Top 30 functions" in body
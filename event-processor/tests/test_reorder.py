@@ -0,0 +1,146 @@
+"""
+Unit Tests for the per-aggregate reorder buffer.
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from billie_servicing.handlers.account import handle_schedule_created, handle_schedule_updated
+from billie_servicing.reorder import ReorderBuffer, in_sequence, released
+
+
+def _message(n, typ, conv="conv-1", seq=1):
+    fields = {b"typ": typ.encode(), b"conv": conv.encode(), b"seq": str(seq).encode()}
+    return (f"{n}-0".encode(), fields)
+
+
+def _ids(items):
+    return [item[1][0] for item in items]
+
+
+class TestReorderBuffer:
+    def test_in_order_events_pass_straight_through(self):
+        buffer = ReorderBuffer(window_seconds=1, max_held=10)
+
+        first = buffer.offer("inbox", _message(1, "user_input", seq=1))
+        second = buffer.offer("inbox", _message(2, "user_input", seq=2))
+
+        assert first == [("inbox", _message(1, "user_input", seq=1), True)]
+        assert second[0][2] is True
+
+    def test_gap_held_until_filled(self):
+        buffer = ReorderBuffer(window_seconds=1, max_held=10)
+        buffer.offer("inbox", _message(1, "user_input", seq=1))
+
+        assert buffer.offer("inbox", _message(3, "user_input", seq=3)) == []
+        assert buffer.held == 1
+
+        released_now = buffer.offer("inbox", _message(2, "user_input", seq=2))
+
+        assert _ids(released_now) == [b"2-0", b"3-0"]
+        assert all(ordered for _, _, ordered in released_now)
+        assert buffer.held == 0
+
+    def test_dependent_event_waits_for_its_prerequisite(self):
+        """CRM events all have seq 1; approval must follow the request."""
+        buffer = ReorderBuffer(window_seconds=1, max_held=10)
+
+        assert buffer.offer("internal", _message(1, "writeoff.approved.v1", conv="wo-1")) == []
+        released_now = buffer.offer("internal", _message(2, "writeoff.requested.v1", conv="wo-1"))
+
+        assert _ids(released_now) == [b"2-0", b"1-0"]
+
+    def test_aggregates_are_independent(self):
+        buffer = ReorderBuffer(window_seconds=1, max_held=10)
+        buffer.offer("internal", _message(1, "writeoff.approved.v1", conv="wo-1"))
+
+        released_now = buffer.offer("internal", _message(2, "writeoff.requested.v1", conv="wo-2"))
+
+        assert _ids(released_now) == [b"2-0"]
+        assert buffer.held == 1
+
+    def test_expired_events_released_out_of_sequence(self):
+        buffer = ReorderBuffer(window_seconds=0.5, max_held=10)
+        held = _message(1, "account.schedule.updated.v1", conv="ACC-1")
+        buffer.offer("inbox", held)
+
+        assert buffer.expired() == []
+        forced = buffer.expired(now=float("inf"))
+
+        assert forced == [("inbox", held)]
+        # Offered again after being re-dispatched: passed through, flagged
+        assert buffer.offer("inbox", held) == [("inbox", held, False)]
+        later = buffer.offer("inbox", _message(2, "account.schedule.created.v1", conv="ACC-1"))
+        assert later[0][2] is False
+
+    def test_forced_release_satisfies_the_prerequisite(self):
+        """A request handled before a restart shouldn't hold every later approval."""
+        buffer = ReorderBuffer(window_seconds=0.5, max_held=10)
+        buffer.offer("internal", _message(1, "writeoff.approved.v1", conv="wo-1"))
+        buffer.expired(now=float("inf"))
+
+        later = buffer.offer("internal", _message(2, "writeoff.cancelled.v1", conv="wo-1"))
+
+        assert _ids(later) == [b"2-0"]
+        assert buffer.held == 0
+
+    def test_overflow_forces_the_oldest_aggregate(self):
+        buffer = ReorderBuffer(window_seconds=60, max_held=1)
+        buffer.offer("internal", _message(1, "writeoff.approved.v1", conv="wo-1"))
+        buffer.offer("internal", _message(2, "writeoff.approved.v1", conv="wo-2"))
+
+        assert [m[0] for _, m in buffer.expired()] == [b"1-0"]
+        assert buffer.held == 1
+
+    def test_events_without_aggregate_are_not_sequenced(self):
+        buffer = ReorderBuffer(window_seconds=1, max_held=10)
+        message = (b"1-0", {b"typ": b"user_input"})
+
+        assert buffer.offer("inbox", message) == [("inbox", message, False)]
+
+
+def _schedule_event(payment_numbers):
+    event = MagicMock()
+    event.payload.account_id = "ACC-1"
+    event.payload.schedule_id = "SCHED-1"
+    payments = []
+    for number in payment_numbers:
+        payment = MagicMock()
+        payment.payment_number = number
+        payment.status = "paid"
+        payment.paid_date = None
+        payments.append(payment)
+    event.payload.payments = payments
+    return event
+
+
+class TestInSequenceHandlers:
+    def test_default_is_out_of_sequence(self):
+        assert in_sequence() is False
+        with released(True):
+            assert in_sequence() is True
+        assert in_sequence() is False
+
+    @pytest.mark.asyncio
+    async def test_schedule_created_in_sequence_skips_status_read(self, mock_db):
+        with released(True):
+            await handle_schedule_created(mock_db, _schedule_event([1, 2]))
+
+        mock_db["loan-accounts"].find_one.assert_not_called()
+        mock_db["loan-accounts"].update_one.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_schedule_created_out_of_sequence_preserves_statuses(self, mock_db):
+        await handle_schedule_created(mock_db, _schedule_event([1]))
+
+        mock_db["loan-accounts"].find_one.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_schedule_updated_in_sequence_writes_no_placeholder(self, mock_db):
+        with released(True):
+            await handle_schedule_updated(mock_db, _schedule_event([7]))
+
+        # Only the positional update; no placeholder upsert
+        mock_db["loan-accounts"].find_one_and_update.assert_called_once()
+        mock_db["loan-accounts"].update_one.assert_not_called()
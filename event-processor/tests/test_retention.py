@@ -0,0 +1,132 @@
+"""
+Unit Tests for stream retention.
+"""
+
+import time
+
+import pytest
+
+from billie_servicing.retention import RetentionManager
+
+
+def _id(seconds_ago: float, seq: int = 0) -> str:
+    return f"{int((time.time() - seconds_ago) * 1000)}-{seq}"
+
+
+def _key(message_id: str) -> tuple[int, int]:
+    ms, seq = message_id.split("-")
+    return int(ms), int(seq)
+
+
+class FakeRedis:
+    """Streams as sorted ID lists, with groups described by pending/last-delivered IDs."""
+
+    def __init__(self):
+        self.streams = {}
+        self.groups = {}
+
+    def add(self, stream, ids):
+        self.streams.setdefault(stream, []).extend(ids)
+
+    async def xinfo_groups(self, stream):
+        return [
+            {
+                "name": name.encode(),
+                "pending": len(group["pending"]),
+                "last-delivered-id": group["last"].encode(),
+            }
+            for name, group in self.groups.get(stream, {}).items()
+        ]
+
+    async def xpending(self, stream, group):
+        pending = sorted(self.groups[stream][group]["pending"], key=_key)
+        return {"pending": len(pending), "min": pending[0].encode()}
+
+    async def xtrim(self, stream, maxlen=None, approximate=True, minid=None):
+        entries = self.streams.get(stream, [])
+        kept = entries
+        if minid is not None:
+            kept = [e for e in entries if _key(e) >= _key(minid)]
+        if maxlen is not None:
+            kept = kept[-maxlen:]
+        self.streams[stream] = kept
+        return len(entries) - len(kept)
+
+    async def xlen(self, stream):
+        return len(self.streams.get(stream, []))
+
+    async def memory_usage(self, stream):
+        return 100 + 50 * len(self.streams.get(stream, []))
+
+
+def _manager(redis, min_retention=60):
+    return RetentionManager(
+        redis,
+        streams=["inbox"],
+        dlq_stream="dlq",
+        min_retention_seconds=min_retention,
+        dlq_retention_seconds=3600,
+        dlq_max_length=3,
+    )
+
+
+class TestStreamRetention:
+    @pytest.mark.asyncio
+    async def test_keeps_oldest_pending_entry_of_any_group(self):
+        ids = [_id(600 - i) for i in range(6)]
+        redis = FakeRedis()
+        redis.add("inbox", ids)
+        redis.groups["inbox"] = {
+            "processor": {"pending": [], "last": ids[5]},
+            "audit": {"pending": [ids[2], ids[4]], "last": ids[5]},
+        }
+
+        report = await _manager(redis).trim_stream("inbox")
+
+        assert redis.streams["inbox"] == ids[2:]
+        assert report.trimmed == 2
+        assert report.reclaimed_bytes == 100
+
+    @pytest.mark.asyncio
+    async def test_keeps_undelivered_entries(self):
+        ids = [_id(600 - i) for i in range(4)]
+        redis = FakeRedis()
+        redis.add("inbox", ids)
+        redis.groups["inbox"] = {"processor": {"pending": [], "last": ids[1]}}
+
+        await _manager(redis).trim_stream("inbox")
+
+        assert redis.streams["inbox"] == ids[2:]
+
+    @pytest.mark.asyncio
+    async def test_minimum_retention_window(self):
+        old, recent = _id(600), _id(10)
+        redis = FakeRedis()
+        redis.add("inbox", [old, recent])
+        redis.groups["inbox"] = {"processor": {"pending": [], "last": recent}}
+
+        await _manager(redis, min_retention=60).trim_stream("inbox")
+
+        assert redis.streams["inbox"] == [recent]
+
+    @pytest.mark.asyncio
+    async def test_stream_without_groups_is_left_alone(self):
+        redis = FakeRedis()
+        redis.add("inbox", [_id(600)])
+
+        report = await _manager(redis).trim_stream("inbox")
+
+        assert report.min_id is None
+        assert report.trimmed == 0
+
+
+class TestDlqRetention:
+    @pytest.mark.asyncio
+    async def test_capped_by_age_and_length(self):
+        redis = FakeRedis()
+        redis.add("dlq", [_id(7200)] + [_id(60 - i) for i in range(5)])
+
+        report = await _manager(redis).trim_dlq()
+
+        assert report.trimmed == 3
+        assert report.length == 3
@@ -0,0 +1,107 @@
+"""
+Unit Tests for the in-process retry scheduler.
+"""
+
+import asyncio
+import pytest
+
+from billie_servicing.retry import RetryScheduler, backoff_delay
+
+
+class TestBackoffDelay:
+    """Tests for exponential backoff with jitter."""
+
+    def test_doubles_per_attempt_without_jitter(self):
+        delays = [backoff_delay(attempt, 0.5, 60, jitter=0) for attempt in (1, 2, 3, 4)]
+        assert delays == [0.5, 1.0, 2.0, 4.0]
+
+    def test_capped_at_maximum(self):
+        assert backoff_delay(20, 0.5, 60, jitter=0) == 60
+
+    def test_jitter_stays_within_bounds(self):
+        for _ in range(100):
+            delay = backoff_delay(3, 1.0, 60, jitter=0.5)
+            assert 2.0 <= delay <= 4.0
+
+
+class TestRetryScheduler:
+    """Tests for scheduling and redelivery."""
+
+    @pytest.mark.asyncio
+    async def test_same_entry_is_scheduled_once(self):
+        scheduler = RetryScheduler(None, 1.0, 10.0, 0)
+
+        assert scheduler.schedule("inbox", b"1-0", 1) == 1.0
+        assert scheduler.schedule("inbox", b"1-0", 1) is None
+        assert len(scheduler) == 1
+
+    @pytest.mark.asyncio
+    async def test_redelivers_due_entries_in_backoff_order(self):
+        redelivered = []
+
+        async def redeliver(entry):
+            redelivered.append((entry.message_id, entry.attempt))
+
+        scheduler = RetryScheduler(redeliver, 0.01, 1.0, 0)
+        task = asyncio.create_task(scheduler.run())
+        try:
+            scheduler.schedule("inbox", b"2-0", 2)  # 20ms
+            scheduler.schedule("inbox", b"1-0", 1)  # 10ms
+            await asyncio.sleep(0.1)
+        finally:
+            task.cancel()
+
+        assert redelivered == [(b"1-0", 1), (b"2-0", 2)]
+        assert len(scheduler) == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_redelivery_is_rescheduled(self):
+        calls = []
+
+        async def redeliver(entry):
+            calls.append(entry.message_id)
+            if len(calls) == 1:
+                raise ConnectionError("redis unavailable")
+
+        scheduler = RetryScheduler(redeliver, 0.01, 1.0, 0)
+        task = asyncio.create_task(scheduler.run())
+        try:
+            scheduler.schedule("inbox", b"1-0", 1)
+            await asyncio.sleep(0.1)
+        finally:
+            task.cancel()
+
+        assert calls == [b"1-0", b"1-0"]
+
+    @pytest.mark.asyncio
+    async def test_stop_lets_the_redelivery_in_progress_finish(self):
+        started = asyncio.Event()
+        release = asyncio.Event()
+        finished = []
+
+        async def redeliver(entry):
+            started.set()
+            await release.wait()
+            finished.append(entry.message_id)
+
+        scheduler = RetryScheduler(redeliver, 0.01, 1.0, 0)
+        task = asyncio.create_task(scheduler.run())
+        try:
+            scheduler.schedule("inbox", b"1-0", 1, delay=0)
+            scheduler.schedule("inbox", b"2-0", 1, delay=0)
+            await started.wait()
+
+            scheduler.stop()
+            idle = asyncio.create_task(scheduler.wait_idle())
+            await asyncio.sleep(0.01)
+            assert not idle.done()
+
+            release.set()
+            await asyncio.wait_for(idle, timeout=1)
+            await asyncio.sleep(0.05)
+        finally:
+            task.cancel()
+
+        # The second entry was never started; it stays in the PEL
+        assert finished == [b"1-0"]
+        assert len(scheduler) == 1
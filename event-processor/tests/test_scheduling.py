@@ -0,0 +1,84 @@
+"""
+Unit Tests for weighted batch scheduling between streams.
+"""
+
+import asyncio
+
+import pytest
+
+from billie_servicing.scheduling import BatchScheduler
+
+
+async def _drain(scheduler, n):
+    return [(await scheduler.get())[0] for _ in range(n)]
+
+
+class TestBatchScheduler:
+    @pytest.mark.asyncio
+    async def test_batches_served_by_weight(self):
+        scheduler = BatchScheduler(maxsize=10)
+        scheduler.add_stream("internal", weight=3)
+        scheduler.add_stream("external", weight=1)
+        for i in range(4):
+            await scheduler.put("internal", i)
+            await scheduler.put("external", i)
+
+        served = await _drain(scheduler, 4)
+
+        assert served.count("internal") == 3
+        assert served.count("external") == 1
+
+    @pytest.mark.asyncio
+    async def test_idle_stream_gives_up_its_share(self):
+        scheduler = BatchScheduler(maxsize=10)
+        scheduler.add_stream("internal", weight=4)
+        scheduler.add_stream("external", weight=1)
+        for i in range(3):
+            await scheduler.put("external", i)
+
+        assert [await scheduler.get() for _ in range(3)] == [
+            ("external", 0),
+            ("external", 1),
+            ("external", 2),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_overdue_batch_served_first(self):
+        scheduler = BatchScheduler(maxsize=10)
+        scheduler.add_stream("internal", weight=1, latency_target=0.01)
+        scheduler.add_stream("external", weight=100)
+        await scheduler.put("internal", "writeoff")
+        await asyncio.sleep(0.02)
+        await scheduler.put("external", "utterance")
+
+        assert await scheduler.get() == ("internal", "writeoff")
+
+    @pytest.mark.asyncio
+    async def test_full_stream_queue_blocks_only_that_stream(self):
+        scheduler = BatchScheduler(maxsize=1)
+        scheduler.add_stream("internal")
+        scheduler.add_stream("external")
+        await scheduler.put("external", 1)
+
+        blocked = asyncio.create_task(scheduler.put("external", 2))
+        await asyncio.wait_for(scheduler.put("internal", 1), timeout=1)
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+
+        await scheduler.get()
+        await scheduler.get()
+        await asyncio.wait_for(blocked, timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_join_waits_for_finished_batches(self):
+        scheduler = BatchScheduler(maxsize=2)
+        scheduler.add_stream("external")
+        await scheduler.put("external", 1)
+        await scheduler.get()
+
+        joined = asyncio.create_task(scheduler.join())
+        await asyncio.sleep(0.01)
+        assert not joined.done()
+
+        scheduler.task_done()
+        await asyncio.wait_for(joined, timeout=1)
@@ -0,0 +1,202 @@
+"""
+Unit Tests for the incrementally maintained customer summary projection.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from billie_servicing.handlers.account import (
+    handle_account_created,
+    handle_account_status_changed,
+    handle_account_updated,
+    handle_schedule_updated,
+)
+from billie_servicing.handlers.summary import account_after, payment_date, summary_deltas
+
+
+def _account(customer="CUS-1", status="active", outstanding=580.0):
+    return {
+        "customerIdString": customer,
+        "accountStatus": status,
+        "balances": {"totalOutstanding": outstanding},
+    }
+
+
+def _summary_updates(mock_db):
+    return mock_db["customer-summaries"].update_one.call_args_list
+
+
+class TestSummaryDeltas:
+    def test_new_account_adds_its_contribution(self):
+        assert summary_deltas(None, _account()) == {
+            "CUS-1": {"accountCount": 1, "totalOutstanding": 580.0, "accountsByStatus.active": 1}
+        }
+
+    def test_status_change_moves_one_count(self):
+        before = _account(status="active")
+
+        deltas = summary_deltas(before, account_after(before, status="in_arrears"))
+
+        assert deltas == {
+            "CUS-1": {"accountsByStatus.active": -1, "accountsByStatus.in_arrears": 1}
+        }
+
+    def test_balance_change_is_rounded_difference(self):
+        before = _account(outstanding=580.1)
+
+        deltas = summary_deltas(before, account_after(before, outstanding=435.0))
+
+        assert deltas == {"CUS-1": {"totalOutstanding": -145.1}}
+
+    def test_unchanged_account_has_no_delta(self):
+        before = _account()
+        assert summary_deltas(before, account_after(before, status="active")) == {}
+
+    def test_account_moving_customer_updates_both(self):
+        deltas = summary_deltas(_account(customer="CUS-1"), _account(customer="CUS-2"))
+
+        assert deltas["CUS-1"]["accountCount"] == -1
+        assert deltas["CUS-2"]["accountCount"] == 1
+
+    def test_unlinked_placeholder_contributes_nothing(self):
+        placeholder = {"loanAccountId": "ACC-1", "repaymentSchedule": {"payments": []}}
+        assert summary_deltas(None, placeholder) == {}
+
+
+class TestAccountHandlersMaintainSummary:
+    @pytest.mark.asyncio
+    async def test_account_created_increments_summary(self, mock_db):
+        event = MagicMock()
+        event.payload = MagicMock(
+            account_id="ACC-1",
+            account_number="ACC-00001",
+            customer_id="CUS-1",
+            status="ACTIVE",
+            loan_amount=Decimal("500.00"),
+            loan_fee=Decimal("80.00"),
+            loan_total_payable=Decimal("580.00"),
+            current_balance=Decimal("580.00"),
+            opened_date="2024-01-15",
+        )
+
+        await handle_account_created(mock_db, event)
+
+        [call] = _summary_updates(mock_db)
+        query, update = call[0]
+        assert query == {"customerId": "CUS-1"}
+        assert update["$inc"] == {
+            "accountCount": 1,
+            "totalOutstanding": 580.0,
+            "accountsByStatus.active": 1,
+        }
+        assert call[1]["upsert"] is True
+
+    @pytest.mark.asyncio
+    async def test_redelivered_account_created_adds_nothing(self, mock_db):
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(return_value=_account())
+        event = MagicMock()
+        event.payload = MagicMock(
+            account_id="ACC-1",
+            account_number="ACC-00001",
+            customer_id="CUS-1",
+            status="ACTIVE",
+            loan_amount=Decimal("500.00"),
+            loan_fee=Decimal("80.00"),
+            loan_total_payable=Decimal("580.00"),
+            current_balance=Decimal("580.00"),
+            opened_date="2024-01-15",
+        )
+
+        await handle_account_created(mock_db, event)
+
+        assert _summary_updates(mock_db) == []
+
+    @pytest.mark.asyncio
+    async def test_status_changed_moves_status_count(self, mock_db):
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(return_value=_account())
+        event = MagicMock()
+        event.payload = MagicMock(account_id="ACC-1", new_status="SUSPENDED")
+
+        await handle_account_status_changed(mock_db, event)
+
+        [call] = _summary_updates(mock_db)
+        assert call[0][1]["$inc"] == {
+            "accountsByStatus.active": -1,
+            "accountsByStatus.in_arrears": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_account_updated_applies_balance_and_last_payment(self, mock_db):
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(return_value=_account())
+        event = MagicMock()
+        event.payload = MagicMock(
+            account_id="ACC-1",
+            current_balance=Decimal("435.00"),
+            status=None,
+            last_payment_date="2024-01-22",
+            last_payment_amount=Decimal("145.00"),
+        )
+
+        await handle_account_updated(mock_db, event)
+
+        inc_call, payment_call = _summary_updates(mock_db)
+        assert inc_call[0][1]["$inc"] == {"totalOutstanding": -145.0}
+        query, update = payment_call[0]
+        assert query == {
+            "customerId": "CUS-1",
+            "lastPayment.date": {"$not": {"$gte": datetime(2024, 1, 22)}},
+        }
+        assert update["$set"]["lastPayment"] == {
+            "date": datetime(2024, 1, 22),
+            "amount": 145.0,
+            "loanAccountId": "ACC-1",
+        }
+
+    @pytest.mark.asyncio
+    async def test_unknown_account_update_leaves_summary_alone(self, mock_db):
+        event = MagicMock()
+        event.payload = MagicMock(account_id="ACC-404", new_status="CLOSED")
+
+        await handle_account_status_changed(mock_db, event)
+
+        assert _summary_updates(mock_db) == []
+
+    @pytest.mark.asyncio
+    async def test_schedule_updated_records_latest_payment(self, mock_db):
+        mock_db["loan-accounts"].find_one_and_update = AsyncMock(
+            return_value={"customerIdString": "CUS-1"}
+        )
+        payments = [
+            MagicMock(
+                payment_number=n,
+                status="paid",
+                paid_date=paid,
+                amount_paid=Decimal("145.00"),
+                amount_remaining=None,
+                linked_transaction_ids=None,
+                last_updated=None,
+            )
+            # The first is later once both are in UTC, but earlier as a string
+            for n, paid in ((1, "2024-02-05T23:30:00-05:00"), (2, datetime(2024, 2, 6, 1)))
+        ]
+        event = MagicMock()
+        event.payload = MagicMock(account_id="ACC-1", schedule_id="S-1", payments=payments)
+
+        await handle_schedule_updated(mock_db, event)
+
+        [call] = _summary_updates(mock_db)
+        assert call[0][1]["$set"]["lastPayment"]["date"] == datetime(2024, 2, 6, 4, 30)
+        # The customer ID comes back with the payment update
+        mock_db["loan-accounts"].find_one.assert_not_called()
+
+
+class TestPaymentDate:
+    def test_dates_strings_and_datetimes_normalise_to_utc(self):
+        assert payment_date("2024-01-22") == datetime(2024, 1, 22)
+        assert payment_date("2024-01-22T10:00:00Z") == datetime(2024, 1, 22, 10)
+        assert payment_date("2024-01-22T10:00:00+10:00") == datetime(2024, 1, 22)
+        assert payment_date(datetime(2024, 1, 22).date()) == datetime(2024, 1, 22)
+        assert payment_date(datetime(2024, 1, 22, 10)) == datetime(2024, 1, 22, 10)
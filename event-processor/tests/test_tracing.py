@@ -0,0 +1,89 @@
+"""
+Unit Tests for optional OpenTelemetry tracing.
+"""
+
+import asyncio
+import contextvars
+from types import SimpleNamespace
+
+import pytest
+
+from billie_servicing import tracing
+
+pytest.importorskip("opentelemetry.sdk")
+
+
+@pytest.fixture
+def exporter():
+    exporter = tracing.configure_tracing("memory")
+    yield exporter
+    tracing.disable_tracing()
+
+
+def _spans(exporter):
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
+class TestDisabled:
+    def test_helpers_are_no_ops(self):
+        tracing.disable_tracing()
+
+        root = tracing.start_span("process_message", event_id="abc")
+        with tracing.span("decode", parent=root) as current:
+            assert current is None
+        tracing.set_attributes(root, event_type="user_input")
+        tracing.end_span(root)
+
+        assert root is None
+        assert not tracing.enabled()
+
+
+class TestSpans:
+    def test_stage_spans_are_children_of_root(self, exporter):
+        root = tracing.start_span("process_message", event_id="evt-1", cause="cause-1")
+        with tracing.span("decode", parent=root):
+            pass
+        with tracing.span("handler", parent=root, handler="handle_utterance"):
+            with tracing.span("inner"):
+                pass
+        tracing.end_span(root)
+
+        spans = _spans(exporter)
+        root_id = spans["process_message"].context.span_id
+        assert spans["decode"].parent.span_id == root_id
+        assert spans["handler"].parent.span_id == root_id
+        assert spans["inner"].parent.span_id == spans["handler"].context.span_id
+        assert spans["process_message"].attributes["event_id"] == "evt-1"
+        assert spans["process_message"].attributes["cause"] == "cause-1"
+
+    def test_failed_root_records_error(self, exporter):
+        root = tracing.start_span("process_message")
+        tracing.end_span(root, ValueError("bad payload"))
+
+        span = _spans(exporter)["process_message"]
+        assert not span.status.is_ok
+        assert span.events[0].name == "exception"
+
+    @pytest.mark.asyncio
+    async def test_mongo_commands_nest_under_current_span(self, exporter):
+        listener = tracing.MongoCommandTracer()
+        started = SimpleNamespace(
+            command_name="update",
+            command={"update": "conversations"},
+            database_name="billie-servicing",
+            connection_id=("localhost", 27017),
+            request_id=7,
+        )
+
+        with tracing.span("handler"):
+            # Motor runs pymongo (and so the listener) on an executor thread
+            # with a copy of the caller's context
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            await loop.run_in_executor(None, context.run, listener.started, started)
+        listener.succeeded(SimpleNamespace(connection_id=started.connection_id, request_id=7))
+
+        spans = _spans(exporter)
+        mongo = spans["mongo.update"]
+        assert mongo.parent.span_id == spans["handler"].context.span_id
+        assert mongo.attributes["db.mongodb.collection"] == "conversations"
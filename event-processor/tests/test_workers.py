@@ -0,0 +1,129 @@
+"""
+Unit Tests for per-family worker pools.
+"""
+
+import asyncio
+
+import pytest
+
+from billie_servicing.workers import WorkerPool, event_family
+
+
+def _message(n):
+    return (f"{n}-0".encode(), {b"n": str(n).encode()})
+
+
+class TestEventFamily:
+    def test_families(self):
+        assert event_family("account.schedule.updated.v1") == "account"
+        assert event_family("payment.received.v1") == "account"
+        assert event_family("ledger.transaction.posted.v1") == "account"
+        assert event_family("customer.verified.v1") == "customer"
+        assert event_family("writeoff.approved.v1") == "writeoff"
+        assert event_family("user_input") == "chat"
+
+
+class TestWorkerPool:
+    @pytest.mark.asyncio
+    async def test_aggregate_messages_processed_in_order_on_one_lane(self):
+        processed = []
+
+        async def process(stream, messages):
+            await asyncio.sleep(0)
+            processed.extend(m[0] for m in messages)
+
+        pool = WorkerPool("account", process, concurrency=4, queue_depth=40)
+        pool.start()
+        for n in range(10):
+            await pool.submit("inbox", _message(n), "ACC-1")
+        await asyncio.wait_for(pool.join(), timeout=1)
+        pool.stop()
+
+        assert processed == [_message(n)[0] for n in range(10)]
+        assert len({pool.lane_for("ACC-1", "inbox") for _ in range(3)}) == 1
+
+    @pytest.mark.asyncio
+    async def test_messages_without_aggregate_keep_stream_order(self):
+        processed = []
+
+        async def process(stream, messages):
+            await asyncio.sleep(0)
+            processed.extend(m[0] for m in messages)
+
+        pool = WorkerPool("chat", process, concurrency=4, queue_depth=40)
+        pool.start()
+        for n in range(10):
+            await pool.submit("inbox", _message(n), None)
+        await asyncio.wait_for(pool.join(), timeout=1)
+        pool.stop()
+
+        assert processed == [_message(n)[0] for n in range(10)]
+
+    @pytest.mark.asyncio
+    async def test_lanes_run_concurrently(self):
+        release = asyncio.Event()
+        started = []
+
+        async def process(stream, messages):
+            started.append(messages[0][0])
+            await release.wait()
+
+        pool = WorkerPool("chat", process, concurrency=2, queue_depth=4)
+        pool.start()
+        a, b = "conv-a", "c1"
+        assert pool.lane_for(a, "inbox") != pool.lane_for(b, "inbox")
+        await pool.submit("inbox", _message(1), a)
+        await pool.submit("inbox", _message(2), b)
+        await asyncio.sleep(0.01)
+
+        assert sorted(started) == [b"1-0", b"2-0"]
+        release.set()
+        await asyncio.wait_for(pool.join(), timeout=1)
+        pool.stop()
+
+    @pytest.mark.asyncio
+    async def test_busy_pool_does_not_hold_up_another(self):
+        blocked = asyncio.Event()
+        done = []
+
+        async def slow(stream, messages):
+            await blocked.wait()
+            done.extend(messages)
+
+        async def fast(stream, messages):
+            done.extend(messages)
+
+        chat = WorkerPool("chat", slow, concurrency=1, queue_depth=10)
+        account = WorkerPool("account", fast, concurrency=1, queue_depth=10)
+        chat.start()
+        account.start()
+        for n in range(5):
+            await chat.submit("inbox", _message(n), "conv")
+        await account.submit("inbox", _message(99), "ACC-1")
+
+        await asyncio.wait_for(account.join(), timeout=1)
+        assert done == [_message(99)]
+
+        blocked.set()
+        await asyncio.wait_for(chat.join(), timeout=1)
+        chat.stop()
+        account.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_does_not_stop_the_lane(self):
+        processed = []
+
+        async def process(stream, messages):
+            if messages[0][0] == b"0-0":
+                raise RuntimeError("boom")
+            processed.extend(messages)
+
+        pool = WorkerPool("account", process, concurrency=1, queue_depth=1)
+        pool.start()
+        await pool.submit("inbox", _message(0), None)
+        await asyncio.wait_for(pool.join(), timeout=1)
+        await pool.submit("inbox", _message(1), None)
+        await asyncio.wait_for(pool.join(), timeout=1)
+        pool.stop()
+
+        assert processed == [_message(1)]
@@ -130,6 +130,20 @@ class TestWriteoffRequestedHandler:
         assert "createdAt" in document
         assert "updatedAt" in document
 
+    @pytest.mark.asyncio
+    async def test_handle_writeoff_requested_redelivery_is_idempotent(self, mock_db):
+        """A redelivered request that was already inserted should not fail."""
+        from pymongo.errors import DuplicateKeyError
+
+        mock_db["write-off-requests"].insert_one = AsyncMock(
+            side_effect=DuplicateKeyError("E11000 duplicate key error")
+        )
+        event = {"conv": "req-123", "cause": "evt-456", "payload": {"loanAccountId": "acc-001"}}
+
+        await handle_writeoff_requested(mock_db, event)
+
+        mock_db["write-off-requests"].insert_one.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_handle_writeoff_requested_with_json_string_payload(self, mock_db):
         """Should handle JSON string payload."""
@@ -182,8 +196,8 @@ class TestWriteoffApprovedHandler:
 
         await handle_writeoff_approved(mock_db, event)
 
-        mock_db["write-off-requests"].update_one.assert_called_once()
-        call_args = mock_db["write-off-requests"].update_one.call_args
+        mock_db["write-off-requests"].find_one_and_update.assert_called_once()
+        call_args = mock_db["write-off-requests"].find_one_and_update.call_args
 
         # Verify query filter uses requestId (from conv)
         assert call_args[0][0] == {"requestId": "req-123"}
@@ -219,8 +233,8 @@ class TestWriteoffRejectedHandler:
 
         await handle_writeoff_rejected(mock_db, event)
 
-        mock_db["write-off-requests"].update_one.assert_called_once()
-        call_args = mock_db["write-off-requests"].update_one.call_args
+        mock_db["write-off-requests"].find_one_and_update.assert_called_once()
+        call_args = mock_db["write-off-requests"].find_one_and_update.call_args
 
         # Verify query filter
         assert call_args[0][0] == {"requestId": "req-456"}
@@ -254,8 +268,8 @@ class TestWriteoffCancelledHandler:
 
         await handle_writeoff_cancelled(mock_db, event)
 
-        mock_db["write-off-requests"].update_one.assert_called_once()
-        call_args = mock_db["write-off-requests"].update_one.call_args
+        mock_db["write-off-requests"].find_one_and_update.assert_called_once()
+        call_args = mock_db["write-off-requests"].find_one_and_update.call_args
 
         # Verify query filter
         assert call_args[0][0] == {"requestId": "req-789"}
@@ -307,10 +321,10 @@ class TestWriteoffEventLifecycle:
         }
 
         await handle_writeoff_approved(mock_db, approve_event)
-        assert mock_db["write-off-requests"].update_one.called
+        assert mock_db["write-off-requests"].find_one_and_update.called
 
         # Verify the update used the correct requestId
-        update_call = mock_db["write-off-requests"].update_one.call_args
+        update_call = mock_db["write-off-requests"].find_one_and_update.call_args
         assert update_call[0][0] == {"requestId": "req-lifecycle-001"}
 
     @pytest.mark.asyncio
@@ -346,7 +360,7 @@ class TestWriteoffEventLifecycle:
 
         await handle_writeoff_rejected(mock_db, reject_event)
 
-        update_call = mock_db["write-off-requests"].update_one.call_args
+        update_call = mock_db["write-off-requests"].find_one_and_update.call_args
         update_doc = update_call[0][1]["$set"]
         assert update_doc["status"] == "rejected"
 
@@ -382,6 +396,6 @@ class TestWriteoffEventLifecycle:
 
         await handle_writeoff_cancelled(mock_db, cancel_event)
 
-        update_call = mock_db["write-off-requests"].update_one.call_args
+        update_call = mock_db["write-off-requests"].find_one_and_update.call_args
         update_doc = update_call[0][1]["$set"]
         assert update_doc["status"] == "cancelled"